@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# End to end load test: bench/server.py serves the corpus as liiga.fi from
+# this process and liigaparser.py season, liigagames.py history and
+# playerstats.py playerdata crawl it, each in its own process and
+# directory without the response cache. Reports pages/s and records/s of
+# every crawl, the p50 and p99 fetch latency (the request spans of the
+# crawl's --trace: from asking for a page to getting it, limiter waits and
+# retries included), the peak RSS and the 429 and 5xx answers it got.
+# --latency, --jitter, --errors, --throttle and --seed go to the server,
+# other options (--rate, --max-window, --procs, --workers, ...) to the
+# crawls.
+#
+#   python bench/load.py [--latency=30] [--jitter=10] [--errors=0.01] [--throttle=300] [--rate=100] [crawl ...]
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigafetch
+import server
+
+SERVEROPTIONS = ('latency', 'jitter', 'errors', 'throttle', 'seed')
+
+crawls = [
+    ('season', 'liigaparser.py', ['season', 'http://liiga.fi/ottelut/2019-2020/runkosarja/']),
+    ('history', 'liigagames.py', ['history']),
+    ('playerdata', 'playerstats.py', ['playerdata', '2020']),
+]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int(round(q * (len(values) - 1)))]
+
+
+def run(script, args, workdir):
+    outname = os.path.join(workdir, 'out.json')
+    with open(outname, 'w') as out:
+        t = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(benchdir, '..', script)] + args,
+                                stdout=out, cwd=workdir)
+        (_, status, usage) = os.wait4(proc.pid, 0)
+        t = time.perf_counter() - t
+    if status:
+        raise Exception("%s %s failed with status %d" % (script, ' '.join(args), os.waitstatus_to_exitcode(status)))
+    with open(outname, 'rb') as fp:
+        records = sum(1 for line in fp if line.strip())
+    # ru_maxrss is in kilobytes on Linux
+    return (records, usage.ru_maxrss / 1024.0, t)
+
+
+def fetches(tracename):
+    # durations of the request spans in seconds
+    with open(tracename) as fp:
+        events = json.load(fp)['traceEvents']
+    return [e['dur'] / 1e6 for e in events if e['ph'] == 'X' and e['name'] == 'request']
+
+
+def answers(before, after, statuses):
+    return sum(after['statuses'].get(s, 0) - before['statuses'].get(s, 0) for s in statuses)
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    names = sys.argv[1:]
+    passed = ['--%s=%s' % (k, v) if v is not True else '--%s' % k
+              for (k, v) in options.items() if k not in SERVEROPTIONS + ('cache', 'site', 'trace')]
+
+    site = server.configure(options)
+    httpd = server.serve(site)
+    siteurl = 'http://%s:%d' % httpd.server_address
+
+    print("%-12s %6s %8s %8s %8s %10s %8s %8s %8s %5s %5s" % (
+        'crawl', 'pages', 'records', 's', 'pages/s', 'records/s', 'p50 ms', 'p99 ms', 'peak MB', '429', '5xx'))
+    for (name, script, args) in crawls:
+        if names and name not in names:
+            continue
+        with tempfile.TemporaryDirectory(prefix='liigaload') as workdir:
+            tracename = os.path.join(workdir, 'trace.json')
+            before = site.stats()
+            (records, rss, t) = run(script, args + passed + ['--no-cache', '--site=%s' % siteurl,
+                                                             '--trace=%s' % tracename], workdir)
+            after = site.stats()
+            durations = fetches(tracename)
+        print("%-12s %6d %8d %8.2f %8.1f %10.1f %8.1f %8.1f %8.1f %5d %5d" % (
+            name, len(durations), records, t, len(durations) / t, records / t,
+            1000 * percentile(durations, 0.5), 1000 * percentile(durations, 0.99), rss,
+            answers(before, after, ['429']), answers(before, after, ['500', '502', '503', '504'])))
+
+    httpd.shutdown()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Peak resident memory of a season crawl with in-memory response caches
+# of --sizes megabytes, next to a process that only imports the parsers.
+# Every run is a separate liigaparser.py process reading the response
+# cache, the first unmeasured run fills the cache. Other options (--cache,
+# --procs, ...) are passed on to the runs.
+#
+#   python bench/memory.py http://liiga.fi/ottelut/2018-2019/runkosarja/ --cache=DIR [--sizes=0,4,16,64]
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import liigafetch
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'liigaparser.py')
+
+
+def run(args):
+    with open(os.devnull, 'w') as out:
+        t = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + args, stdout=out)
+        (_, status, usage) = os.wait4(proc.pid, 0)
+        t = time.perf_counter() - t
+    if status:
+        raise Exception("%s failed with status %d" % (' '.join(args), os.waitstatus_to_exitcode(status)))
+    # ru_maxrss is in kilobytes on Linux
+    return (usage.ru_maxrss / 1024.0, t)
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    url = sys.argv[1]
+    passed = ['--%s=%s' % (k, v) if v is not True else '--%s' % k
+              for (k, v) in options.items() if k not in ['sizes', 'cache-memory', 'offline']]
+
+    run([script, 'season', url] + passed)
+    (rss, t) = run(['-c', 'import sys; sys.path.insert(0, %r); import liigaparser' % os.path.dirname(script)])
+    print("%-12s peak RSS %7.1f MB" % ('imports', rss))
+    for size in options.get('sizes', '0,4,16,64').split(','):
+        (rss, t) = run([script, 'season', url, '--offline', '--cache-memory=%s' % size] + passed)
+        print("%-12s peak RSS %7.1f MB  %6.2f s" % ('%s MB cache' % size, rss, t))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Game page parse time from cached pages. Pages of the season are read
+# from the response cache (or downloaded into it on the first run), then
+# every game is parsed rounds times from memory and the best time of each
+# game is reported.
+#
+#   python bench/parsegame.py http://liiga.fi/ottelut/2018-2019/runkosarja/ --cache=DIR --rounds=5
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import liigacrawl
+import liigafetch
+import liigaparser
+
+
+class RecordingEngine(liigacrawl.CrawlEngine):
+
+    def __init__(self, transport):
+        super(RecordingEngine, self).__init__(transport)
+        self.pages = {}
+
+    def get(self, url):
+        page = super(RecordingEngine, self).get(url)
+        self.pages[url] = page.content
+        return page
+
+
+def timegames(url, pages, rounds):
+    best = {}
+    records = 0
+    for i in range(rounds):
+        parser = liigaparser.LGParser(url, engine=liigacrawl.StaticPages(pages))
+        parsegame = parser.parsegame
+
+        def timed(*args):
+            t = time.perf_counter()
+            result = list(parsegame(*args))
+            t = time.perf_counter() - t
+            best[args[2]] = min(best.get(args[2], t), t)
+            return result
+
+        parser.parsegame = timed
+        records = sum(1 for e in parser.parseseason())
+    return (sorted(best.values()), records)
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    transport = liigafetch.configure(options)
+    url = sys.argv[1]
+    rounds = int(options.get('rounds', 5))
+
+    engine = RecordingEngine(transport)
+    for e in liigaparser.LGParser(url, engine=engine).parseseason():
+        pass
+    engine.close()
+
+    (times, records) = timegames(url, engine.pages, rounds)
+    if not times:
+        raise Exception("No games parsed from %s" % url)
+    print("%d games, %d records" % (len(times), records))
+    print("per game: mean %.2f ms, median %.2f ms, max %.2f ms" % (
+        1000 * sum(times) / len(times), 1000 * times[len(times) // 2], 1000 * times[-1]))
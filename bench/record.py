@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Records the pages of bench/corpus again, from liiga.fi or with --cache
+# and --offline from the response cache. name=URL records the page of a
+# corpus entry from another url; the arguments of the entries (game
+# number, teams, player id, ...) are kept and have to be edited in
+# corpus/manifest.json when the new page needs others. Save a new
+# baseline after recording.
+#
+#   python bench/record.py [--cache=DIR] [--offline] [name[=URL] ...]
+
+import datetime
+import hashlib
+import json
+import os
+import sys
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigafetch
+
+corpusdir = os.path.join(benchdir, 'corpus')
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    transport = liigafetch.configure(options)
+
+    manifestfile = os.path.join(corpusdir, 'manifest.json')
+    with open(manifestfile) as fp:
+        manifest = json.load(fp)
+
+    names = {}
+    for a in sys.argv[1:]:
+        (name, _, url) = a.partition('=')
+        if name not in manifest:
+            raise Exception("No corpus page %s" % name)
+        names[name] = url or None
+
+    for name in sorted(manifest):
+        if names and name not in names:
+            continue
+        entry = manifest[name]
+        entry['url'] = names.get(name) or entry['url']
+        content = transport.fetch(entry['url'])
+        with open(os.path.join(corpusdir, entry['file']), 'wb') as fp:
+            fp.write(content)
+        entry['sha1'] = hashlib.sha1(content).hexdigest()
+        entry['source'] = 'recorded %s' % datetime.date.today()
+        print("%-22s %8d bytes %s" % (name, len(content), entry['url']))
+
+    with open(manifestfile, 'w') as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True, ensure_ascii=False)
+        fp.write('\n')
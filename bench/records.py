@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Memory taken by output records, bytes per record with the dict based
+# records liigadata used before and with the slotted liigarecords ones.
+#
+#   python bench/records.py [count]
+
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import liigaparser
+
+
+class DictParserData(object):
+
+    def __init__(self, **values):
+        self.__values = values
+        self.__values['type'] = self.type
+        for attr in values:
+            setattr(self, attr, values[attr])
+
+    def __setattr__(self, attr, value):
+        if not attr.startswith('_'):
+            self.__values[attr] = value
+        super(DictParserData, self).__setattr__(attr, value)
+
+    def tojson(self):
+        return json.dumps(self.__values, sort_keys=True)
+
+
+def shot(cls, i):
+    return cls(
+        id = 2020001 * 100000 + i,
+        season = '2019-2020',
+        playoffs = False,
+        gameid = 2020001,
+        time = '%02d:%02d' % (i // 60 % 60, i % 60),
+        eventtype = 'shot',
+        team = 'tps',
+        vsteam = 'hifk',
+        period = '1',
+        location = 'left-%d' % (i % 7),
+        shooter = dict(team='tps', id='12345', number=i % 99),
+        blocker = None,
+        result = 'saved',
+    )
+
+
+def player(cls, i):
+    return cls(
+        id = str(10000 + i), gameid = 2020001, season = '2019-2020',
+        playoffs = False, name = 'Pelaaja %d' % i, number = i % 99,
+        team = 'tps', position = 'H', goals = 1, assists = 0, points = 1,
+        penalties = 2, plus = 1, minus = 0, plusminus = 1, ppgoals = 0,
+        shgoals = 0, wingoal = 0, shots = 3, shotpct = 33.3, faceoffs = 5,
+        faceoffpct = 60.0, skating = 1000 + i, playtime = '15:00',
+        lineno = i % 4 + 1, gh = False,
+    )
+
+
+def measure(make, cls, count):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    records = [make(cls, i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return (used / count, records)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    for (name, make, cls) in [('gameevent', shot, liigaparser.GameEventData),
+                              ('player', player, liigaparser.PlayerData)]:
+        old = type('Dict' + cls.__name__, (DictParserData,), {'type': cls.type})
+        (before, oldrecords) = measure(make, old, count)
+        (after, newrecords) = measure(make, cls, count)
+        same = all(a.tojson() == b.tojson() for (a, b) in zip(oldrecords, newrecords))
+        print("%-10s %8.0f bytes/record before %8.0f after %5.1f%% %s" % (
+            name, before, after, 100.0 * after / before, 'same output' if same else 'OUTPUT DIFFERS'))
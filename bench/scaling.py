@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# How parsing and the sinks scale past real season sizes, on pages from
+# bench/synth.py. Every sweep runs one benchmark at growing sizes: seasons
+# of more games, games with more events, shots, shootout rounds or
+# overtime periods, player tables with more rows, and the sinks writing the
+# records of bigger seasons. For every size it prints the time per unit
+# and the slope, the time per added unit from the previous size. Linear
+# cost keeps the slopes near the first one, the x column; the time per
+# unit also has the fixed cost of a game or table in it. Sizes can be
+# given per sweep, like --games=450,4500.
+#
+#   python bench/scaling.py [--seed=2019] [--rounds=3] [sweep ...]
+
+import os
+import sys
+import tempfile
+import time
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigacrawl
+import liigafetch
+import liigaparser
+import liigasinks
+import playerstats
+import synth
+
+from lxml import html
+
+
+def gamebench(generator, size, playoffs=False, **gameargs):
+    # a single game parsed like bench/suite.py parsegame
+    if playoffs:
+        url = 'http://liiga.fi/ottelut/2019-2020/playoffs/903/seuranta/'
+        (home, away) = (('Tappara', 'tappara'), (u'Kärpät', 'karpat'))
+    else:
+        url = 'http://liiga.fi/ottelut/2019-2020/runkosarja/1/seuranta/'
+        (home, away) = generator.pairing(1)
+    pages = generator.game(home, away, **gameargs)
+    engine = liigacrawl.StaticPages(dict(
+        (url.replace('seuranta', kind), page.encode('utf-8'))
+        for (kind, page) in zip(['seuranta', 'kokoonpanot', 'tilastot'], pages)))
+    parser = liigaparser.LGParser(url, engine=engine)
+    parser.season = parser.getseason(url)
+    parser.latest = False
+    if playoffs:
+        parser.getplayoffsteams(None)
+        gameargs = (903, '20190410', url, [home[0], away[0]], True, 3)
+    else:
+        list(parser.getteams(html.fromstring(generator.schedule('2019-2020', 'runkosarja', 1))))
+        gameargs = (1, '20190910', url, [home[0], away[0]], False, None)
+    return lambda: sum(1 for r in parser.parsegame(*gameargs))
+
+
+def games(generator, size):
+    season = synth.SyntheticSeason(generator, games=size)
+    return lambda: sum(1 for r in liigaparser.LGParser(season.url, engine=liigacrawl.StaticPages(season)).parseseason())
+
+
+def events(generator, size):
+    return gamebench(generator, size, events=size)
+
+
+def shots(generator, size):
+    return gamebench(generator, size, shots=size)
+
+
+def shootout(generator, size):
+    return gamebench(generator, size, shootout=size)
+
+
+def overtime(generator, size):
+    # 8 events a period, like a regular game
+    return gamebench(generator, size, playoffs=True, periods=size, events=8 * size)
+
+
+def players(generator, size):
+    url = 'http://liiga.fi/tilastot/2019-2020/runkosarja/pelaajat/?team=tps&position=all&player_stats=players&sort=P#stats-wrapper'
+    engine = liigacrawl.StaticPages({url: generator.playertable('2019-2020', 'runkosarja', 'tps', players=size).encode('utf-8')})
+    parser = playerstats.PlayerStatsParser(engine=engine)
+    return lambda: sum(1 for r in parser.parseplayers('tps', 'TPS', '2019-2020', False, url))
+
+
+# name: (unit, sizes, setup), setup(generator, size) gives the function
+# that is timed, it returns the number of records
+sweeps = [
+    ('games', ('game', [450, 900, 1800, 4500], games)),
+    ('events', ('event', [25, 400, 1600, 6400], events)),
+    ('shots', ('shot', [60, 1000, 4000, 16000], shots)),
+    ('shootout', ('round', [4, 100, 400, 1600], shootout)),
+    ('overtime', ('period', [4, 16, 64, 256], overtime)),
+    ('players', ('row', [21, 1000, 4000, 16000], players)),
+]
+
+
+def opensinks(path):
+    sinks = [('json', liigasinks.JsonSink(out=open(os.devnull, 'w')))]
+    if liigasinks.orjson is not None:
+        sinks.append(('orjson', liigasinks.JsonSink(out=open(os.devnull, 'w'), encoder=liigasinks.OrjsonEncoder())))
+    sinks.append(('log', liigasinks.LogSink(os.path.join(path, 'liiga.log'))))
+    sinks.append(('sqlite', liigasinks.SqliteSink(os.path.join(path, 'liiga.db'))))
+    if liigasinks.pyarrow is not None:
+        sinks.append(('parquet', liigasinks.ParquetSink(os.path.join(path, 'parquet'))))
+    return sinks
+
+
+def sinktimes(generator, size):
+    # seconds every sink took to write the records of a season of size
+    # games, the parsing is not counted
+    season = synth.SyntheticSeason(generator, games=size)
+    records = liigaparser.LGParser(season.url, engine=liigacrawl.StaticPages(season)).parseseason()
+    times = {}
+    count = 0
+    with tempfile.TemporaryDirectory(prefix='liigascaling') as path:
+        sinks = opensinks(path)
+        for r in records:
+            count += 1
+            for (name, sink) in sinks:
+                t = time.perf_counter()
+                sink.write(r)
+                times[name] = times.get(name, 0.0) + time.perf_counter() - t
+        for (name, sink) in sinks:
+            t = time.perf_counter()
+            sink.close()
+            times[name] += time.perf_counter() - t
+    return (count, [(name, times[name]) for (name, sink) in sinks])
+
+
+def measure(run, rounds):
+    # best of rounds, a round runs a short benchmark for at least 50 ms
+    t = time.perf_counter()
+    records = run()
+    repeat = max(1, int(0.05 / (time.perf_counter() - t)))
+    times = []
+    for i in range(rounds):
+        t = time.perf_counter()
+        for j in range(repeat):
+            run()
+        times.append((time.perf_counter() - t) / repeat)
+    return (records, min(times))
+
+
+def report(name, unit, results):
+    # results are (size, records, seconds)
+    print("%-12s %8s %9s %10s %12s %12s %6s" % (
+        name, unit + 's', 'records', 'ms', 'us/' + unit, 'slope us', 'x'))
+    first = None
+    previous = None
+    for (size, records, t) in results:
+        slope = x = ''
+        if previous is not None:
+            slope = (t - previous[1]) / (size - previous[0])
+            first = first or slope
+            (slope, x) = ('%.2f' % (1e6 * slope), '%.2f' % (slope / first))
+        print("%-12s %8d %9d %10.1f %12.2f %12s %6s" % ('', size, records, 1000 * t, 1e6 * t / size, slope, x))
+        previous = (size, t)
+
+
+def sizes(options, name, default):
+    if options.get(name):
+        return [int(s) for s in options[name].split(',')]
+    return default
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    rounds = int(options.get('rounds', 3))
+    seed = int(options.get('seed', 2019))
+    names = sys.argv[1:]
+
+    for (name, (unit, default, setup)) in sweeps:
+        if names and name not in names:
+            continue
+        results = []
+        for size in sizes(options, name, default):
+            (records, t) = measure(setup(synth.PageGenerator(seed), size), rounds)
+            results.append((size, records, t))
+        report(name, unit, results)
+
+    if not names or 'sinks' in names:
+        results = {}
+        for size in sizes(options, 'sinks', [450, 1800, 4500]):
+            (count, times) = sinktimes(synth.PageGenerator(seed), size)
+            for (name, t) in times:
+                results.setdefault(name, []).append((count, count, t))
+        for (name, sinkresults) in results.items():
+            report('sink ' + name, 'record', sinkresults)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Serialization throughput on recorded output, records/sec printing
+# tojson() one record at a time and with liigasinks.JsonSink.
+#
+#   python liigaparser.py season http://liiga.fi/ottelut/2018-2019/runkosarja/ > season.json
+#   python bench/serialize.py season.json [rounds]
+
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import liigagames
+import liigaparser
+import liigarecords
+import liigasinks
+import playerstats
+import timesparser
+
+
+def recordtypes():
+    types = {}
+    # liigaparser last, its season, team and game records have more fields
+    for module in [timesparser, playerstats, liigagames, liigaparser]:
+        for cls in vars(module).values():
+            if isinstance(cls, type) and issubclass(cls, liigarecords.ParserData) and cls.type:
+                types[cls.type] = cls
+    return types
+
+
+def load(path):
+    types = recordtypes()
+    records = []
+    with open(path) as fp:
+        for line in fp:
+            values = json.loads(line)
+            cls = types[values.pop('type')]
+            records.append(cls(**values))
+    return records
+
+
+def printed(records, out):
+    for r in records:
+        print(r.tojson(), file=out)
+
+
+def sunk(records, out, encoder=None):
+    sink = liigasinks.JsonSink(out, encoder=encoder)
+    for r in records:
+        sink.write(r)
+    sink.close()
+
+
+def rate(func, records, rounds):
+    best = None
+    for i in range(rounds):
+        with open(os.devnull, 'w') as out:
+            t = time.perf_counter()
+            func(records, out)
+            t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return len(records) / best
+
+
+if __name__ == "__main__":
+    records = load(sys.argv[1])
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    (a, b) = (io.StringIO(), io.StringIO())
+    printed(records, a)
+    sunk(records, b)
+    print("%d records, output %s" % (len(records), 'identical' if a.getvalue() == b.getvalue() else 'DIFFERS'))
+
+    print("print(tojson())   %10.0f records/sec" % rate(printed, records, rounds))
+    print("JsonSink          %10.0f records/sec" % rate(sunk, records, rounds))
+    if liigasinks.orjson is not None:
+        orjsonsink = lambda records, out: sunk(records, out, liigasinks.OrjsonEncoder())
+        print("JsonSink orjson   %10.0f records/sec (compact output)" % rate(orjsonsink, records, rounds))
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# A stand-in for liiga.fi serving the pages of bench/corpus at the urls of
+# the real site: every season gets the corpus schedule, every game number
+# the corpus game pages, every player id the corpus profile and so on.
+# Answers are delayed by --latency milliseconds, give or take --jitter,
+# --errors=FRACTION of them are 503 and above --throttle requests per second
+# the server answers 429 with Retry-After. Pages have an ETag, requests with
+# If-None-Match get 304. /_stats gives the counts of answers as JSON. The
+# crawlers are pointed to it with --site:
+#
+#   python bench/server.py [--port=8000] [--latency=50] [--jitter=20] [--errors=0.01] [--throttle=200]
+#   python liigaparser.py season http://liiga.fi/ottelut/2019-2020/runkosarja/ --site=http://127.0.0.1:8000 --no-cache
+
+import hashlib
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigafetch
+
+from suite import Corpus, corpusdir
+
+# corpus page for the path and query of a request, %s is the first group
+ROUTES = [
+    (r'^/ottelut/\d{4}-\d{4}/runkosarja/\d+/(seuranta|kokoonpanot|tilastot)/$', 'game-%s'),
+    (r'^/ottelut/\d{4}-\d{4}/playoffs/\d+/(seuranta|kokoonpanot|tilastot)/$', 'playoffs-%s'),
+    (r'^/ottelut/\d{4}-\d{4}/(?:runkosarja|playoffs)/$', 'schedule'),
+    (r'^/tilastot/[^/]+/[^/]+/joukkueet/(?:\?.*)?$', 'teamstats'),
+    (r'^/tilastot/[^/]+/[^/]+/pelaajat/\?.*player_stats=time_on_ice', 'times'),
+    (r'^/tilastot/[^/]+/[^/]+/pelaajat/(?:\?.*)?$', 'players'),
+    (r'^/fi/pelaajat/[^/?]+/?$', 'profile'),
+]
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # keep-alive, the crawlers reuse their connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        site = self.server.site
+        if self.path == '/_stats':
+            self.answer(200, json.dumps(site.stats(), sort_keys=True).encode('utf-8'),
+                        {'Content-Type': 'application/json'})
+            return
+
+        site.delay()
+        name = site.route(self.path)
+        if name is None:
+            self.answer(404, b'Not found\n')
+        elif not site.allow():
+            self.answer(429, b'Too many requests\n', {'Retry-After': '1'})
+        elif site.fail():
+            self.answer(503, b'Service unavailable\n')
+        else:
+            (content, etag) = site.pages[name]
+            if self.headers.get('If-None-Match') == etag:
+                self.answer(304, b'', {'ETag': etag})
+            else:
+                self.answer(200, content, {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag})
+
+    def answer(self, status, content, headers={}):
+        self.send_response(status)
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if content:
+            self.wfile.write(content)
+        self.server.site.count(status, len(content))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LiigaSite(object):
+
+    def __init__(self, corpus, latency=0.0, jitter=0.0, errors=0.0, throttle=None, seed=None):
+        self.pages = {}
+        for name in corpus.manifest:
+            content = corpus.page(name)
+            self.pages[name] = (content, '"%s"' % hashlib.sha1(content).hexdigest())
+        self.routes = [(re.compile(pattern), name) for (pattern, name) in ROUTES]
+        # seconds
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = throttle or 0
+        self.refilled = time.monotonic()
+        self.statuses = {}
+        self.bytes = 0
+
+    def route(self, path):
+        for (pattern, name) in self.routes:
+            m = pattern.match(path)
+            if m is not None:
+                return name % m.groups() if m.groups() else name
+        return None
+
+    def delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def allow(self):
+        # token bucket of throttle requests refilled at throttle per second
+        if not self.throttle:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.throttle, self.tokens + (now - self.refilled) * self.throttle)
+            self.refilled = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def fail(self):
+        with self.lock:
+            return self.random.random() < self.errors
+
+    def count(self, status, size):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes += size
+
+    def stats(self):
+        with self.lock:
+            return dict(statuses=dict((str(s), n) for (s, n) in self.statuses.items()), bytes=self.bytes)
+
+
+def serve(site, port=0, host='127.0.0.1'):
+    # the server runs in a thread, port 0 takes a free port
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.site = site
+    thread = threading.Thread(target=server.serve_forever, name='liigaserver', daemon=True)
+    thread.start()
+    return server
+
+
+def configure(options):
+    return LiigaSite(Corpus(corpusdir),
+                     latency=float(options.get('latency', 0)) / 1000,
+                     jitter=float(options.get('jitter', 0)) / 1000,
+                     errors=float(options.get('errors', 0)),
+                     throttle=float(options['throttle']) if options.get('throttle') else None,
+                     seed=options.get('seed'))
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    server = serve(configure(options), port=int(options.get('port', 8000)))
+    sys.stderr.write("Serving bench/corpus as liiga.fi on http://%s:%d\n" % server.server_address)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Parser benchmarks over the pages in bench/corpus, no network needed.
+# Every benchmark reports records per second (best of the rounds) and
+# the peak of memory allocated by Python during one run, and compares
+# them and a digest of the records to bench/baseline.json. Exits with 1
+# when a benchmark got slower or allocates more than --tolerance percent,
+# or its records changed. --save writes this run as the new baseline.
+# The pages and the arguments the benchmarks use are listed in
+# corpus/manifest.json, bench/record.py records them again.
+#
+#   python bench/suite.py [--rounds=30] [--tolerance=15] [--save] [benchmark ...]
+
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigacrawl
+import liigafetch
+import liigagames
+import liigaparser
+import playerstats
+import timesparser
+
+from lxml import etree, html
+
+corpusdir = os.path.join(benchdir, 'corpus')
+baselinefile = os.path.join(benchdir, 'baseline.json')
+
+
+class Corpus(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as fp:
+            self.manifest = json.load(fp)
+        self.pages = {}
+        for (name, entry) in self.manifest.items():
+            with open(os.path.join(path, entry['file']), 'rb') as fp:
+                content = fp.read()
+            if hashlib.sha1(content).hexdigest() != entry['sha1']:
+                raise Exception("Corpus page %s does not match the manifest" % entry['file'])
+            self.pages[entry['url']] = content
+
+    def url(self, name):
+        return self.manifest[name]['url']
+
+    def args(self, name):
+        return self.manifest[name].get('args', {})
+
+    def page(self, name):
+        return self.pages[self.url(name)]
+
+    def engine(self):
+        return liigacrawl.StaticPages(self.pages)
+
+
+# Benchmarks take the corpus, do their setup and return the function that
+# is timed. It returns the records of one run.
+
+def gameparser(corpus, name):
+    args = corpus.args(name)
+    url = corpus.url(name)
+    parser = liigaparser.LGParser(url, engine=corpus.engine())
+    parser.season = parser.getseason(url)
+    parser.latest = False
+    if args.get('playoffs'):
+        parser.getplayoffsteams(None)
+    else:
+        list(parser.getteams(html.fromstring(corpus.page('schedule'))))
+    gameargs = (args['gameno'], args['date'], url, args['teams'],
+                bool(args.get('playoffs')), args.get('seriesgameno'))
+    return (parser, url, gameargs)
+
+
+def gamelines(corpus):
+    (parser, url, gameargs) = gameparser(corpus, 'game-seuranta')
+    gamedata = next(parser.parsegame(*gameargs))
+    (home, away) = (gamedata.home['team'], gamedata.away['team'])
+    return (parser, url, gamedata, home, away)
+
+
+def parsegame(corpus):
+    (parser, url, gameargs) = gameparser(corpus, 'game-seuranta')
+    return lambda: list(parser.parsegame(*gameargs))
+
+
+def parsegameplayoffs(corpus):
+    (parser, url, gameargs) = gameparser(corpus, 'playoffs-seuranta')
+    return lambda: list(parser.parsegame(*gameargs))
+
+
+def parseroster(corpus):
+    (parser, url, gamedata, home, away) = gamelines(corpus)
+
+    def run():
+        (homelines, awaylines, referees) = parser.parseroster(url, gamedata, home, away)
+        return list(homelines.items()) + list(awaylines.items()) + referees
+    return run
+
+
+def parseplayers(corpus):
+    (parser, url, gamedata, home, away) = gamelines(corpus)
+    (homelines, awaylines, referees) = parser.parseroster(url, gamedata, home, away)
+    return lambda: list(parser.parseplayers(url, gamedata, home, away, homelines, awaylines))
+
+
+def getgames(corpus):
+    url = corpus.url('schedule')
+    parser = liigaparser.LGParser(url, engine=corpus.engine())
+    parser.season = parser.getseason(url)
+    parser.latest = False
+    content = corpus.page('schedule')
+    list(parser.getteams(html.fromstring(content)))
+    # only the schedule, the games themselves are not parsed
+    parser.parsegames = lambda games: games
+    return lambda: list(parser.getgames(html.fromstring(content)))
+
+
+def liigagamesgetgames(corpus):
+    url = corpus.url('schedule')
+    parser = liigagames.LGParser(url, engine=corpus.engine())
+    parser.season = parser.getseason(url)
+    content = corpus.page('schedule')
+    list(parser.getteams(html.fromstring(content)))
+    # most rows have an empty result cell, games decided in regulation time
+    return lambda: list(parser.getgames(html.fromstring(content)))
+
+
+def playerstatsplayers(corpus):
+    args = corpus.args('players')
+    parser = playerstats.PlayerStatsParser(engine=corpus.engine())
+    url = corpus.url('players')
+    return lambda: list(parser.parseplayers(args['teamid'], args['teamname'], args['season'], args['playoffs'], url))
+
+
+def playerdataplayer(corpus):
+    args = corpus.args('profile')
+    parser = playerstats.PlayerDataParser(engine=corpus.engine())
+    url = corpus.url('profile')
+    return lambda: list(parser.parseplayer(url, args['playerid']))
+
+
+def playertimesplayers(corpus):
+    args = corpus.args('times')
+    parser = timesparser.PlayerTimesParser(args['season'], args['serie'])
+    content = corpus.page('times')
+    return lambda: list(parser.getplayers(html.fromstring(content)))
+
+
+benchmarks = [
+    ('parsegame', parsegame),
+    ('parsegame-playoffs', parsegameplayoffs),
+    ('parseroster', parseroster),
+    ('parseplayers', parseplayers),
+    ('getgames', getgames),
+    ('liigagames.getgames', liigagamesgetgames),
+    ('PlayerStatsParser.parseplayers', playerstatsplayers),
+    ('PlayerDataParser.parseplayer', playerdataplayer),
+    ('PlayerTimesParser.getplayers', playertimesplayers),
+]
+
+
+def digest(records):
+    h = hashlib.sha1()
+    for r in records:
+        if isinstance(r, liigaparser.liigarecords.ParserData):
+            h.update(r.tojson().encode('utf-8'))
+        else:
+            h.update(json.dumps(r, sort_keys=True).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def measure(run, rounds):
+    records = run()
+    times = []
+    for i in range(rounds):
+        t = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t)
+    t = min(times)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict(
+        records=len(records),
+        ms=round(1000 * t, 3),
+        recordsps=round(len(records) / t),
+        peakkb=round(peak / 1024.0, 1),
+        digest=digest(records),
+    )
+
+
+def compare(result, base, tolerance):
+    problems = []
+    if base is None:
+        return problems
+    if result['digest'] != base['digest']:
+        problems.append('records changed')
+    if result['recordsps'] < base['recordsps'] * (1 - tolerance):
+        problems.append('slower')
+    if result['peakkb'] > base['peakkb'] * (1 + tolerance):
+        problems.append('allocates more')
+    return problems
+
+
+def change(new, old):
+    if not old:
+        return '      '
+    return '%+5.0f%%' % (100.0 * (new - old) / old)
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    rounds = int(options.get('rounds', 30))
+    tolerance = float(options.get('tolerance', 15)) / 100
+    names = sys.argv[1:]
+
+    corpus = Corpus(corpusdir)
+    baseline = {}
+    if os.path.exists(baselinefile):
+        with open(baselinefile) as fp:
+            baseline = json.load(fp)
+    basebenchmarks = baseline.get('benchmarks', {})
+
+    results = {}
+    regressions = 0
+    print("%-32s %7s %9s %11s %9s %8s %8s" % (
+        'benchmark', 'records', 'ms', 'records/s', 'peak KB', 'speed', 'memory'))
+    for (name, setup) in benchmarks:
+        if names and name not in names:
+            continue
+        result = measure(setup(corpus), rounds)
+        results[name] = result
+        base = basebenchmarks.get(name)
+        problems = compare(result, base, tolerance)
+        regressions += bool(problems)
+        print("%-32s %7d %9.3f %11d %9.1f %8s %8s %s" % (
+            name, result['records'], result['ms'], result['recordsps'], result['peakkb'],
+            change(result['recordsps'], base and base['recordsps']),
+            change(result['peakkb'], base and base['peakkb']),
+            ', '.join(problems).upper()))
+
+    if options.get('save'):
+        basebenchmarks.update(results)
+        baseline = dict(
+            python=platform.python_version(),
+            lxml='.'.join(str(v) for v in etree.LXML_VERSION),
+            machine=platform.machine(),
+            benchmarks=basebenchmarks,
+        )
+        with open(baselinefile, 'w') as fp:
+            json.dump(baseline, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+        print("baseline saved to %s" % baselinefile)
+    elif regressions:
+        sys.exit(1)
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Seeded generator of liiga.fi pages in the markup the parsers read: game
+# pages (seuranta, kokoonpanot, tilastot), schedules, player, time on ice
+# and team statistics tables and player profiles. Sizes are free, so games
+# can have any number of events, overtime periods, shootout rounds and
+# shots, schedules any number of games and tables any number of players.
+# The same seed and sizes give the same pages. The pages of bench/corpus
+# are made with the defaults; without arguments they are written again:
+#
+#   python bench/synth.py [--seed=2019] [--out=bench/corpus]
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+
+benchdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchdir, '..'))
+
+import liigafetch
+
+TEAMS = [('HIFK', 'hifk'), ('HPK', 'hpk'), ('Ilves', 'ilves'), ('JYP', 'jyp'), ('Jukurit', 'jukurit'),
+         ('KalPa', 'kalpa'), ('KooKoo', 'kookoo'), (u'Kärpät', 'karpat'), ('Lukko', 'lukko'),
+         ('Pelicans', 'pelicans'), ('SaiPa', 'saipa'), ('Sport', 'sport'), ('Tappara', 'tappara'),
+         ('TPS', 'tps'), (u'Ässät', 'assat')]
+FIRST = ['Mikko', 'Jani', 'Antti', 'Sami', 'Teemu', 'Ville', 'Juha', 'Petri', 'Markus', 'Joonas',
+         'Eetu', 'Aleksi', 'Henri', 'Lauri', 'Otto', 'Niko', 'Tuomas', 'Jesse', 'Kasper', 'Valtteri']
+LAST = ['Koivu', 'Lehtonen', 'Virtanen', 'Mäkinen', 'Nieminen', 'Hämäläinen', 'Laine', 'Heikkinen',
+        'Korhonen', 'Salminen', 'Järvinen', 'Lindholm', 'Saarinen', 'Rantanen', 'Kallio', 'Aho',
+        'Leino', 'Tuominen', 'Ranta', 'Peltonen', 'Honka', 'Granlund', 'Kapanen', 'Ruutu']
+
+# kinds of timeline rows, generated games go through them in this order
+EVENTKINDS = ['goal', 'penalty', 'goal1', 'penalty', 'goal', 'teampenalty', 'video', 'penalty', 'goal',
+              'penalty5', 'goal', 'penalty', 'goal1', 'penalty', 'penalty', 'goal', 'penalty', 'timeout',
+              'goal', 'penalty', 'gkout', 'gkin', 'penalty', 'timeout', 'penalty']
+
+# timelines of the corpus games
+REGULAR = [('00:47', 'home', 'goal'), ('04:12', 'away', 'penalty'), ('05:30', 'home', 'goal1'),
+           ('09:58', 'home', 'penalty'), ('11:21', 'away', 'goal'), ('14:02', 'home', 'teampenalty'),
+           ('17:40', 'away', 'video'), ('19:05', 'away', 'penalty'), ('21:33', 'home', 'goal'),
+           ('24:50', 'away', 'penalty5'), ('26:18', 'away', 'goal'), ('29:41', 'home', 'penalty'),
+           ('33:07', 'away', 'goal1'), ('36:26', 'home', 'penalty'), ('38:59', 'away', 'penalty'),
+           ('41:10', 'home', 'goal'), ('44:45', 'away', 'penalty'), ('47:30', 'home', 'timeout'),
+           ('49:02', 'away', 'goal'), ('52:19', 'home', 'penalty'), ('55:40', 'away', 'gkout'),
+           ('56:12', 'away', 'gkin'), ('58:33', 'home', 'penalty'), ('59:51', 'home', 'timeout'),
+           ('62:14', 'away', 'penalty')]
+SHOOTOUT = [('home', False), ('away', False), ('home', True), ('away', False), ('home', False),
+            ('away', True), ('home', True), ('away', False)]
+PLAYOFFS = [('03:14', 'home', 'goal'), ('08:20', 'away', 'penalty'), ('15:52', 'away', 'goal1'),
+            ('22:05', 'home', 'penalty'), ('27:31', 'home', 'goal'), ('34:48', 'away', 'penalty'),
+            ('41:17', 'away', 'goal'), ('45:02', 'home', 'penalty'), ('52:39', 'home', 'video'),
+            ('58:10', 'away', 'timeout'), ('66:40', 'home', 'penalty'), ('81:03', 'away', 'penalty'),
+            ('87:12', 'home', 'goal1')]
+
+gamere = re.compile(r'/ottelut/(\d{4}-\d{4})/(runkosarja|playoffs)/(\d+)/(seuranta|kokoonpanot|tilastot)/$')
+
+
+def chrome(title, body):
+    # the header, scripts and footer around the content, like on liiga.fi
+    nav = ''.join('<li class="menu-item"><a href="/fi/%s">%s</a><ul class="sub">%s</ul></li>' % (
+        t[1], t[0], ''.join('<li><a href="/fi/%s/%s">%s</a></li>' % (t[1], s, s.capitalize())
+                            for s in ['ottelut', 'pelaajat', 'tilastot', 'uutiset'])) for t in TEAMS)
+    script = '<script type="text/javascript">window.config = {%s};</script>' % ', '.join(
+        '"k%d": "%s"' % (i, hashlib.sha1(str(i).encode()).hexdigest()) for i in range(300))
+    footer = ''.join('<div class="footer-col"><h4>%s</h4><p>%s</p></div>' % (t[0], ' '.join(LAST[:12])) for t in TEAMS)
+    return (u'<!DOCTYPE html>\n<html lang="fi"><head><meta charset="utf-8"><title>%s</title>'
+            u'<link rel="stylesheet" href="/static/css/main.css">%s</head><body>'
+            u'<header id="header"><nav><ul class="menu">%s</ul></nav></header>'
+            u'<div id="page">%s</div><footer id="footer">%s</footer></body></html>\n' % (
+                title, script, nav, body, footer))
+
+
+def teamname(teamid):
+    return [t for t in TEAMS if t[1] == teamid][0][0]
+
+
+def mmss(seconds):
+    return '%02d:%02d' % (seconds // 60, seconds % 60)
+
+
+class PageGenerator(object):
+    # Pages are made with one random generator in the order they are asked
+    # for, rosters with their own per team so that a player is the same on
+    # every page.
+
+    def __init__(self, seed=2019):
+        self.random = random.Random(seed)
+
+    @classmethod
+    def roster(self, team, size=22):
+        # 20 skaters and 2 goalkeepers, players after them only appear in
+        # statistics tables
+        r = random.Random(team)
+        teamindex = TEAMS.index([t for t in TEAMS if t[1] == team][0])
+        names = set()
+        out = []
+        numbers = r.sample(range(2, 99), 22)
+        for i in range(size):
+            while True:
+                n = '%s, %s' % (r.choice(LAST), r.choice(FIRST))
+                if n not in names or i >= 22:
+                    break
+            names.add(n)
+            surname = ''.join(c for c in n.split(',')[0].lower() if c.isalpha())
+            if i < 22:
+                pid = '%s%d' % (surname, 20000 + i + 100 * teamindex)
+                number = numbers[i] if i < 20 else [1, 31][i - 20]
+            else:
+                pid = '%s%d' % (surname, 100000 + i + 10000 * teamindex)
+                number = 2 + i % 97
+            pos = 'MV' if i in (20, 21) else ('P' if i % 5 in (3, 4) else 'H')
+            out.append(dict(id=pid, name=n, number=number, pos=pos,
+                            nname=' '.join(n.split(',')[::-1]).strip()))
+        return out
+
+    def gameevents(self, events, periods=3):
+        # events timeline rows spread over the periods
+        length = 20 * 60 * periods
+        out = []
+        for k in range(events):
+            t = (k + 1) * length // (events + 1)
+            side = self.random.choice(['home', 'away'])
+            out.append((mmss(t), side, EVENTKINDS[k % len(EVENTKINDS)]))
+        return out
+
+    def shootout(self, rounds):
+        # rounds of a home and an away shot, the last round decides
+        out = []
+        (home, away) = (0, 0)
+        for k in range(rounds):
+            (h, a) = (self.random.random() < 0.35, self.random.random() < 0.35)
+            if k == rounds - 1 and home + h == away + a:
+                (h, a) = (True, False)
+            out.extend([('home', h), ('away', a)])
+            (home, away) = (home + h, away + a)
+        return out
+
+    def game(self, home, away, events=25, periods=3, shootout=0, shots=60):
+        # pages of a generated game, the score and periods are counted from
+        # its events. More than 3 periods are playoff overtimes.
+        timeline = self.gameevents(events, periods)
+        goals = [[0, 0] for i in range(periods)]
+        for (t, side, kind) in timeline:
+            if kind in ('goal', 'goal1'):
+                goals[min(int(t.split(':')[0]) // 20, periods - 1)][side == 'away'] += 1
+        (hs, as_) = (sum(g[0] for g in goals), sum(g[1] for g in goals))
+        rounds = self.shootout(shootout) if shootout else None
+        if rounds:
+            # the shootout is a goal for its winner
+            homewins = sum(s for (side, s) in rounds if side == 'home') > sum(s for (side, s) in rounds if side == 'away')
+            periodsgoals = goals + [[0, 0], [1, 0] if homewins else [0, 1]]
+            (hs, as_) = (hs + homewins, as_ + (not homewins))
+            tm = '65:00 VL'
+        elif periods > 3:
+            periodsgoals = goals
+            tm = '%s JA' % timeline[-1][0] if timeline else '%d:00' % (20 * periods)
+        else:
+            periodsgoals = goals
+            tm = '60:00'
+        periodstxt = '(%s)' % ', '.join('%d-%d' % tuple(g) for g in periodsgoals)
+        return self.gamepages(home, away, '%d - %d' % (hs, as_), periodstxt, tm,
+                              self.random.randint(2000, 13000), len(periodsgoals), timeline, rounds, shots)
+
+    @classmethod
+    def row(self, rows, side, t, inner, cls):
+        h = u'<td class="home">\n%s</td>' % inner if side == 'home' else u'<td class="home"></td>'
+        a = u'<td class="away">\n%s</td>' % inner if side == 'away' else u'<td class="away"></td>'
+        rows.append(u'<tr class="%s">%s<td><i>%s</i></td>%s</tr>' % (cls, h, t, a))
+
+    @classmethod
+    def player(self, p):
+        return u'<span>#%d</span><a href="/fi/pelaajat/%s">%s</a>' % (p['number'], p['id'], p['nname'])
+
+    def gamepages(self, home, away, score, periodstxt, tm, attendance, nperiods, events, shootout=None, shots=60):
+        rnd = self.random
+        pl = self.player
+        (hname, hid), (aname, aid) = home, away
+        hp, ap = self.roster(hid), self.roster(aid)
+        rows = []
+        cls = ['odd', 'even']
+        hs = as_ = 0
+        for k, (t, side, kind) in enumerate(events):
+            ps = hp if side == 'home' else ap
+            skaters = ps[:20]
+            p = skaters[(k * 7) % 20]
+            c = cls[k % 2]
+            if kind == 'goal':
+                if side == 'home':
+                    hs += 1
+                else:
+                    as_ += 1
+                a1, a2 = skaters[(k * 7 + 3) % 20], skaters[(k * 7 + 11) % 20]
+                attr = [' YV', ' AV', '', '', ' TM'][k % 5]
+                self.row(rows, side, t, u'<strong>Maali</strong> %s , %d-%d%s %s %s ' % (pl(p), hs, as_, attr, pl(a1), pl(a2)), c)
+            elif kind == 'goal1':
+                if side == 'home':
+                    hs += 1
+                else:
+                    as_ += 1
+                self.row(rows, side, t, u'<strong>Maali</strong> %s , %d-%d ' % (pl(p), hs, as_), c)
+            elif kind == 'penalty':
+                reason = ['koukkaaminen', 'kampitus', 'huitominen', 'korkea maila', 'kiinnipitäminen', 'estäminen'][k % 6]
+                self.row(rows, side, t, u'%s 2 min %s' % (pl(p), reason), c)
+            elif kind == 'penalty5':
+                self.row(rows, side, t, u'%s 5 min ryntäys - pelirangaistus %s ' % (pl(p), pl(skaters[(k + 5) % 20])), c)
+            elif kind == 'teampenalty':
+                self.row(rows, side, t, u'Joukkuerangaistus 2 min liikaa pelaajia %s ' % pl(p), c)
+            elif kind == 'timeout':
+                self.row(rows, side, t, u'Joukkueen aikalisä', c)
+            elif kind == 'gkout':
+                self.row(rows, side, t, u'Maalivahti ulos %s ' % pl(ps[20]), c)
+            elif kind == 'gkin':
+                self.row(rows, side, t, u'Maalivahti sisään %s ' % pl(ps[20]), c)
+            elif kind == 'video':
+                self.row(rows, side, t, u'Videotarkistus - ei maalia', c)
+        if shootout:
+            for k, (side, scored) in enumerate(shootout):
+                ps, gs = (hp, ap) if side == 'home' else (ap, hp)
+                p = ps[k % 20]
+                gk = gs[20]
+                gke = u'Maalivahti <div><div>Mv. #%d <a href="/fi/pelaajat/%s">%s</a></div></div>' % (gk['number'], gk['id'], gk['nname'])
+                if scored:
+                    shot = u' <strong>#%d</strong> <a href="/fi/pelaajat/%s">%s</a> %d-%d maali' % (
+                        p['number'], p['id'], p['nname'], hs + (side == 'home'), as_ + (side == 'away'))
+                else:
+                    shot = u'#%d <a href="/fi/pelaajat/%s">%s</a> ei maalia' % (p['number'], p['id'], p['nname'])
+                (h, a) = (shot, gke) if side == 'home' else (gke, shot)
+                rows.append(u'<tr class="%s"><td class="home">%s</td><td><i>65:00</i></td><td class="away">%s</td></tr>' % (cls[k % 2], h, a))
+        rows.append(u'<tr class="period"><td colspan="3">Maalivahdit</td></tr>')
+        rows.append(u'<tr class="odd"><td class="home">#%d <a href="/fi/pelaajat/%s">%s</a></td><td>Aloittava</td><td class="away">#%d <a href="/fi/pelaajat/%s">%s</a></td></tr>' % (
+            hp[20]['number'], hp[20]['id'], hp[20]['nname'], ap[20]['number'], ap[20]['id'], ap[20]['nname']))
+        rows.append(u'<tr class="period"><td colspan="3">Laukaisukartta</td></tr>')
+        per = lambda vals: ' '.join('data-period%d="%d"' % (i + 1, v) for i, v in enumerate(vals))
+        for name in ['Maali', 'Ohi', 'Torjuttu', 'Blokattu', u'Yhteensä']:
+            hv = [rnd.randint(0, 6) for i in range(nperiods)]
+            av = [rnd.randint(0, 6) for i in range(nperiods)]
+            rows.append(u'<tr class="shooting-stats odd"><td class="home" %s>%d</td><td>%s</td><td class="away" %s>%d</td></tr>' % (
+                per(hv), sum(hv), name, per(av), sum(av)))
+        rows.append(u'<tr class="shooting-stats even"><td class="home"><a href="/fi/pelaajat/%s">%s</a> 158,4 km/h</td><td>Kovin laukaus</td><td class="away"><a href="/fi/pelaajat/%s">%s</a> 152,9 km/h</td></tr>' % (
+            hp[2]['id'], hp[2]['nname'], ap[4]['id'], ap[4]['nname']))
+        rows.append(u'<tr class="period"><td colspan="3">Nopein luistelija</td></tr>')
+        rows.append(u'<tr class="odd"><td class="home"><a href="/fi/pelaajat/%s">%s</a> 13,92 s</td><td>Kierros</td><td class="away"><a href="/fi/pelaajat/%s">%s</a> 14,05 s</td></tr>' % (
+            hp[6]['id'], hp[6]['nname'], ap[8]['id'], ap[8]['nname']))
+        rows.append(u'<tr class="period"><td colspan="3">Aloitusvoitot</td></tr>')
+        hf = [rnd.randint(6, 14) for i in range(nperiods)]
+        af = [rnd.randint(6, 14) for i in range(nperiods)]
+        fo = lambda a, b: ' '.join('%d (%d%%)' % (x, 100 * x // max(1, x + y)) for x, y in zip(a + [sum(a)], b + [sum(b)]))
+        rows.append(u'<tr class="odd"><td class="home">%s</td><td>Aloitukset</td><td class="away">%s</td></tr>' % (fo(hf, af), fo(af, hf)))
+        rows.append(u'<tr class="period"><td colspan="3">Ylivoimapeli</td></tr>')
+        for (name, h, a) in [('Yv-maalit', '1', '0'), ('Yv-kerrat', '4', '3'), ('Yv-prosentti', '25,0 %', '0,0 %'), ('Yv-aika', '7:12', '5:40')]:
+            rows.append(u'<tr class="odd"><td class="home">%s</td><td>%s</td><td class="away">%s</td></tr>' % (h, name, a))
+        shotdivs = []
+        for k in range(shots):
+            side = 'home' if k % 2 == 0 else 'away'
+            ps = hp if side == 'home' else ap
+            vs = ap if side == 'home' else hp
+            p = ps[(k * 3) % 20]
+            res = ['Maalivahti torjui', 'Laukaus ohi maalin', 'Maalivahti torjui', 'blokkasi (%s)' % vs[(k * 5) % 20]['nname'], 'Maali'][k % 5]
+            t = (k * 59) % (20 * nperiods)
+            x, y = rnd.randint(0, 400), rnd.randint(0, 200)
+            shotdivs.append(u'<div class="shot %s period-%d %s player-%s" style="left: %dpx; top: %dpx"></div>' % (
+                side, t // 20 + 1, ['saved', 'missed', 'saved', 'blocked', 'goal'][k % 5], p['id'], x, y))
+            shotdivs.append(u'<div class="shot-tooltip">Laukoja: %s<br/>Joukkue: %s<br/>Aika: %02d:%02d<br/>Tulos: %s</div>' % (
+                p['nname'], side, t, (k * 17) % 60, res))
+        title = u'Ottelu %s - %s' % (hname, aname)
+        seuranta = chrome(title, (
+            u'<div class="game-header"><h1>%s</h1><div class="info"><p>%s</p><p>%s</p><p>%s</p><p>Hartwall Arena</p><p>Yleisö: %d</p></div></div>'
+            u'<div class="table"><table class="game-events">%s</table></div>'
+            u'<div class="shooting-map"><div class="shooting-map-container">%s</div></div>') % (
+                title, score, periodstxt, tm, attendance, ''.join(rows), ''.join(shotdivs)))
+
+        teams = []
+        for side, ps in (('home', hp), ('away', ap)):
+            lines = []
+            for l in range(4):
+                lineplayers = ps[l * 5:(l + 1) * 5]
+                lines.append(u'<div class="line"><div class="head">%d. kenttä</div><div class="players">%s</div></div>' % (
+                    l + 1, ''.join(u'<a class="player" href="/fi/pelaajat/%s"><div class="jersey">#%d</div><div class="name">%s</div>%s</a>' % (
+                        p['id'], p['number'], p['nname'], '<span class="kultainen-kypara"></span>' if l == 0 and i == 0 else '')
+                        for i, p in enumerate(lineplayers))))
+            lines.append(u'<div class="line"><div class="head">Maalivahdit</div><div class="players">%s</div></div>' % ''.join(
+                u'<a class="player" href="/fi/pelaajat/%s"><div class="jersey">#%d</div><div class="name">%s</div></a>' % (p['id'], p['number'], p['nname'])
+                for p in ps[20:]))
+            teams.append(u'<div class="team %s"><h2>%s</h2>%s</div>' % (side, hname if side == 'home' else aname, ''.join(lines)))
+        refs = u'<div class="referees">%s</div>' % ''.join(
+            u'<div class="player"><a href="#"><div class="jersey">#%d</div><div class="name">%s %s (%s)</div></a></div>' % (n, f, l, kind)
+            for (n, f, l, kind) in [(11, 'Jari', 'Levonen', u'Päätuomari'), (27, 'Mikko', 'Kaukokari', u'Päätuomari'),
+                                    (64, 'Sakari', 'Suominen', 'Linjatuomari'), (81, 'Joonas', 'Kova', 'Linjatuomari')])
+        kokoonpanot = chrome(title, u'<div class="rosters">%s</div>%s' % (''.join(teams), refs))
+
+        teams = []
+        for side, ps in (('home', hp), ('away', ap)):
+            prow = []
+            for i, p in enumerate(ps[:20]):
+                g, a = rnd.randint(0, 2), rnd.randint(0, 2)
+                s = rnd.randint(0, 6)
+                vals = [p['number'], p['pos'], g, a, g + a, [0, 2, 0, 0, 4][i % 5], 1, 0, 1, 0, 0, 0, s,
+                        '-' if not s else ('%.1f' % (100.0 * g / s)).replace('.', ','), rnd.randint(0, 20),
+                        '-' if i % 3 else '%d,%d' % (rnd.randint(30, 70), rnd.randint(0, 9)),
+                        '%d %03d' % (rnd.randint(1, 4), rnd.randint(0, 999)), '%d:%02d' % (rnd.randint(8, 24), rnd.randint(0, 59))]
+                prow.append(u'<tr><td class="ta-l"><a href="/fi/pelaajat/%s">%s</a></td>%s</tr>' % (
+                    p['id'], p['name'], ''.join('<td>%s</td>' % v for v in vals)))
+            grow = []
+            for i, p in enumerate(ps[20:]):
+                vals = [p['number'], 28 - 28 * i, 2 - 2 * i, '93,3' if not i else '-', 0, 0, 0, 0, '65:00' if not i else '00:00']
+                grow.append(u'<tr><td class="ta-l"><strong><a href="/fi/pelaajat/%s">%s</a></strong></td>%s</tr>' % (
+                    p['id'], p['name'], ''.join('<td>%s</td>' % v for v in vals)))
+            teams.append(u'<div class="team %s"><table class="player-stats"><thead><tr><th>Pelaaja</th></tr></thead><tbody>%s</tbody></table>'
+                         u'<table class="goalie-stats"><thead><tr><th>Maalivahti</th></tr></thead><tbody>%s</tbody></table></div>' % (side, ''.join(prow), ''.join(grow)))
+        tilastot = chrome(title, ''.join(teams))
+        return (seuranta, kokoonpanot, tilastot)
+
+    def schedule(self, years, serie, ngames):
+        rnd = self.random
+        opts = u''.join(u'<option value="%s">%s</option>' % (i, n) for n, i in TEAMS)
+        rows = []
+        pairs = [(h, a) for h in TEAMS for a in TEAMS if h != a]
+        for g in range(1, ngames + 1):
+            (h, a) = self.pairing(g, pairs)
+            url = u'/ottelut/%s/%s/%d/seuranta/' % (years, serie, g)
+            month, dayno = 9 + (g // 100), 10 + (g % 18)
+            date = '%d%02d%02d' % (2019 if month <= 12 else 2020, (month - 1) % 12 + 1, dayno)
+            rows.append(u'<tr data-time="%s"><td>%d</td><td class="h-l">18:30</td>'
+                        u'<td class="ta-l"><a href="%s">\n%s\n - \n%s\n</a></td>'
+                        u'<td><a title="Seuranta" href="%s">Seuranta</a></td><td><a href="%s">Kokoonpanot</a></td>'
+                        u'<td>%d - %d</td><td>%s</td><td>%d</td></tr>' % (
+                            date, g, url, h[0], a[0], url, url.replace('seuranta', 'kokoonpanot'),
+                            rnd.randint(0, 5), rnd.randint(0, 5), ['', 'JA', '', 'VL', ''][g % 5], rnd.randint(2000, 13000)))
+        body = (u'<form><select name="season"><option value="2019-2020">2019-2020</option></select>'
+                u'<select name="team"><option value="">Kaikki joukkueet</option>%s</select></form>'
+                u'<table id="games"><thead><tr><th>#</th></tr></thead><tbody>%s</tbody></table>' % (opts, ''.join(rows)))
+        return chrome(u'Ottelut %s' % years, body)
+
+    @classmethod
+    def pairing(self, gameno, pairs=None):
+        # home and away team of a schedule game
+        if gameno == 1:
+            return (('TPS', 'tps'), ('HIFK', 'hifk'))
+        pairs = pairs or [(h, a) for h in TEAMS for a in TEAMS if h != a]
+        return pairs[(gameno * 37) % len(pairs)]
+
+    def playertable(self, years, serie, team, players=21):
+        rnd = self.random
+        opts = u''.join(u'<option value="%s">%s</option>' % (i, n) for n, i in TEAMS)
+        tname = teamname(team)
+        rows = []
+        ps = self.roster(team, max(22, players + 1))
+        for k, p in enumerate(ps[:20] + [ps[20]] + ps[22:players + 1]):
+            gp = rnd.randint(20, 60)
+            g, a = rnd.randint(0, 25), rnd.randint(0, 35)
+            s = rnd.randint(g, 180)
+            vals = [tname, '' if k == 5 else p['pos'], gp, g, a, '<strong>%d</strong>' % (g + a), rnd.randint(0, 40),
+                    rnd.randint(0, 30), rnd.randint(0, 30), rnd.randint(-15, 15), rnd.randint(0, 8), rnd.randint(0, 2),
+                    rnd.randint(0, 5), s, '-' if not s else ('%.1f' % (100.0 * g / s)).replace('.', ','), rnd.randint(0, 600),
+                    '-' if k % 4 else '%d,%d' % (rnd.randint(40, 60), rnd.randint(0, 9)), '%d:%02d' % (rnd.randint(10, 22), rnd.randint(0, 59))]
+            rows.append(u'<tr><td>%d</td><td class="ta-l"><a href="/fi/pelaajat/%s">%s</a></td>%s</tr>' % (
+                k + 1, p['id'], p['name'], ''.join(u'<td>%s</td>' % v for v in vals)))
+            if k == 7:
+                # traded during the season: a row for the other team and the total
+                for (other, vals2) in [('HPK', vals), (u'Yht.', vals)]:
+                    rows.append(u'<tr><td></td><td class="ta-l"><a href="/fi/pelaajat/%s">%s</a></td>%s</tr>' % (
+                        p['id'], p['name'], ''.join(u'<td>%s</td>' % v for v in [other] + vals2[1:])))
+        body = (u'<form><select name="season"><option value="2019-2020">2019-2020</option></select>'
+                u'<select name="team"><option value="">Kaikki</option>%s</select></form>'
+                u'<div id="stats-wrapper"><table id="stats"><thead><tr><th>#</th></tr></thead><tbody>%s</tbody></table></div>' % (opts, ''.join(rows)))
+        return chrome(u'Pelaajatilastot', body)
+
+    def timetable(self, years, serie, players=20):
+        rnd = self.random
+        opts = u''.join(u'<option value="%s">%s</option>' % (i, n) for n, i in TEAMS)
+        rows = []
+        k = 0
+        tm = lambda: '%d:%02d' % (rnd.randint(0, 22), rnd.randint(0, 59))
+        for (tname, tid) in TEAMS:
+            for p in self.roster(tid, max(22, players))[:players]:
+                k += 1
+                vals = [tname, p['pos'], '<strong>%d</strong>' % rnd.randint(1, 60), tm(), rnd.randint(10, 30),
+                        tm(), tm(), tm(), tm(), tm(), tm(), tm()]
+                rows.append(u'<tr><td>%d</td><td class="ta-l"><a href="/fi/pelaajat/%s">%s</a></td>%s</tr>' % (
+                    k, p['id'], p['name'], ''.join(u'<td>%s</td>' % v for v in vals)))
+        body = (u'<form><select name="team"><option value="">Kaikki</option>%s</select></form>'
+                u'<div id="stats-wrapper"><table id="stats"><thead><tr><th>#</th></tr></thead><tbody>%s</tbody></table></div>' % (opts, ''.join(rows)))
+        return chrome(u'Peliaikatilastot', body)
+
+    def profile(self, p, team):
+        rnd = self.random
+        info = u''.join(u'<tr><th>%s</th><td>%s</td></tr>' % kv for kv in [
+            ('Pelipaikka', u'Hyökkääjä'), ('Syntynyt', '14.3.1994'), ('Kansalaisuus', 'FIN'),
+            (u'Syntymäpaikka', 'Turku'), ('Pituus', '183'), ('Paino', '88'), ('Maila', 'L')])
+
+        def season(y, t, series, first=True):
+            vals = [rnd.randint(1, 60), rnd.randint(0, 20), rnd.randint(0, 30)]
+            vals = vals + [vals[1] + vals[2], rnd.randint(0, 40), rnd.randint(0, 30), rnd.randint(0, 30), rnd.randint(-10, 10),
+                           rnd.randint(0, 6), rnd.randint(0, 2), rnd.randint(0, 4), rnd.randint(20, 150)]
+            vals.append(('%.1f' % (100.0 * vals[1] / vals[-1])).replace('.', ','))
+            return u'<tr><td>%s</td><td>%s</td><td>%s</td>%s</tr>' % (y if first else '&nbsp;', t, series, ''.join(u'<td>%s</td>' % v for v in vals))
+        regular = [season('2012-2013', 'TPS', 'Mestis'), season('2013-2014', 'TPS', 'FIN'), season('2014-2015', 'TPS', 'FIN'),
+                   season('2015-2016', 'Ilves', 'FIN'), season('2016-2017', 'Ilves', 'FIN'), season('2017-2018', 'SaiPa', 'FIN'),
+                   season('2017-2018', 'TPS', 'FIN', first=False), season('2018-2019', 'TPS', 'FIN'), season('2019-2020', 'TPS', 'FIN')]
+        playoffs = [season('2014-2015', 'TPS', 'FIN'), season('2016-2017', 'Ilves', 'FIN'), season('2018-2019', 'TPS', 'FIN')]
+        total = u'<tr><td>Yhteensä</td><td></td><td></td></tr>'
+        stats = u''.join(u'<table class="player-career"><thead class="header"><tr><th>%s</th></tr></thead><table><tbody>%s%s</tbody></table></table>' % (
+            name, ''.join(rows), total) for (name, rows) in [('Runkosarja', regular), ('Playoffs', playoffs)])
+        body = (u'<h1>#%d %s</h1><table id="player-info">%s</table><div id="stats-section">%s</div>' % (
+            p['number'], p['nname'], info, stats))
+        return chrome(p['nname'], body)
+
+    def teamstats(self, years, serie):
+        # one table for every stats_type: attendance in td 4, penalty
+        # minutes in <strong> in td 9
+        rnd = self.random
+        rows = []
+        for (k, (tname, tid)) in enumerate(TEAMS):
+            vals = [rnd.randint(50, 60), rnd.randint(2000, 13000), rnd.randint(20, 60), rnd.randint(100, 300),
+                    rnd.randint(10, 40), rnd.randint(100, 300), rnd.randint(5, 30), '<strong>%d</strong>' % rnd.randint(300, 900),
+                    rnd.randint(10, 25), rnd.randint(2000, 13000)]
+            rows.append(u'<tr><td>%d</td><td class="ta-l separator">%s</td><td>%d</td>%s</tr>' % (
+                k + 1, tname, vals[0], ''.join(u'<td>%s</td>' % v for v in vals[1:])))
+        body = (u'<form><select name="season"><option value="%s">%s</option></select></form>'
+                u'<div id="stats-wrapper"><table id="stats"><thead><tr><th>#</th></tr></thead><tbody>%s</tbody></table></div>' % (years, years, ''.join(rows)))
+        return chrome(u'Joukkuetilastot', body)
+
+    def corpus(self):
+        # the pages of bench/corpus: (name, url, content, args)
+        base = 'http://liiga.fi/ottelut/2019-2020/runkosarja/'
+        yield ('schedule', base, self.schedule('2019-2020', 'runkosarja', 450), {})
+
+        (s, k, t) = self.gamepages(('TPS', 'tps'), ('HIFK', 'hifk'), '4 - 3', '(2-1, 0-1, 1-1, 0-0, 1-0)',
+                                   '65:00 VL', 11234, 4, REGULAR, SHOOTOUT)
+        args = dict(gameno=1, date='20190910', teams=['TPS', 'HIFK'])
+        yield ('game-seuranta', base + '1/seuranta/', s, args)
+        yield ('game-kokoonpanot', base + '1/kokoonpanot/', k, {})
+        yield ('game-tilastot', base + '1/tilastot/', t, {})
+
+        (s, k, t) = self.gamepages(('Tappara', 'tappara'), (u'Kärpät', 'karpat'), '3 - 2', '(1-1, 1-0, 0-1, 0-0, 1-0)',
+                                   '87:12 JA', 13455, 5, PLAYOFFS)
+        pourl = 'http://liiga.fi/ottelut/2019-2020/playoffs/903/'
+        args = dict(gameno=903, date='20190410', teams=['Tappara', u'Kärpät'], playoffs=True, seriesgameno=3)
+        yield ('playoffs-seuranta', pourl + 'seuranta/', s, args)
+        yield ('playoffs-kokoonpanot', pourl + 'kokoonpanot/', k, {})
+        yield ('playoffs-tilastot', pourl + 'tilastot/', t, {})
+
+        yield ('players', 'http://liiga.fi/tilastot/2019-2020/runkosarja/pelaajat/?team=tps&position=all&player_stats=players&sort=P#stats-wrapper',
+               self.playertable('2019-2020', 'runkosarja', 'tps'),
+               dict(teamid='tps', teamname='TPS', season='2019-2020', playoffs=False))
+        p = self.roster('tps')[3]
+        yield ('profile', 'http://liiga.fi/fi/pelaajat/%s' % p['id'], self.profile(p, 'TPS'), dict(playerid=p['id']))
+        yield ('times', 'http://liiga.fi/tilastot/2019-2020/runkosarja/pelaajat/?team=&position=all&home_away=&player_stats=time_on_ice&sort=O#stats-wrapper',
+               self.timetable('2019-2020', 'runkosarja'), dict(season=2020, serie='runkosarja'))
+        yield ('teamstats', 'http://liiga.fi/tilastot/2019-2020/runkosarja/joukkueet/?stats_type=yleisomaara&home_away=&sort=#stats-wrapper',
+               self.teamstats('2019-2020', 'runkosarja'), {})
+
+
+class SyntheticSeason(object):
+    # The schedule and game pages of a generated season, as the pages of a
+    # liigacrawl.StaticPages engine. The pages of pool distinct games are
+    # repeated over the season, so a season of any size takes the memory of
+    # pool games.
+
+    def __init__(self, generator, games=450, pool=20, years='2019-2020', **gameargs):
+        self.years = years
+        self.url = 'http://liiga.fi/ottelut/%s/runkosarja/' % years
+        self.schedule = generator.schedule(years, 'runkosarja', games).encode('utf-8')
+        self.pool = []
+        for gameno in range(pool):
+            (home, away) = generator.pairing(gameno)
+            pages = generator.game(home, away, **gameargs)
+            self.pool.append(dict(zip(['seuranta', 'kokoonpanot', 'tilastot'], [p.encode('utf-8') for p in pages])))
+
+    def __getitem__(self, url):
+        if url == self.url:
+            return self.schedule
+        m = gamere.search(url)
+        if m is None or m.group(1) != self.years:
+            raise KeyError(url)
+        return self.pool[int(m.group(3)) % len(self.pool)][m.group(4)]
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    out = options.get('out', os.path.join(benchdir, 'corpus'))
+    generator = PageGenerator(int(options.get('seed', 2019)))
+
+    os.makedirs(out, exist_ok=True)
+    manifest = {}
+    for (name, url, content, args) in generator.corpus():
+        data = content.encode('utf-8')
+        with open(os.path.join(out, name + '.html'), 'wb') as fp:
+            fp.write(data)
+        manifest[name] = dict(url=url, file=name + '.html', sha1=hashlib.sha1(data).hexdigest(), source='synthetic')
+        if args:
+            manifest[name]['args'] = args
+        print("%-22s %8d bytes %s" % (name, len(data), url))
+
+    with open(os.path.join(out, 'manifest.json'), 'w') as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True, ensure_ascii=False)
+        fp.write('\n')
@@ -7,47 +7,33 @@ try:
 	import urlparse
 except ImportError:
 	import urllib.parse as urlparse
-import requests
-import json
 import sys
+import liigafetch
+import liigarecords
+import liigasinks
 
 from lxml import html
 
 
-class ParserData(object):
-    
-    def __init__(self, **values):
-        self.__values = values
-        self.__values['type'] = self.type
-        for attr in values:
-            setattr(self, attr, values[attr])
-
-    def __setattr__(self, attr, value):
-        if not attr.startswith('_'):
-            self.__values[attr] = value
-        super(ParserData, self).__setattr__(attr, value)
-    
-    def tojson(self):
-        return json.dumps(self.__values, sort_keys=True)
-
-    def __str__(self):
-        return str(self.values)
-
-
-class SeasonData(ParserData):
+class SeasonData(liigarecords.ParserData):
     type = 'season'
+    __slots__ = ('id', 'years')
 
-class TeamData(ParserData):
+class TeamData(liigarecords.ParserData):
     type = 'team'
+    __slots__ = ('name', 'id')
 
-class GameData(ParserData):
+class GameData(liigarecords.ParserData):
     type = 'game'
+    __slots__ = ('id', 'number', 'identifier', 'date', 'time', 'season',
+                 'hometeam', 'awayteam')
 
 
 class LGParser(object):
 
-    def __init__(self, url):
+    def __init__(self, url, transport=None):
         self.url = url
+        self.transport = transport or liigafetch.transport
 
     def getseason(self, url):
         for p in url.split('/'):
@@ -57,8 +43,7 @@ class LGParser(object):
 
 
     def parseseason(self):
-        r = requests.get(self.url)
-        page = html.fromstring(r.content)
+        page = html.fromstring(self.transport.fetch(self.url))
 
         self.season = self.getseason(self.url)
 
@@ -127,18 +112,22 @@ class LGParser(object):
 
 
 if __name__ == "__main__":
-    urltype = sys.argv[1]
-    url = sys.argv[2]
-
-    parser = LGParser(url)
-    if urltype == 'season':
-        for event in parser.parseseason():
-            print(event.tojson())
-    elif urltype == 'playoffs':
-        for event in parser.parseplayoffs():
-            print(event.tojson())
-    elif urltype == 'game':
-        for event in parser.parsegameurl():
-            print(event.tojson())
-        
-        
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        urltype = sys.argv[1]
+        url = sys.argv[2]
+
+        parser = LGParser(url)
+        if urltype == 'season':
+            for event in parser.parseseason():
+                sink.write(event)
+        elif urltype == 'playoffs':
+            for event in parser.parseplayoffs():
+                sink.write(event)
+        elif urltype == 'game':
+            for event in parser.parsegameurl():
+                sink.write(event)
+    finally:
+        sink.close()
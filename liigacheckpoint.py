@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import json
+import os
+import sys
+import time
+
+
+class Checkpoint(object):
+    # Progress of a long crawl: the units it has completed (a year of
+    # history, a season, a player, a goalkeeper table) and the position of
+    # the sink after their records. A unit is done once all of its records
+    # have been given to the sink. The checkpoint is saved when a unit is
+    # done and interval seconds have passed, and load() goes back to it:
+    # done units are skipped and the sink drops what was written after it.
+    # Functions in saves are called with every save, for state that has to
+    # match the output (the player registry). The file has the checkpoints
+    # of several crawls by their command and arguments.
+
+    def __init__(self, path, command, sink, interval=30):
+        self.path = path
+        self.command = command
+        self.sink = sink
+        self.interval = interval
+        self.units = set()
+        self.saves = []
+        self.saved = time.monotonic()
+
+    def __contains__(self, unit):
+        return unit in self.units
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as fp:
+            return json.load(fp)
+
+    def write(self, states):
+        if not states:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmpname = self.path + '.tmp'
+        with open(tmpname, 'w') as fp:
+            json.dump(states, fp, sort_keys=True)
+        os.replace(tmpname, self.path)
+
+    def load(self):
+        state = self.read().get(self.command)
+        if state is None:
+            return False
+        self.units = set(state['units'])
+        self.sink.resume(state['position'])
+        sys.stderr.write("Resuming from %s, %d units done\n" % (state['time'], len(self.units)))
+        return True
+
+    def done(self, unit):
+        self.units.add(unit)
+        if time.monotonic() - self.saved >= self.interval:
+            self.save()
+
+    def save(self):
+        states = self.read()
+        states[self.command] = dict(
+            units=sorted(self.units),
+            position=self.sink.checkpoint(),
+            time=datetime.datetime.now().isoformat(timespec='seconds'),
+        )
+        self.write(states)
+        # after the checkpoint, state behind it only repeats work
+        for save in self.saves:
+            save()
+        self.saved = time.monotonic()
+
+    def finish(self):
+        # the crawl is complete, the next one starts from the beginning
+        states = self.read()
+        if states.pop(self.command, None) is not None:
+            self.write(states)
+
+
+def skip(checkpoint, unit):
+    return checkpoint is not None and unit in checkpoint
+
+
+def done(checkpoint, unit):
+    if checkpoint is not None:
+        checkpoint.done(unit)
+
+
+def finish(checkpoint):
+    if checkpoint is not None:
+        checkpoint.finish()
+
+
+def configure(options, command, sink):
+    # without --checkpoint=FILE nothing is saved
+    path = options.get('checkpoint')
+    if not path:
+        if options.get('resume'):
+            raise Exception("--resume needs --checkpoint=FILE")
+        return None
+    if path is True:
+        raise Exception("--checkpoint needs a file: --checkpoint=FILE")
+    checkpoint = Checkpoint(path, command, sink, interval=float(options.get('checkpoint-interval', 30)))
+    if options.get('resume'):
+        checkpoint.load()
+    return checkpoint
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import collections
+import threading
+import urllib.parse
+import liigafetch
+import liigatrace
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class CrawlEngine(object):
+    # Downloads pages in a thread pool for each host with perhost threads,
+    # so at most perhost requests to a host are running at a time. Parsers
+    # stay synchronous generators: they tell the engine which pages they
+    # will need next with prefetch() and get them in their own order with
+    # get(), so output order does not depend on the order downloads complete.
+
+    def __init__(self, transport=None, perhost=6):
+        self.transport = transport or liigafetch.transport
+        self.perhost = perhost
+        self.pending = {}
+        self.executors = {}
+        self.lock = threading.RLock()
+        # functions called with (url, page, error) in the thread getting
+        # a page, see liigaquarantine
+        self.fetched = []
+
+    def close(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending = {}
+            for executor in self.executors.values():
+                executor.shutdown(wait=False)
+            self.executors = {}
+
+    def executor(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.executors:
+                self.executors[host] = ThreadPoolExecutor(max_workers=self.perhost,
+                                                          thread_name_prefix='crawl-%s' % host)
+            return self.executors[host]
+
+    def submit(self, url):
+        return self.executor(url).submit(self.transport.get, url)
+
+    def prefetch(self, url):
+        with self.lock:
+            if url not in self.pending:
+                self.pending[url] = self.submit(url)
+
+    def discard(self, urls):
+        with self.lock:
+            for url in urls:
+                future = self.pending.pop(url, None)
+                if future is not None:
+                    future.cancel()
+
+    def get(self, url):
+        with self.lock:
+            future = self.pending.pop(url, None)
+        if future is None:
+            future = self.submit(url)
+        with liigatrace.span('wait', 'fetch', url=url):
+            try:
+                page = future.result()
+            except Exception as e:
+                for fetched in self.fetched:
+                    fetched(url, None, e)
+                raise
+        for fetched in self.fetched:
+            fetched(url, page, None)
+        return page
+
+    def fetch(self, url):
+        return self.get(url).content
+
+    def extract(self, page, key, func):
+        return self.transport.extract(page, key, func)
+
+    def window(self, items, urls, ahead):
+        # yields items in order while the pages urls(item) of the next
+        # ahead items are being downloaded. Pages of passed items that were
+        # not asked for (skipped games) are dropped, so at most ahead+1
+        # items' pages are held.
+        items = list(items)
+        submitted = set()
+        itemurls = collections.deque()
+        try:
+            for i, item in enumerate(items):
+                for upcoming in items[len(itemurls)+i:i+ahead+1]:
+                    added = [url for url in urls(upcoming) if url not in submitted]
+                    for url in added:
+                        submitted.add(url)
+                        self.prefetch(url)
+                    itemurls.append(added)
+                yield item
+                self.discard(itemurls.popleft())
+        finally:
+            self.discard(submitted)
+
+
+class StaticPages(object):
+    # Engine stand-in that serves pages which were downloaded elsewhere
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = []
+
+    def get(self, url):
+        page = liigafetch.Page(url, self.pages[url])
+        for fetched in self.fetched:
+            fetched(url, page, None)
+        return page
+
+    def fetch(self, url):
+        return self.get(url).content
+
+    def window(self, items, urls, ahead):
+        return iter(items)
+
+
+class ParsePool(object):
+    # Runs page extraction in worker processes. func must be a module level
+    # function taking and returning plain data; results come back in the
+    # order the arguments were given. With procs < 2 everything runs inline.
+
+    def __init__(self, procs=0):
+        self.procs = procs
+        self.executor = None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def map(self, func, argsiter, ahead=4):
+        if self.procs < 2:
+            for args in argsiter:
+                yield func(*args)
+            return
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.procs)
+        pending = collections.deque()
+        try:
+            for args in argsiter:
+                pending.append(self.executor.submit(func, *args))
+                while len(pending) > max(ahead, self.procs):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
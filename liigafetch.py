@@ -0,0 +1,572 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import atexit
+import datetime
+import email.utils
+import hashlib
+import os
+import pickle
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+import liigatrace
+import requests
+
+from collections import OrderedDict
+from lxml import html
+
+try:
+    import brotli
+    ENCODINGS = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi
+        ENCODINGS = 'gzip, deflate, br'
+    except ImportError:
+        ENCODINGS = 'gzip, deflate'
+
+
+# Cache lifetime in seconds per url class, None never expires
+TTLS = {
+    'past': None,
+    'current': 10*60,
+    'player': 3*24*60*60,
+    'other': 60*60,
+}
+
+# Request limits per limit class: a token bucket of burst tokens refilled
+# at rate requests per second, and a window of concurrent requests that
+# starts at window and grows up to maxwindow while the host answers well
+LIMITS = {
+    'game': dict(rate=10.0, burst=10, window=2, maxwindow=16),
+    'stats': dict(rate=2.0, burst=4, window=1, maxwindow=4),
+    'player': dict(rate=10.0, burst=10, window=2, maxwindow=16),
+    'other': dict(rate=5.0, burst=5, window=1, maxwindow=8),
+}
+
+# latency counts as rising when its average is this many times, and more
+# than LATENCYSLACK seconds over, the lowest average seen
+LATENCYFACTOR = 2.0
+LATENCYSLACK = 0.05
+# seconds to hold a host after a 429 without Retry-After
+THROTTLEPAUSE = 1.0
+
+# answers and errors worth sending the request again for
+RETRYSTATUS = (429, 500, 502, 503, 504)
+TRANSIENT = (requests.ConnectionError, requests.Timeout)
+
+# hosts whose pages --site fetches from another server
+SITEHOSTS = ('liiga.fi', 'www.liiga.fi')
+
+seasonre = re.compile(r'/((?:19|20)\d\d)-((?:19|20)\d\d)/')
+
+
+def currentseason(today=None):
+    today = today or datetime.date.today()
+    if today.month >= 7:
+        return today.year + 1
+    return today.year
+
+
+def urlseason(url):
+    m = seasonre.search(url)
+    if m:
+        return int(m.group(2))
+
+
+def urlclass(url):
+    path = url.split('//', 1)[-1]
+    if '/fi/pelaajat/' in path:
+        return 'player'
+    if '/ottelut/' in path or '/tilastot/' in path:
+        season = urlseason(path)
+        if season and season < currentseason():
+            return 'past'
+        return 'current'
+    return 'other'
+
+
+def limitclass(url):
+    path = url.split('//', 1)[-1]
+    if '/ottelut/' in path:
+        return 'game'
+    if '/tilastot/' in path:
+        return 'stats'
+    if '/fi/pelaajat/' in path:
+        return 'player'
+    return 'other'
+
+
+def retryafter(value):
+    # seconds from a Retry-After header, given in seconds or as a date
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class HostLimit(object):
+    # Requests of one limit class to one host. A request needs a token and
+    # a free place in the window. The window grows by one per window of
+    # good answers and is halved on 429, 5xx, failed requests and rising
+    # latency, at most once per round trip.
+
+    def __init__(self, host, name, rate, burst, window, maxwindow):
+        self.host = host
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.window = float(min(window, maxwindow))
+        self.maxwindow = maxwindow
+        self.cond = threading.Condition()
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.inflight = 0
+        self.until = 0.0
+        self.latency = None
+        self.baseline = None
+        self.decreased = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self.refill(now)
+                wait = self.until - now
+                if wait <= 0 and self.inflight < int(self.window):
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.inflight += 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.cond.wait(wait if wait > 0 else None)
+
+    def release(self, status, latency, pause=None):
+        with self.cond:
+            now = time.monotonic()
+            self.inflight -= 1
+            self.requests += 1
+            if status == 429:
+                self.throttled += 1
+                self.until = max(self.until, now + (THROTTLEPAUSE if pause is None else pause))
+                self.decrease(now)
+            elif status is None or status >= 500:
+                self.errors += 1
+                if pause is not None:
+                    self.until = max(self.until, now + pause)
+                self.decrease(now)
+            else:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency = 0.8 * self.latency + 0.2 * latency
+                # the baseline creeps up so a lasting change becomes normal
+                if self.baseline is None or self.latency < self.baseline:
+                    self.baseline = self.latency
+                else:
+                    self.baseline *= 1.01
+                if self.latency > max(self.baseline * LATENCYFACTOR, self.baseline + LATENCYSLACK):
+                    self.decrease(now)
+                else:
+                    self.window = min(self.maxwindow, self.window + 1.0 / self.window)
+            liigatrace.counter('window %s %s' % (self.host, self.name),
+                               window=round(self.window, 2), inflight=self.inflight)
+            self.cond.notify_all()
+
+    def decrease(self, now):
+        if now - self.decreased < (self.latency or 0):
+            return
+        self.window = max(1.0, self.window / 2)
+        self.decreased = now
+
+    def stats(self):
+        with self.cond:
+            return dict(
+                host=self.host,
+                limitclass=self.name,
+                rate=self.rate,
+                burst=self.burst,
+                maxwindow=self.maxwindow,
+                window=round(self.window, 2),
+                inflight=self.inflight,
+                latency=self.latency and round(self.latency, 3),
+                requests=self.requests,
+                throttled=self.throttled,
+                errors=self.errors,
+                held=round(max(self.until - time.monotonic(), 0), 1),
+            )
+
+
+class RateLimiter(object):
+    # HostLimits by host and limit class, limits overrides LIMITS per class
+
+    def __init__(self, limits=None):
+        self.limits = {}
+        for (name, values) in LIMITS.items():
+            self.limits[name] = dict(values, **(limits or {}).get(name, {}))
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def limit(self, url):
+        key = (urllib.parse.urlsplit(url).netloc, limitclass(url))
+        with self.lock:
+            limit = self.hosts.get(key)
+            if limit is None:
+                limit = self.hosts[key] = HostLimit(key[0], key[1], **self.limits[key[1]])
+        return limit
+
+    def stats(self):
+        with self.lock:
+            limits = [self.hosts[key] for key in sorted(self.hosts)]
+        return [l.stats() for l in limits]
+
+    def report(self, out):
+        out.write("%-20s %-7s %6s %6s %7s %9s %8s %9s %6s\n" % (
+            'host', 'class', 'rate', 'window', 'max', 'latency', 'requests', 'throttled', 'errors'))
+        for s in self.stats():
+            out.write("%-20s %-7s %6.1f %6.2f %7d %9s %8d %9d %6d\n" % (
+                s['host'], s['limitclass'], s['rate'], s['window'], s['maxwindow'],
+                '-' if s['latency'] is None else '%.3f' % s['latency'],
+                s['requests'], s['throttled'], s['errors']))
+
+
+class ResponseCache(object):
+
+    def __init__(self, path, maxsize=2*1024**3, memitems=128, membytes=4*1024**2, ttls=None, offline=False):
+        self.path = path
+        self.maxsize = maxsize
+        # recently used entries are kept in memory, at most memitems of
+        # them and membytes of content
+        self.memitems = memitems
+        self.membytes = membytes
+        self.memsize = 0
+        self.ttls = dict(TTLS, **(ttls or {}))
+        self.offline = offline
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = None
+
+    def filename(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key[:2], key)
+
+    def expired(self, entry):
+        if self.offline:
+            return False
+        ttl = self.ttls.get(urlclass(entry['url']))
+        if ttl is None:
+            return False
+        return entry['time'] + ttl < time.time()
+
+    def remember(self, url, entry):
+        with self.lock:
+            old = self.memory.pop(url, None)
+            if old is not None:
+                self.memsize -= len(old['content'])
+            self.memory[url] = entry
+            self.memsize += len(entry['content'])
+            while self.memory and (len(self.memory) > self.memitems or self.memsize > self.membytes):
+                (_, old) = self.memory.popitem(last=False)
+                self.memsize -= len(old['content'])
+
+    def get(self, url, stale=False):
+        with self.lock:
+            entry = self.memory.get(url)
+            if entry is not None:
+                self.memory.move_to_end(url)
+
+        if entry is None:
+            try:
+                with open(self.filename(url), 'rb') as fp:
+                    entry = pickle.loads(zlib.decompress(fp.read()))
+            except (IOError, OSError, ValueError, zlib.error, pickle.UnpicklingError, EOFError):
+                return None
+            if entry.get('url') != url:
+                return None
+            self.remember(url, entry)
+
+        if not stale and self.expired(entry):
+            return None
+        return entry
+
+    def put(self, url, content, **meta):
+        entry = dict(meta, url=url, time=time.time(), content=content)
+        data = zlib.compress(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+        filename = self.filename(url)
+        dirname = os.path.dirname(filename)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, exist_ok=True)
+
+        try:
+            oldsize = os.path.getsize(filename)
+        except OSError:
+            oldsize = 0
+
+        (fd, tmpname) = tempfile.mkstemp(dir=dirname)
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmpname, filename)
+
+        self.remember(url, entry)
+        self.account(len(data) - oldsize)
+        return entry
+
+    def files(self):
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for f in filenames:
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield (st.st_mtime, st.st_size, path)
+
+    def account(self, delta):
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for (_, size, _) in self.files())
+            else:
+                self.size += delta
+            if self.size <= self.maxsize:
+                return
+            # evict the least recently written entries down to 90% of maxsize
+            for (_, size, path) in sorted(self.files()):
+                if self.size <= self.maxsize * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.size -= size
+            self.memory.clear()
+            self.memsize = 0
+
+
+def parsepage(content, url=None):
+    with liigatrace.span('parse', 'parse', url=url, bytes=len(content)):
+        return html.fromstring(content)
+
+
+class Page(object):
+
+    def __init__(self, url, content, modified=True):
+        self.url = url
+        self.content = content
+        # False when content is the same as in the previous fetch
+        self.modified = modified
+
+
+class Transport(object):
+    # Shared HTTP access for all parsers: one pooled keep-alive session, the
+    # optional response cache and the optional rate limiter. Anything with a
+    # requests compatible get(url, headers=...) can be passed as session.
+    # Throttled requests, server errors and failed connections are tried
+    # again up to retries times, after backoff seconds doubling each time
+    # or the Retry-After of the answer. With site (like http://127.0.0.1:8000)
+    # liiga.fi pages are requested from there, urls and the cache keep the
+    # liiga.fi addresses.
+
+    def __init__(self, poolsize=10, session=None, cache=None, limiter=None, retries=3, backoff=0.5,
+                 site=None):
+        self.cache = cache
+        self.session = session or self.newsession(poolsize)
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.site = site.rstrip('/') if site else None
+
+    @classmethod
+    def newsession(self, poolsize):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=poolsize, pool_maxsize=poolsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Accept-Encoding'] = ENCODINGS
+        return session
+
+    def siteurl(self, url):
+        if self.site is None:
+            return url
+        parts = urllib.parse.urlsplit(url)
+        if parts.netloc not in SITEHOSTS:
+            return url
+        return self.site + urllib.parse.urlunsplit(('', '', parts.path, parts.query, ''))
+
+    def request(self, url, headers=None):
+        with liigatrace.span('request', 'fetch', url=url) as span:
+            limit = None
+            if self.limiter is not None:
+                limit = self.limiter.limit(url)
+            target = self.siteurl(url)
+            attempt = 0
+            while True:
+                pause = None
+                if limit is not None:
+                    limit.acquire()
+                start = time.monotonic()
+                try:
+                    r = self.session.get(target, headers=headers)
+                except Exception as e:
+                    if limit is not None:
+                        limit.release(None, time.monotonic() - start)
+                    if not isinstance(e, TRANSIENT) or attempt >= self.retries:
+                        raise
+                else:
+                    pause = retryafter(r.headers.get('Retry-After'))
+                    if limit is not None:
+                        limit.release(r.status_code, time.monotonic() - start, pause)
+                    if r.status_code not in RETRYSTATUS:
+                        break
+                    if attempt >= self.retries:
+                        raise Exception("HTTP %d after %d attempts: %s" % (r.status_code, attempt+1, url))
+                attempt += 1
+                delay = self.backoff * 2**(attempt-1) * random.uniform(0.5, 1.0)
+                time.sleep(max(delay, pause or 0))
+            span.set(status=r.status_code, attempts=attempt+1)
+            if limit is not None:
+                span.set(window=round(limit.window, 2))
+            return r
+
+    def get(self, url, revalidate=False):
+        # with revalidate a cached page is asked from the server again even
+        # when it has not expired
+        with liigatrace.span('fetch', 'fetch', url=url) as span:
+            page = self.load(url, revalidate)
+            if span:
+                span.set(urlclass=urlclass(url), bytes=len(page.content), modified=page.modified)
+            return page
+
+    def load(self, url, revalidate=False):
+        cache = self.cache
+        if cache is None:
+            r = self.request(url)
+            return Page(url, r.content)
+
+        entry = None if revalidate else cache.get(url)
+        if entry is not None:
+            return Page(url, entry['content'], modified=False)
+
+        old = cache.get(url, stale=True)
+        if cache.offline:
+            if old is None:
+                raise Exception("Offline and not in cache: %s" % url)
+            return Page(url, old['content'], modified=False)
+
+        headers = {}
+        if old is not None:
+            if old.get('etag'):
+                headers['If-None-Match'] = old['etag']
+            if old.get('lastmodified'):
+                headers['If-Modified-Since'] = old['lastmodified']
+
+        r = self.request(url, headers=headers)
+        if r.status_code == 304 and old is not None:
+            cache.put(url, old['content'], etag=old.get('etag'), lastmodified=old.get('lastmodified'))
+            return Page(url, old['content'], modified=False)
+
+        if r.status_code == 200:
+            cache.put(url, r.content,
+                      etag=r.headers.get('ETag'),
+                      lastmodified=r.headers.get('Last-Modified'))
+        modified = old is None or old['content'] != r.content
+        return Page(url, r.content, modified=modified)
+
+    def fetch(self, url):
+        return self.get(url).content
+
+    def extract(self, page, key, func):
+        # func(tree) records are stored with the page and reused as long as
+        # the page does not change, so unchanged pages are not parsed again
+        with liigatrace.span('extract', 'parse', url=page.url, key=key) as span:
+            cache = self.cache
+            recordsurl = 'records:%s:%s' % (key, page.url)
+            if cache is not None and not page.modified:
+                entry = cache.get(recordsurl, stale=True)
+                if entry is not None:
+                    try:
+                        records = pickle.loads(entry['content'])
+                        span.set(records=len(records), cached=True)
+                        return records
+                    except Exception:
+                        pass
+
+            records = list(func(parsepage(page.content, page.url)))
+            if cache is not None:
+                cache.put(recordsurl, pickle.dumps(records, pickle.HIGHEST_PROTOCOL))
+            span.set(records=len(records), cached=False)
+            return records
+
+
+transport = Transport()
+
+
+def configure(options):
+    global transport
+    liigatrace.configure(options)
+    cache = None
+    if not options.get('no-cache'):
+        path = options.get('cache') or os.environ.get('LIIGADATA_CACHE') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'liigadata')
+        maxsize = int(options.get('cache-size', 2048)) * 1024**2
+        membytes = int(options.get('cache-memory', 4)) * 1024**2
+        cache = ResponseCache(path, maxsize=maxsize, membytes=membytes, offline=bool(options.get('offline')))
+    limiter = None
+    if not options.get('no-limit'):
+        limits = {}
+        for (option, name, cast) in [('rate', 'rate', float), ('burst', 'burst', int),
+                                     ('max-window', 'maxwindow', int)]:
+            if options.get(option):
+                for (limit, value) in classvalues(options[option]).items():
+                    limits.setdefault(limit, {})[name] = cast(value)
+        limiter = RateLimiter(limits)
+        if options.get('limits'):
+            atexit.register(limiter.report, sys.stderr)
+    transport = Transport(poolsize=int(options.get('pool', 10)), cache=cache, limiter=limiter,
+                          retries=int(options.get('retries', 3)), site=options.get('site'))
+    return transport
+
+
+def classvalues(value):
+    # "8" for every limit class or "game:8,stats:2"
+    if ':' not in value:
+        return dict((name, value) for name in LIMITS)
+    values = {}
+    for part in value.split(','):
+        (name, _, v) = part.partition(':')
+        if name not in LIMITS:
+            raise Exception("Unknown limit class %s, should be one of %s" % (name, ', '.join(sorted(LIMITS))))
+        values[name] = v
+    return values
+
+
+def getoptions(argv):
+    args = []
+    options = {}
+    for a in argv:
+        if a.startswith('--'):
+            (name, _, value) = a[2:].partition('=')
+            options[name] = value or True
+        else:
+            args.append(a)
+    return args, options
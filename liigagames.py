@@ -4,50 +4,69 @@
 
 import datetime
 import urllib
-import requests
-import json
 import sys
+import liigacheckpoint
+import liigacrawl
+import liigafetch
+import liigaquarantine
+import liigarecords
+import liigasinks
+import liigatrace
 
-from lxml import html
 
-
-class ParserData(object):
-    
-    def __init__(self, **values):
-        self.__values = values
-        self.__values['type'] = self.type
-        for attr in values:
-            setattr(self, attr, values[attr])
-
-    def __setattr__(self, attr, value):
-        if not attr.startswith('_'):
-            self.__values[attr] = value
-        super(ParserData, self).__setattr__(attr, value)
-    
-    def tojson(self):
-        return json.dumps(self.__values, sort_keys=True)
-
-    def __str__(self):
-        return str(self.__values)
-
-
-class SeasonData(ParserData):
+class SeasonData(liigarecords.ParserData):
     type = 'season'
+    __slots__ = ('id', 'years')
 
-class TeamData(ParserData):
+class TeamData(liigarecords.ParserData):
     type = 'team'
+    __slots__ = ('name', 'id')
 
-class GameData(ParserData):
+class GameData(liigarecords.ParserData):
     type = 'game'
+    __slots__ = ('id', 'number', 'identifier', 'date', 'time', 'season',
+                 'playoffs', 'home', 'away', 'score', 'resultattr')
 
-class TeamStatData(ParserData):
+class TeamStatData(liigarecords.ParserData):
     type = 'teamstat'
+    __slots__ = ('team', 'season', 'attendance', 'minutes', 'ppgoals')
 
 
 class LGParser(object):
+    seasonurl = "http://liiga.fi/ottelut/%d-%d/runkosarja/"
+    playoffsurl = "http://liiga.fi/ottelut/%d-%d/playoffs/"
+    statsurl = "http://liiga.fi/tilastot/%d-%d/runkosarja/joukkueet/?stats_type=%s&home_away=&sort=#stats-wrapper"
+
+    stattypes = (
+        ('yleisomaara', 'attendance', (4, -1)),
+        ('rangaistukset', 'minutes', (9,)),
+        ('ylivoima', 'ppgoals', (4,)),
+    )
 
-    def __init__(self, url):
+    def __init__(self, url, transport=None, engine=None):
         self.url = url
+        self.transport = transport or liigafetch.transport
+        self.engine = engine or liigacrawl.CrawlEngine(self.transport)
+
+    @classmethod
+    def historyurls(self, year):
+        urls = [self.seasonurl % (year, year+1), self.playoffsurl % (year, year+1)]
+        for (s, _, _) in self.stattypes:
+            urls.append(self.statsurl % (year, year+1, s))
+        return urls
+
+    @classmethod
+    def parseyear(self, year, engine):
+        # the season, playoffs and statistics of one year of history
+        parser = self(self.seasonurl % (year, year+1), engine=engine)
+        for e in parser.parseseason():
+            yield e
+
+        for e in parser.parseplayoffs(self.playoffsurl % (year, year+1)):
+            yield e
+
+        for e in parser.getstats(year):
+            yield e
 
     def getseason(self, url):
         for p in url.split('/'):
@@ -60,8 +79,10 @@ class LGParser(object):
 
 
     def parseseason(self):
-        r = requests.get(self.url)
-        page = html.fromstring(r.content)
+        return liigatrace.records('season', 'season', self.seasonrecords(), url=self.url)
+
+    def seasonrecords(self):
+        page = liigafetch.parsepage(self.engine.fetch(self.url), url=self.url)
 
         self.season = self.getseason(self.url)
 
@@ -75,48 +96,28 @@ class LGParser(object):
 
 
     def parseplayoffs(self, url):
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        return liigatrace.records('playoffs', 'season', self.playoffsrecords(url), url=url)
+
+    def playoffsrecords(self, url):
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
 
         for e in self.getgames(page, playoffs=True):
             yield e
 
 
     def getstats(self, year):
-        baseurl = "http://liiga.fi/tilastot/%d-%d/runkosarja/joukkueet/?stats_type=%s&home_away=&sort=#stats-wrapper"
+        return liigatrace.records('stats', 'season', self.statsrecords(year), year=year)
 
+    def statsrecords(self, year):
         teams = {}
 
-        for s, attrname, tdnums in (
-                ('yleisomaara', 'attendance', (4, -1)),
-                ('rangaistukset', 'minutes', (9,)),
-                ('ylivoima', 'ppgoals', (4,)),
-        ):
-            url = baseurl % (year, year+1, s)
-            r = requests.get(url)
-            page = html.fromstring(r.content)
-
-            stats = page.xpath("//table[@id='stats']/tbody/tr")
-
-            for tr in stats:
-                teamnametd = tr.xpath("td[@class='ta-l separator']")
-                if not teamnametd:
-                    teamnametd = tr.xpath("td[@class='ta-l']")
-                teamname = teamnametd[0].text.strip()
-
-                tds = tr.xpath("td")
-                statvalue = None
-                
-                for tdnum in tdnums:
-                    if attrname == 'minutes':
-                        statelem = tds[tdnum].xpath("strong")[0]
-                    else:
-                        statelem = tds[tdnum]
-
-                    if statelem is not None and statelem.text and int(statelem.text):
-                        statvalue = statelem.text.strip()
-                        break
+        staturl = lambda stattype: [self.statsurl % (year, year+1, stattype[0])]
+        for s, attrname, tdnums in self.engine.window(self.stattypes, staturl, len(self.stattypes)):
+            url = self.statsurl % (year, year+1, s)
+            page = self.engine.get(url)
 
+            rows = self.engine.extract(page, attrname, lambda tree: self.getstatrows(tree, attrname, tdnums))
+            for (teamname, statvalue) in rows:
                 team = self.getteam(teamname)
 
                 ts = teams.setdefault(team, TeamStatData(team=team.id, season=self.season.years))
@@ -126,6 +127,30 @@ class LGParser(object):
         for t in teams.values():
             yield t
 
+    def getstatrows(self, page, attrname, tdnums):
+        stats = page.xpath("//table[@id='stats']/tbody/tr")
+
+        for tr in stats:
+            teamnametd = tr.xpath("td[@class='ta-l separator']")
+            if not teamnametd:
+                teamnametd = tr.xpath("td[@class='ta-l']")
+            teamname = teamnametd[0].text.strip()
+
+            tds = tr.xpath("td")
+            statvalue = None
+            
+            for tdnum in tdnums:
+                if attrname == 'minutes':
+                    statelem = tds[tdnum].xpath("strong")[0]
+                else:
+                    statelem = tds[tdnum]
+
+                if statelem is not None and statelem.text and int(statelem.text):
+                    statvalue = statelem.text.strip()
+                    break
+
+            yield (teamname, statvalue)
+
 
 
     def getteams(self, page):
@@ -200,7 +225,7 @@ class LGParser(object):
                 return
             homescore = int(scorelist[0])
             awayscore = int(scorelist[-1])
-            resultattr = tds[6].text.strip()
+            resultattr = (tds[6].text or '').strip()
             score = "%d-%d" % (int(homescore), int(awayscore))
             
             url = urllib.parse.urljoin(self.url, gameurl)
@@ -273,24 +298,36 @@ class LGParser(object):
 
 
 if __name__ == "__main__":
-    urltype = sys.argv[1]
-
-    if urltype == 'season':
-        url = sys.argv[2]
-        parser = LGParser(url)
-        for event in parser.parseseason():
-            print(event.tojson())
-    elif urltype == "history":
-        for i in range(1975, 2020):
-            url = "http://liiga.fi/ottelut/%d-%d/runkosarja/" % (i, i+1)
-            parser = LGParser(url)
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        urltype = sys.argv[1]
+
+        engine = liigacrawl.CrawlEngine(liigafetch.transport, perhost=int(options.get('workers', 6)))
+        quarantine = liigaquarantine.configure(options, 'liigagames', engine)
+
+        if urltype == 'season':
+            url = sys.argv[2]
+            parser = LGParser(url, engine=engine)
             for event in parser.parseseason():
-                print(event.tojson())
-            url = "http://liiga.fi/ottelut/%d-%d/playoffs/" % (i, i+1)
-
-            for event in parser.parseplayoffs(url):
-                print(event.tojson())
-
-            for event in parser.getstats(i):
-                print(event.tojson())
-            
+                sink.write(event)
+        elif urltype == "history":
+            checkpoint = liigacheckpoint.configure(options, 'liigagames %s' % ' '.join(sys.argv[1:]), sink)
+            years = [i for i in range(1975, 2020) if not liigacheckpoint.skip(checkpoint, 'year:%d' % i)]
+            # pages of the next season are downloaded while parsing the current one
+            for i in engine.window(years, LGParser.historyurls, 1):
+                records = liigaquarantine.isolate(quarantine, 'year', LGParser.parseyear(i, engine),
+                                                  LGParser.historyurls(i), year=i)
+                for event in records or []:
+                    sink.write(event)
+                liigacheckpoint.done(checkpoint, 'year:%d' % i)
+            liigacheckpoint.finish(checkpoint)
+        elif urltype == 'retry-quarantine':
+            if quarantine is None:
+                raise Exception("retry-quarantine needs --quarantine=FILE")
+            retryyear = lambda year: LGParser.parseyear(year, engine)
+            for event in quarantine.retry({'year': retryyear}):
+                sink.write(event)
+    finally:
+        sink.close()
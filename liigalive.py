@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import concurrent.futures
+import datetime
+import re
+import sys
+import time
+import urllib.parse
+import liigafetch
+import liigaparser
+import liigasinks
+import liigatrace
+
+
+# seconds between the polls of a game in each phase: late is the third
+# period, overtime and shootout
+INTERVALS = {
+    'pregame': 60.0,
+    'period': 15.0,
+    'late': 5.0,
+    'intermission': 60.0,
+}
+
+clockre = re.compile(r'^(\d+):(\d\d)$')
+
+
+def gamephase(gamedata):
+    # pregame, period, late, intermission or final from the score and the
+    # game clock of the seuranta page
+    if gamedata is None:
+        return 'pregame'
+    m = clockre.match(gamedata.time or '')
+    if m is None:
+        if (gamedata.time or '').lower().startswith(u'erätauko'):
+            return 'intermission'
+        return 'period'
+    clock = int(m.group(1))*60 + int(m.group(2))
+    if clock == 0:
+        return 'pregame'
+    if clock >= 60*60 and gamedata.home['score'] != gamedata.away['score']:
+        return 'final'
+    # the clock stops at the end of a period
+    if clock % (20*60) == 0:
+        return 'intermission'
+    if clock >= 40*60:
+        return 'late'
+    return 'period'
+
+
+class LivePages(object):
+    # Engine of a live game's LGParser: seuranta is asked from the server
+    # again on every poll, revalidated when it is cached. The roster and
+    # statistics pages are kept from the first poll, only the players are
+    # read from them, and fetched again when the game can't be parsed.
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.pages = {}
+        self.stale = set()
+
+    def fetch(self, url):
+        content = self.pages.get(url)
+        if content is None:
+            # a cleared page is asked from the server, the cached one is
+            # what failed to parse
+            revalidate = url in self.stale
+            self.stale.discard(url)
+            content = self.pages[url] = self.transport.get(url, revalidate=revalidate).content
+        return content
+
+    def refresh(self, url):
+        # True when the page changed since the previous poll
+        old = self.pages.get(url)
+        self.pages[url] = self.transport.get(url, revalidate=True).content
+        return self.pages[url] != old
+
+    def clear(self, keep):
+        self.stale.update(url for url in self.pages if url != keep)
+        self.pages = dict((url, content) for (url, content) in self.pages.items() if url == keep)
+
+
+class LiveGame(object):
+    # A game being followed: its parser, the events seen so far by id with
+    # their records as JSON, its phase and when it is polled next
+
+    def __init__(self, parser, game):
+        self.parser = parser
+        self.game = game
+        self.url = urllib.parse.urljoin(parser.url, game[2])
+        self.seen = {}
+        self.phase = 'pregame'
+        self.parsed = False
+        self.due = 0.0
+
+    def parse(self):
+        try:
+            return list(self.parser.parsegame(*self.game))
+        except Exception:
+            # players that were not on the roster or statistics pages of
+            # an earlier poll
+            self.parser.engine.clear(self.url)
+            return list(self.parser.parsegame(*self.game))
+
+    def poll(self):
+        # the events of the game that are new or changed since the previous
+        # poll; nothing is parsed when the seuranta page is the same
+        with liigatrace.span('poll', 'live', url=self.url) as span:
+            changed = self.parser.engine.refresh(self.url)
+            span.set(changed=changed)
+            if not changed and self.parsed:
+                return []
+
+            self.parsed = False
+            records = self.parse()
+            self.parsed = True
+
+            gamedata = None
+            events = []
+            for r in records:
+                if isinstance(r, liigaparser.GameData):
+                    gamedata = r
+                elif isinstance(r, liigaparser.GameEventData):
+                    values = r.tojson()
+                    if self.seen.get(r.id) != values:
+                        self.seen[r.id] = values
+                        events.append(r)
+            self.phase = gamephase(gamedata)
+            span.set(phase=self.phase, events=len(events))
+            return events
+
+
+class LivePoller(object):
+    # Follows several games at once. A game is polled in a thread pool when
+    # it is due, and is due again after the interval of its phase. Games
+    # are followed until they are final or for maxtime seconds. run() gives
+    # the new events of every poll in the calling thread.
+
+    def __init__(self, games, intervals=None, workers=6, maxtime=6*60*60):
+        self.games = list(games)
+        self.intervals = dict(INTERVALS, **(intervals or {}))
+        self.workers = workers
+        self.maxtime = maxtime
+
+    def run(self):
+        deadline = time.monotonic() + self.maxtime
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(self.games))),
+                                                         thread_name_prefix='livepoll')
+        polling = {}
+        try:
+            while self.games:
+                now = time.monotonic()
+                for game in self.games:
+                    if game.due <= now and game not in polling.values():
+                        polling[executor.submit(game.poll)] = game
+                idle = [g.due for g in self.games if g not in polling.values()]
+                timeout = max(0.0, min(idle) - now) if idle else None
+                if not polling:
+                    # wait() returns at once without futures
+                    time.sleep(timeout)
+                    continue
+                (done, _) = concurrent.futures.wait(polling, timeout=timeout,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    game = polling.pop(future)
+                    try:
+                        events = future.result()
+                    except Exception as e:
+                        sys.stderr.write("Polling %s failed: %s: %s\n" % (game.url, type(e).__name__, e))
+                        events = []
+                    yield events
+                    if game.phase == 'final' or time.monotonic() > deadline:
+                        self.games.remove(game)
+                    else:
+                        game.due = time.monotonic() + self.intervals[game.phase]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def livegames(url, transport, gamenos=None, date=None):
+    # the games of the schedule at url on date (YYYYMMDD, today by default)
+    # or with the game numbers gamenos
+    parser = liigaparser.LGParser(url, transport=transport, engine=LivePages(transport))
+    page = liigafetch.parsepage(transport.get(url, revalidate=True).content, url=url)
+    parser.season = parser.getseason(url)
+    if '/playoffs/' in url:
+        parser.season.playoffs = True
+        parser.getplayoffsteams(page)
+        games = parser.playoffsschedulegames(page)
+    else:
+        list(parser.getteams(page))
+        games = parser.schedulegames(page)
+
+    if gamenos:
+        games = [g for g in games if g[0] in gamenos]
+    else:
+        date = date or datetime.date.today().strftime('%Y%m%d')
+        games = [g for g in games if g[1] == date]
+
+    live = []
+    for game in games:
+        gameparser = liigaparser.LGParser(url, transport=transport, engine=LivePages(transport))
+        gameparser.season = parser.season
+        gameparser.teams = parser.teams
+        live.append(LiveGame(gameparser, game))
+    return live
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    transport = liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        url = sys.argv[1]
+        gamenos = [int(n) for n in sys.argv[2:]]
+
+        games = livegames(url, transport, gamenos, options.get('date'))
+        sys.stderr.write("Following %d games\n" % len(games))
+
+        intervals = {}
+        for (option, phases) in [('interval', ['period']), ('fast-interval', ['late']),
+                                 ('slow-interval', ['pregame', 'intermission'])]:
+            if options.get(option):
+                for phase in phases:
+                    intervals[phase] = float(options[option])
+        poller = LivePoller(games, intervals=intervals, workers=int(options.get('workers', 6)),
+                            maxtime=float(options.get('max-hours', 6))*60*60)
+        for events in poller.run():
+            for event in events:
+                sink.write(event)
+            # events are out as soon as they are found
+            sink.flush()
+    finally:
+        sink.close()
@@ -3,68 +3,365 @@
 
 
 import datetime
+import hashlib
+import os
+import re
 import urllib
-import requests
 import json
 import sys
-
-from lxml import html
-
-
-class ParserData(object):
-    
-    def __init__(self, **values):
-        self.__values = values
-        self.__values['type'] = self.type
-        for attr in values:
-            setattr(self, attr, values[attr])
-
-    def __setattr__(self, attr, value):
-        if not attr.startswith('_'):
-            self.__values[attr] = value
-        super(ParserData, self).__setattr__(attr, value)
-    
-    def tojson(self):
-        return json.dumps(self.__values, sort_keys=True)
-
-    def __str__(self):
-        return str(self.values)
-
-
-class SeasonData(ParserData):
+import liigacrawl
+import liigafetch
+import liigaquarantine
+import liigarecords
+import liigasinks
+import liigatrace
+
+from lxml import etree, html
+
+
+# XPath expressions of the page parsers, compiled once
+teamoptionxpath = etree.XPath("//select[@name='team']/option")
+gamerowxpath = etree.XPath("//table[@id='games']/tbody/tr")
+seurantaxpath = etree.XPath("td/a[@title='Seuranta']")
+teamlinkxpath = etree.XPath("td[@class='ta-l']/a")
+gamelistrowxpath = etree.XPath("//table[@class='games-list-table']/tbody/tr")
+homelinexpath = etree.XPath("//div[@class='team home']//div[@class='line']")
+awaylinexpath = etree.XPath("//div[@class='team away']//div[@class='line']")
+refereesxpath = etree.XPath("//div[@class='referees']")
+lineheadxpath = etree.XPath("div[@class='head']")
+lineplayerxpath = etree.XPath("div/a[@class='player']")
+jerseyxpath = etree.XPath("div[@class='jersey']")
+goldenhelmetxpath = etree.XPath("span[@class='kultainen-kypara']")
+refereelinkxpath = etree.XPath("div[@class='player']/a")
+namexpath = etree.XPath("div[@class='name']")
+homeplayerrowxpath = etree.XPath("//div[@class='team home']//table[@class='player-stats']/tbody/tr")
+awayplayerrowxpath = etree.XPath("//div[@class='team away']//table[@class='player-stats']/tbody/tr")
+homegoalierowxpath = etree.XPath("//div[@class='team home']//table[@class='goalie-stats']/tbody/tr")
+awaygoalierowxpath = etree.XPath("//div[@class='team away']//table[@class='goalie-stats']/tbody/tr")
+stronglinkxpath = etree.XPath("strong/a")
+titlexpath = etree.XPath("head/title")
+infoxpath = etree.XPath("//div[@class='info']/p")
+eventrowxpath = etree.XPath("//div[@class='table']//tr")
+shotdivxpath = etree.XPath("//div[@class='shooting-map-container']/div")
+gkedivxpath = etree.XPath("div/div")
+
+
+def children(elem, tag):
+    # same as elem.xpath(tag) for a plain tag name, without XPath
+    return [c for c in elem if c.tag == tag]
+
+
+class SeasonData(liigarecords.ParserData):
     type = 'season'
+    __slots__ = ('id', 'years', 'playoffs')
 
-class TeamData(ParserData):
+class TeamData(liigarecords.ParserData):
     type = 'team'
+    __slots__ = ('name', 'id')
 
-class GameData(ParserData):
+class GameData(liigarecords.ParserData):
     type = 'game'
+    __slots__ = ('id', 'number', 'identifier', 'date', 'season', 'playoffs',
+                 'time', 'home', 'away', 'periods', 'score', 'attendance',
+                 'seriesgameno')
 
-class PlayerData(ParserData):
+class PlayerData(liigarecords.ParserData):
     type = 'player'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'name', 'number',
+                 'team', 'position', 'goals', 'assists', 'points',
+                 'penalties', 'plus', 'minus', 'plusminus', 'ppgoals',
+                 'shgoals', 'wingoal', 'shots', 'shotpct', 'faceoffs',
+                 'faceoffpct', 'skating', 'playtime', 'lineno', 'gh')
 
-class GoalkeeperData(ParserData):
+class GoalkeeperData(liigarecords.ParserData):
     type = 'goalkeeper'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'name', 'number',
+                 'team', 'saves', 'goalsagainst', 'savepct', 'goals',
+                 'assists', 'points', 'penalties', 'playtime', 'starting')
 
-class RefereeData(ParserData):
+class RefereeData(liigarecords.ParserData):
     type = 'referee'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'number', 'name',
+                 'reftype')
 
-class PeriodData(ParserData):
+class PeriodData(liigarecords.ParserData):
     type = 'period'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'period', 'home',
+                 'away')
 
-class GameStatsData(ParserData):
+class GameStatsData(liigarecords.ParserData):
     type = 'gamestats'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'home', 'away')
 
-class GameEventData(ParserData):
+class GameEventData(liigarecords.ParserData):
     type = 'gameevent'
-
-class ShotData(ParserData):
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'time', 'eventtype',
+                 'event', 'team', 'vsteam', 'period', 'location', 'playerin',
+                 'playerout', 'shooter', 'blocker', 'result', 'scorer',
+                 'score', 'assist1', 'assist2', 'goalattr', 'psorder',
+                 'psteamorder', 'pskeeper', 'player', 'keeper', 'scored',
+                 'boxed', 'minutes', 'reason', 'penaltyattr')
+
+class ShotData(liigarecords.ParserData):
     type = 'shot'
+    __slots__ = ('id', 'gameid', 'season', 'playoffs', 'time', 'eventtype',
+                 'team', 'vsteam', 'period', 'location', 'shooter', 'blocker',
+                 'result')
+
+
+class TimelineRow(object):
+    # One event row of the game timeline, as seen by the event rules
+
+    def __init__(self, gamedata, gtimetxt, elem, strong, players, playermeta,
+                 team, vsteam, athome, gke, playersbyname):
+        self.gamedata = gamedata
+        self.gtimetxt = gtimetxt
+        self.elem = elem
+        self.text = elem.text or ''
+        self.strong = strong
+        self.players = players
+        self.playermeta = playermeta
+        self.playertext = players[0][3] if players else ''
+        self.team = team
+        self.vsteam = vsteam
+        self.athome = athome
+        self.gke = gke
+        self.playersbyname = playersbyname
+        # patterns of the rules found in text and playertext
+        self.found = set()
+        self.playerfound = set()
+
+    def playerdata(self, data):
+        return dict(
+            number=int(data[0]),
+            id=data[1].replace('/fi/pelaajat/',''),
+            #name=data[2],
+            team=self.team,
+        )
+
+
+class EventClassifier(object):
+    # Picks the LGParser method that parses a timeline row: the first rule
+    # whose conditions hold. A rule is (method, strong, players, texts,
+    # playertexts); strong and players are True or False when the row must
+    # or must not have them, and the rule needs one of texts in the row text
+    # or one of playertexts in the text after the first player. All the
+    # texts are searched with one regex per row text, so adding rules does
+    # not add passes over the row.
+
+    def __init__(self, rules):
+        self.rules = []
+        texts = []
+        playertexts = []
+        for (method, strong, players, ruletexts, ruleplayertexts) in rules:
+            ruletexts = frozenset(ruletexts or ())
+            ruleplayertexts = frozenset(ruleplayertexts or ())
+            texts.extend(t for t in ruletexts if t not in texts)
+            playertexts.extend(t for t in ruleplayertexts if t not in playertexts)
+            self.rules.append((method, strong, players, ruletexts, ruleplayertexts))
+        self.textre = self.compile(texts)
+        self.playertextre = self.compile(playertexts)
+
+    @classmethod
+    def compile(self, texts):
+        if not texts:
+            return None
+        # the lookahead finds every position where one of the texts starts;
+        # it tells only the first alternative matching there, so all texts
+        # are compared at those positions
+        regex = re.compile('(?=%s)' % '|'.join(re.escape(t) for t in texts))
+        return (regex, texts)
+
+    @classmethod
+    def search(self, compiled, text):
+        if compiled is None or not text:
+            return set()
+        (regex, texts) = compiled
+        found = set()
+        for m in regex.finditer(text):
+            start = m.start()
+            found.update(t for t in texts if text.startswith(t, start))
+        return found
+
+    def classify(self, row):
+        row.found = self.search(self.textre, row.text)
+        row.playerfound = self.search(self.playertextre, row.playertext)
+        for (method, strong, players, texts, playertexts) in self.rules:
+            if strong is not None and strong != (row.strong is not None):
+                continue
+            if players is not None and players != bool(row.players):
+                continue
+            if (texts or playertexts) and not (texts & row.found or playertexts & row.playerfound):
+                continue
+            return method
+
+
+eventclassifier = EventClassifier([
+    ('goalevent', True, True, None, None),
+    ('shootoutgoalevent', True, False, None, None),
+    ('penaltyevent', None, True, [' min '], [' min ']),
+    ('zeropenaltyevent', None, True, None, [
+        'koukkaaminen', 'huitominen', 'korkea maila', 'kampitus',
+        'kiekon sulkeminen', 'pelin viivytt', 'kiinnipit', 'heitto',
+        u'estäminen']),
+    ('playerteampenaltyevent', None, True, ['Joukkuerangaistus'], None),
+    ('teampenaltyevent', None, None, ['Joukkuerangaistus'], None),
+    ('timeoutevent', None, None, ['aikalis'], None),
+    ('goalkeeperoutevent', None, None, ['Maalivahti ulos'], None),
+    ('goalkeeperinevent', None, None, ['Maalivahti sis'], None),
+    ('goalkeeperchangeevent', None, None, ['Maalivahdin vaihto'], None),
+    ('videocheckevent', None, None, ['Videotarkistus - ei maalia'], None),
+    ('penaltyshotevent', None, None, ['Rangaistuslaukaus - ei maalia'], None),
+    ('shootoutevent', None, False, None, None),
+])
+
+
+class SyncState(object):
+    # finished games of earlier runs, with digests of their schedule row
+    # and seuranta summary, so that unchanged games are not fetched again.
+    # A game is marked while it is parsed, its mark is given() once all of
+    # its records are with the sink and saved when the sink has flushed
+    # them, so an interrupted run does not leave games marked whose
+    # records were not written.
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as fp:
+                self.games = json.load(fp)
+        except (IOError, TypeError, ValueError):
+            self.games = {}
+        self.marks = {}
+        self.written = {}
+
+    @classmethod
+    def digest(self, elems):
+        text = ' '.join(' '.join(e.text_content().split()) for e in elems)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def known(self, gameid, row):
+        game = self.games.get(str(gameid))
+        return bool(game and game.get('final') and game.get('row') == row)
+
+    def seen(self, gameid, summary):
+        game = self.games.get(str(gameid))
+        return bool(game and game.get('summary') == summary)
+
+    def mark(self, gameid, **values):
+        self.marks.setdefault(str(gameid), {}).update(values)
+
+    def given(self):
+        # the records of the marked games have all been given to the sink
+        for (gameid, values) in self.marks.items():
+            self.written.setdefault(gameid, {}).update(values)
+        self.marks = {}
+
+    def save(self):
+        # called when the sink has flushed, see liigasinks
+        if not self.written:
+            return
+        for (gameid, values) in self.written.items():
+            self.games.setdefault(gameid, {}).update(values)
+        self.written = {}
+        if self.path is None:
+            return
+        tmpname = self.path + '.tmp'
+        with open(tmpname, 'w') as fp:
+            json.dump(self.games, fp, sort_keys=True)
+        os.replace(tmpname, self.path)
+
 
 class LGParser(object):
 
-    def __init__(self, url):
+    def __init__(self, url, workers=6, prefetch=4, state=None, transport=None, engine=None, pool=None,
+                 quarantine=None):
         self.url = url
+        self.transport = transport or liigafetch.transport
+        self.latest = False
+        self.state = state
+        self.rows = {}
+        # workers bounds the number of concurrent downloads, prefetch the
+        # number of upcoming games whose pages are fetched ahead of parsing
+        self.engine = engine or liigacrawl.CrawlEngine(self.transport, perhost=workers)
+        self.prefetch = prefetch
+        # games are parsed in worker processes when a ParsePool is given
+        self.pool = pool
+        # games that fail go to the quarantine instead of ending the crawl
+        self.quarantine = quarantine
+
+    def fetch(self, url):
+        return self.engine.fetch(url)
+
+    def gameurls(self, game):
+        (gamedate, gameurl) = game[1:3]
+        if self.skipdate(self.gamedate(gamedate)):
+            return []
+        url = urllib.parse.urljoin(self.url, gameurl)
+        return [url.replace('seuranta', subpage) for subpage in ['seuranta', 'kokoonpanot', 'tilastot']]
+
+    def prefetchgames(self, games):
+        return self.engine.window(games, self.gameurls, self.prefetch)
+
+    def parsegames(self, games):
+        games = self.prefetchgames(self.unsynced(games))
+        if self.pool is None:
+            for args in games:
+                records = liigaquarantine.isolate(self.quarantine, 'game', self.parsegame(*args),
+                                                  self.gameurls(args), url=self.url, game=list(args))
+                for e in records or []:
+                    yield e
+                if self.state is not None:
+                    self.state.given()
+            return
+
+        isolate = self.quarantine is not None
+        jobargs = {}
+
+        def jobs():
+            for args in games:
+                gameid = self.season.id*1000+args[0]
+                gamestate = None
+                if self.state is not None:
+                    gamestate = self.state.games.get(str(gameid), {})
+                pages = {}
+                try:
+                    for url in self.gameurls(args):
+                        pages[url] = self.fetch(url)
+                except Exception as e:
+                    if not isolate:
+                        raise
+                    self.quarantine.put('game', liigaquarantine.failure(e), self.gameurls(args),
+                                        dict(url=self.url, game=list(args)), pages)
+                    continue
+                # the pages are kept for the quarantine until the game is parsed
+                jobargs[gameid] = (args, pages if isolate else None)
+                yield (self.url, self.season, self.teams, self.latest,
+                       self.rows.get(args[0]), gamestate, args, pages,
+                       liigatrace.tracer is not None, isolate)
+
+        for (gameid, records, gamestate, events, error) in self.pool.map(parsegamepages, jobs(), self.prefetch):
+            (args, pages) = jobargs.pop(gameid)
+            if events:
+                liigatrace.tracer.extend(events)
+            if error is not None:
+                self.quarantine.put('game', error, self.gameurls(args), dict(url=self.url, game=list(args)), pages)
+                continue
+            for e in records:
+                yield e
+            if gamestate is not None:
+                self.state.mark(gameid, **gamestate)
+                self.state.given()
+
+    def retrygame(self, game):
+        # a quarantined game of the season or playoffs at self.url
+        page = liigafetch.parsepage(self.fetch(self.url), url=self.url)
+        self.season = self.getseason(self.url)
+        if len(game) > 4 and game[4]:
+            self.season.playoffs = True
+            self.getplayoffsteams(page)
+        else:
+            list(self.getteams(page))
+        return self.parsegame(*game)
 
     def getseason(self, url):
         for p in url.split('/'):
@@ -74,8 +371,10 @@ class LGParser(object):
 
 
     def parseseason(self, latest=False):
-        r = requests.get(self.url)
-        page = html.fromstring(r.content)
+        return liigatrace.records('season', 'season', self.seasonrecords(latest), url=self.url)
+
+    def seasonrecords(self, latest):
+        page = liigafetch.parsepage(self.fetch(self.url), url=self.url)
         self.latest = latest
 
         self.season = self.getseason(self.url)
@@ -89,8 +388,10 @@ class LGParser(object):
             yield e
 
     def parseplayoffs(self):
-        r = requests.get(self.url)
-        page = html.fromstring(r.content)
+        return liigatrace.records('playoffs', 'season', self.playoffsrecords(), url=self.url)
+
+    def playoffsrecords(self):
+        page = liigafetch.parsepage(self.fetch(self.url), url=self.url)
         self.latest = False
 
         self.season = self.getseason(self.url)
@@ -115,7 +416,7 @@ class LGParser(object):
         
 
     def getteams(self, page):
-        teams = page.xpath("//select[@name='team']/option")
+        teams = teamoptionxpath(page)
         self.teams = {}
         for t in teams:
             if t.attrib.get('value'):
@@ -150,38 +451,70 @@ class LGParser(object):
         pass
 
     def getgames(self, page):
-        games = page.xpath("//table[@id='games']/tbody/tr")
+        for e in self.parsegames(self.schedulegames(page)):
+            yield e
+
+    def schedulegames(self, page):
+        # (gameno, gamedate, gameurl, teams) of the games of a schedule
+        rows = gamerowxpath(page)
         #print games
-        for tr in games:
-            url = tr.xpath("td/a[@title='Seuranta']")
-            tds = tr.xpath("td")
-            teamstd = tr.xpath("td[@class='ta-l']/a")
+        games = []
+        for tr in rows:
+            url = seurantaxpath(tr)
+            tds = children(tr, 'td')
+            teamstd = teamlinkxpath(tr)
             teams = [t.strip() for t in teamstd[0].text.split('-')]
             gameno = int(tds[0].text)
             gamedate = tr.attrib.get('data-time')
             gameurl = url[0].attrib.get('href')
-
-            for e in self.parsegame(gameno, gamedate, gameurl, teams):
-                yield e
+            if self.state is not None:
+                self.rows[gameno] = SyncState.digest([tr])
+            games.append((gameno, gamedate, gameurl, teams))
+        return games
 
     def getplayoffsgames(self, page):
-        games = page.xpath("//table[@class='games-list-table']/tbody/tr")
+        for e in self.parsegames(self.playoffsschedulegames(page)):
+            yield e
+
+    def playoffsschedulegames(self, page):
+        rows = gamelistrowxpath(page)
         gameno = 901
-        for tr in games:
-            url = tr.xpath("td/a[@title='Seuranta']")
+        games = []
+        for tr in rows:
+            url = seurantaxpath(tr)
             if not url:
                 continue
-            tds = tr.xpath("td")
-            teamstd = tr.xpath("td[@class='ta-l']/a")
+            tds = children(tr, 'td')
+            teamstd = teamlinkxpath(tr)
             teams = [t.strip() for t in teamstd[0].text.split('-')]
             seriesgameno = int(tds[0].text)
             gamedate = tr.attrib.get('data-time')
             gameurl = url[0].attrib.get('href')
-
-            for e in self.parsegame(gameno, gamedate, gameurl, teams, playoffs=True, seriesgameno=seriesgameno):
-                yield e
+            if self.state is not None:
+                self.rows[gameno] = SyncState.digest([tr])
+            games.append((gameno, gamedate, gameurl, teams, True, seriesgameno))
             gameno += 1
+        return games
             
+    def unsynced(self, games):
+        if self.state is None:
+            return games
+        return [g for g in games
+                if not self.state.known(self.season.id*1000+g[0], self.rows.get(g[0]))]
+
+    def gamedate(self, gamedate):
+        if gamedate:
+            return datetime.date(int(gamedate[:4]), int(gamedate[4:6]), int(gamedate[6:8]))
+
+    def skipdate(self, dt):
+        if dt is None:
+            return False
+        if dt > datetime.date.today():
+            return True
+        if self.latest and dt < datetime.date.today() - datetime.timedelta(days=14):
+            return True
+        return False
+
     def genpct(self, s):
         if not s or s == '-':
             return None
@@ -195,26 +528,25 @@ class LGParser(object):
 
     def parseroster(self, gameurl, gamedata, hometeam, awayteam):
         url = gameurl.replace('seuranta', 'kokoonpanot')
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.fetch(url), url=url)
 
-        homelines = page.xpath("//div[@class='team home']//div[@class='line']")
-        awaylines = page.xpath("//div[@class='team away']//div[@class='line']")
-        refereediv = page.xpath("//div[@class='referees']")[0]
+        homelines = homelinexpath(page)
+        awaylines = awaylinexpath(page)
+        refereediv = refereesxpath(page)[0]
         homedata = {}
         awaydata = {}
         referees= []
         for (lines, teamdata) in [(homelines, homedata), (awaylines, awaydata)]:
             for l in lines:
-                head = l.xpath("div[@class='head']")[0].text
+                head = lineheadxpath(l)[0].text
                 if head.endswith(u"kenttä"):
                     lineno = int(head[0])
                 else:
                     lineno = None
-                for p in l.xpath("div/a[@class='player']"):
-                    jersey = int(p.xpath("div[@class='jersey']")[0].text[1:])
+                for p in lineplayerxpath(l):
+                    jersey = int(jerseyxpath(p)[0].text[1:])
                     teamdata[jersey] = lineno
-                    gh = p.xpath("span[@class='kultainen-kypara']")
+                    gh = goldenhelmetxpath(p)
                     if gh:
                         teamdata['gh'] = jersey
                     if head == 'Maalivahdit' and 'startgk' not in teamdata:
@@ -223,14 +555,14 @@ class LGParser(object):
         refnum = 1
         nonum = 0
 
-        for rp in refereediv.xpath("div[@class='player']/a"):
-            jerseyelem = rp.xpath("div[@class='jersey']")
+        for rp in refereelinkxpath(refereediv):
+            jerseyelem = jerseyxpath(rp)
             if jerseyelem and jerseyelem[0] is not None and jerseyelem[0].text:
                 jersey = int(jerseyelem[0].text[1:])
             else:
                 jersey = nonum
                 nonum+=1
-            nametxt = rp.xpath('div[@class="name"]')[0].text
+            nametxt = namexpath(rp)[0].text
             refereetag = u' (Päätuomari)'
             linesmantag = u' (Linjatuomari)'
                            
@@ -256,21 +588,20 @@ class LGParser(object):
 
     def parseplayers(self, gameurl, gamedata, hometeam, awayteam, homelines, awaylines):
         url = gameurl.replace('seuranta', 'tilastot')
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.fetch(url), url=url)
 
-        homerows = page.xpath("//div[@class='team home']//table[@class='player-stats']/tbody/tr")
-        awayrows = page.xpath("//div[@class='team away']//table[@class='player-stats']/tbody/tr")
+        homerows = homeplayerrowxpath(page)
+        awayrows = awayplayerrowxpath(page)
                 
-        ghomerows = page.xpath("//div[@class='team home']//table[@class='goalie-stats']/tbody/tr")
-        gawayrows = page.xpath("//div[@class='team away']//table[@class='goalie-stats']/tbody/tr")
+        ghomerows = homegoalierowxpath(page)
+        gawayrows = awaygoalierowxpath(page)
 
 
         for (team, rows, lines) in [(hometeam, homerows, homelines),
                              (awayteam, awayrows, awaylines)]:
             for r in rows:
-                tds = r.xpath("td")
-                pdata = tds[0].xpath("a")[0]
+                tds = children(r, 'td')
+                pdata = children(tds[0], 'a')[0]
                 pid = pdata.attrib.get('href')
                 pname = pdata.text
                 values = [t.text for t in tds[1:]]
@@ -304,12 +635,13 @@ class LGParser(object):
                     gh=number==lines.get('gh')
                 )
                 yield player
+                r.clear()
 
         for (team, rows, lines) in [(hometeam, ghomerows, homelines),
                              (awayteam, gawayrows, awaylines)]:
             for r in rows:
-                tds = r.xpath("td")
-                pdata = tds[0].xpath("strong/a")[0]
+                tds = children(r, 'td')
+                pdata = stronglinkxpath(tds[0])[0]
                 pid = pdata.attrib.get('href')
                 pname = pdata.text
                 values = [t.text for t in tds[1:]]
@@ -333,34 +665,35 @@ class LGParser(object):
                     starting=number==lines.get('startgk'),
                 )
                 yield gk
+                r.clear()
                 
 
     def parsegame(self, gameno, gamedate, gameurl, teams, playoffs=False, seriesgameno=None):
+        records = self.gamerecords(gameno, gamedate, gameurl, teams, playoffs, seriesgameno)
+        return liigatrace.records('game', 'game', records, url=gameurl, gameno=gameno)
+
+    def gamerecords(self, gameno, gamedate, gameurl, teams, playoffs, seriesgameno):
         url = urllib.parse.urljoin(self.url, gameurl)
         #print gameno, url
         identifier = url.split('/')[-3]
-        if gamedate:
-            dt = datetime.date(int(gamedate[:4]), int(gamedate[4:6]), int(gamedate[6:8]))
-            if dt > datetime.date.today():
-                return
-            if self.latest and dt < datetime.date.today() - datetime.timedelta(days=14):
-                return
+        dt = self.gamedate(gamedate)
+        if self.skipdate(dt):
+            return
 
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.fetch(url), url=url)
         if not teams:
             for e in self.getteams(page):
                 yield e
 
         if not teams[0]:
-            title = page.xpath("head/title")[0]
+            title = titlexpath(page)[0]
             parts = title.text.split()
             teams = (parts[2], parts[4])
 
         hometeam = self.teams[teams[0]].id
         awayteam = self.teams[teams[1]].id
         
-        info = page.xpath("//div[@class='info']/p")
+        info = infoxpath(page)
         infoparts = info[0].text.split()
         if len(infoparts) != 3:
             return
@@ -393,12 +726,20 @@ class LGParser(object):
 
         attendance = int(info[4].text.split()[-1])
         id = self.season.id*1000+gameno
+
+        if self.state is not None:
+            summary = SyncState.digest(info)
+            # a game without a date is looked at again on the next sync
+            final = dt is not None and dt < datetime.date.today()
+            if self.state.seen(id, summary):
+                self.state.mark(id, row=self.rows.get(gameno), final=final)
+                return
         
         gamedata = GameData(
             id=id,
             number=gameno,
             identifier=identifier,
-            date=str(dt),
+            date=str(dt) if dt is not None else None,
             season=self.season.years,
             playoffs=playoffs,
             time=tm,
@@ -412,10 +753,12 @@ class LGParser(object):
             gamedata.seriesgameno=seriesgameno
         yield gamedata
 
-        (homelines, awaylines, referees) = self.parseroster(url, gamedata, hometeam, awayteam)
+        with liigatrace.span('roster', 'parse', url=url):
+            (homelines, awaylines, referees) = self.parseroster(url, gamedata, hometeam, awayteam)
 
         playersbyname = {}
-        for e in self.parseplayers(url, gamedata, hometeam, awayteam, homelines, awaylines):
+        players = self.parseplayers(url, gamedata, hometeam, awayteam, homelines, awaylines)
+        for e in liigatrace.records('players', 'parse', players, url=url):
             player = dict(
                 team = e.team, 
                 id = e.id, 
@@ -450,7 +793,7 @@ class LGParser(object):
 
         gamestats = dict()
 
-        events = page.xpath("//div[@class='table']//tr")
+        events = eventrowxpath(page)
         eventnum = 1
         category = None
                     
@@ -459,197 +802,202 @@ class LGParser(object):
         self.psawayorder = 0
         gkstarts = False
         
-        for e in events:
-            ecls = e.attrib.get('class')
-            if ecls in ['odd', 'even', 'period', 'shooting-stats odd', 'shooting-stats even']:
-                tds = e.xpath("td")
-                if tds and len(tds) == 3:
-                    home, gtimetd, away = tds
-                    gtimei = gtimetd.xpath("i")
-                    if gtimei:
-                        gtime = gtimei[0]
-                    else:
-                        gtime = gtimetd
-                    if gtime.text:
-                        gtimetxt = gtime.text.strip()
-                    else:
-                        gtimetxt = None
+        with liigatrace.span('events', 'parse', url=url, rows=len(events)):
+            for tr in events:
+                ecls = tr.attrib.get('class')
+                if ecls in ['odd', 'even', 'period', 'shooting-stats odd', 'shooting-stats even']:
+                    tds = children(tr, 'td')
+                    if tds and len(tds) == 3:
+                        home, gtimetd, away = tds
+                        gtimei = children(gtimetd, 'i')
+                        if gtimei:
+                            gtime = gtimei[0]
+                        else:
+                            gtime = gtimetd
+                        if gtime.text:
+                            gtimetxt = gtime.text.strip()
+                        else:
+                            gtimetxt = None
                     
-                    if gtimetxt and len(gtimetxt) > 4 and gtimetxt[-3] == ':':
-                        e = self.parsegameevent(gamedata, eventnum, home, gtimetxt, away, playersbyname)
-                        if e:
-                            eventnum += 1
-                            yield e
-                    elif category == 'Aloitusvoitot':
-                        hnums = [int(n) for n in home.text.split()[0::2]]
-                        anums = [int(n) for n in away.text.split()[0::2]]
-                        if len(hnums) == len(periods)+1 and len(anums) == len(periods)+1:
-                            for (p, h, a) in zip(periods, hnums, anums):
-                                p['homefaceoffs'] = h
-                                p['awayfaceoffs'] = a
-                        gamestats['homefaceoffs'] = hnums[-1]
-                        gamestats['awayfaceoffs'] = anums[-1]
+                        if gtimetxt and len(gtimetxt) > 4 and gtimetxt[-3] == ':':
+                            e = self.parsegameevent(gamedata, eventnum, home, gtimetxt, away, playersbyname)
+                            if e:
+                                eventnum += 1
+                                yield e
+                        elif category == 'Aloitusvoitot':
+                            hnums = [int(n) for n in home.text.split()[0::2]]
+                            anums = [int(n) for n in away.text.split()[0::2]]
+                            if len(hnums) == len(periods)+1 and len(anums) == len(periods)+1:
+                                for (p, h, a) in zip(periods, hnums, anums):
+                                    p['homefaceoffs'] = h
+                                    p['awayfaceoffs'] = a
+                            gamestats['homefaceoffs'] = hnums[-1]
+                            gamestats['awayfaceoffs'] = anums[-1]
                             
-                    elif category == 'Ylivoimapeli':
-                        if gtime.text == 'Yv-maalit':
-                            gamestats['homeppgoals'] = int(home.text)
-                            gamestats['awayppgoals'] = int(away.text)
-                        elif gtime.text == 'Yv-kerrat':
-                            gamestats['homeppchances'] = int(home.text)
-                            gamestats['awayppchances'] = int(away.text)
-                        elif gtime.text == 'Yv-prosentti':
-                            attrname = 'pppct'
-                            gamestats['homepppct'] = home.text.split()[0]
-                            gamestats['awaypppct'] = away.text.split()[0]
-                        elif gtime.text == 'Yv-aika':
-                            gamestats['homepptime'] = home.text.strip()
-                            gamestats['awaypptime'] = away.text.strip()
-
-                    elif category == 'Laukaisukartta':
-                        if gtime.text == 'Maali':
-                            attrname = 'score'
-                        elif gtime.text == 'Ohi':
-                            attrname = 'missed'
-                        elif gtime.text == 'Torjuttu':
-                            attrname = 'saved'
-                        elif gtime.text == 'Blokattu':
-                            attrname = 'blocked'
-                        elif gtime.text.startswith('Yhteens'):
-                            attrname = 'total'
-                        elif gtime.text == 'Kovin laukaus':
-                            attrname = None
+                        elif category == 'Ylivoimapeli':
+                            if gtime.text == 'Yv-maalit':
+                                gamestats['homeppgoals'] = int(home.text)
+                                gamestats['awayppgoals'] = int(away.text)
+                            elif gtime.text == 'Yv-kerrat':
+                                gamestats['homeppchances'] = int(home.text)
+                                gamestats['awayppchances'] = int(away.text)
+                            elif gtime.text == 'Yv-prosentti':
+                                attrname = 'pppct'
+                                gamestats['homepppct'] = home.text.split()[0]
+                                gamestats['awaypppct'] = away.text.split()[0]
+                            elif gtime.text == 'Yv-aika':
+                                gamestats['homepptime'] = home.text.strip()
+                                gamestats['awaypptime'] = away.text.strip()
+
+                        elif category == 'Laukaisukartta':
+                            if gtime.text == 'Maali':
+                                attrname = 'score'
+                            elif gtime.text == 'Ohi':
+                                attrname = 'missed'
+                            elif gtime.text == 'Torjuttu':
+                                attrname = 'saved'
+                            elif gtime.text == 'Blokattu':
+                                attrname = 'blocked'
+                            elif gtime.text.startswith('Yhteens'):
+                                attrname = 'total'
+                            elif gtime.text == 'Kovin laukaus':
+                                attrname = None
+                                for shotelem, hateam in ((home, hometeam), (away, awayteam)):
+                                    ha=shotelem.attrib['class']
+                                    shotplayer = children(shotelem, 'a')
+                                    if shotplayer:
+                                        gamestats['%sfastestshot' % ha] = float(shotplayer[0].tail.strip().split()[0].replace(',', '.'))
+                                        #gamestats['%sfastestshooter' % ha] = shotplayer[0].attrib.get('href').replace('/fi/pelaajat/','')
+                                        gamestats['%sfastestshooter' % ha] = playersbyname.get((hateam, shotplayer[0].text))
+                            else:
+                                attrname = None
+
+                            if attrname:
+                                for p in periods:
+                                    p['home%s' % attrname] = home.attrib.get('data-period%d' % p['number'], 0)
+                                    p['away%s' % attrname] = away.attrib.get('data-period%d' % p['number'], 0)
+
+                                gamestats['home%s' % attrname] = int(home.text)
+                                gamestats['away%s' % attrname] = int(away.text)
+
+
+                        elif category == 'Maalivahdit':
+                            if not gkstarts:
+                                i = 1
+                                for (gke, team, vsteam) in [(home, hometeam, awayteam), (away, awayteam, hometeam)]:
+                                    number = int(gke.text.strip().replace('#', ''))
+                                    playerid = children(gke, 'a')[0].attrib.get('href').replace('/fi/pelaajat/','')
+                                    gkin = GameEventData(
+                                        id = gamedata.id * 100000 + i,
+                                        season = gamedata.season,
+                                        playoffs = gamedata.playoffs,
+                                        gameid = gamedata.id,
+                                        time = '00:00',
+                                        eventtype = 'goalkeeper',
+                                        event = 'start',
+                                        team = team,
+                                        vsteam = vsteam,
+                                        period = '1',
+                                        playerin = dict(team = team,
+                                                        id = playerid,
+                                                        number = number
+                                                    ),
+                                        playerout = None
+                                    )
+                                    yield gkin
+                                    i += 1
+                                gkstarts = True
+
+                        elif category == 'Nopein luistelija':
                             for shotelem, hateam in ((home, hometeam), (away, awayteam)):
                                 ha=shotelem.attrib['class']
-                                shotplayer = shotelem.xpath('a')
-                                if shotplayer:
-                                    gamestats['%sfastestshot' % ha] = float(shotplayer[0].tail.strip().split()[0].replace(',', '.'))
-                                    #gamestats['%sfastestshooter' % ha] = shotplayer[0].attrib.get('href').replace('/fi/pelaajat/','')
-                                    gamestats['%sfastestshooter' % ha] = playersbyname.get((hateam, shotplayer[0].text))
-                        else:
-                            attrname = None
-
-                        if attrname:
-                            for p in periods:
-                                p['home%s' % attrname] = home.attrib.get('data-period%d' % p['number'], 0)
-                                p['away%s' % attrname] = away.attrib.get('data-period%d' % p['number'], 0)
-
-                            gamestats['home%s' % attrname] = int(home.text)
-                            gamestats['away%s' % attrname] = int(away.text)
-
-
-                    elif category == 'Maalivahdit':
-                        if not gkstarts:
-                            i = 1
-                            for (gke, team, vsteam) in [(home, hometeam, awayteam), (away, awayteam, hometeam)]:
-                                number = int(gke.text.strip().replace('#', ''))
-                                playerid = gke.xpath("a")[0].attrib.get('href').replace('/fi/pelaajat/','')
-                                gkin = GameEventData(
-                                    id = gamedata.id * 100000 + i,
-                                    season = gamedata.season,
-                                    playoffs = gamedata.playoffs,
-                                    gameid = gamedata.id,
-                                    time = '00:00',
-                                    eventtype = 'goalkeeper',
-                                    event = 'start',
-                                    team = team,
-                                    vsteam = vsteam,
-                                    period = '1',
-                                    playerin = dict(team = team,
-                                                    id = playerid,
-                                                    number = number
-                                                ),
-                                    playerout = None
-                                )
-                                yield gkin
-                                i += 1
-                            gkstarts = True
-
-                    elif category == 'Nopein luistelija':
-                        for shotelem, hateam in ((home, hometeam), (away, awayteam)):
-                            ha=shotelem.attrib['class']
-                            skater = shotelem.xpath('a')
-                            if skater:
-                                gamestats['%sfastestskating' % ha] = float(skater[0].tail.strip().split()[0].replace(',', '.'))
-                                gamestats['%sfastestskater' % ha] = playersbyname.get((hateam, skater[0].text))
-
-
-                elif ecls == 'period' and tds and len(tds) == 1:
-                    category = tds[0].text
-
-        shotdivs = page.xpath("//div[@class='shooting-map-container']/div")
+                                skater = children(shotelem, 'a')
+                                if skater:
+                                    gamestats['%sfastestskating' % ha] = float(skater[0].tail.strip().split()[0].replace(',', '.'))
+                                    gamestats['%sfastestskater' % ha] = playersbyname.get((hateam, skater[0].text))
+
+
+                    elif ecls == 'period' and tds and len(tds) == 1:
+                        category = tds[0].text
+                # rows are not looked at again once their records are out
+                tr.clear()
+
+        shotdivs = shotdivxpath(page)
         location = None
         eventtxt = None
         shotnums = {}
-        for s in shotdivs:
-            scls = s.attrib.get('class').split()
-            if len(scls) == 5:
-                (_, location, periodtxt, eventtxt, playertxt) = scls
-            #if len(scls) == 4:
-            #    (_, location, periodtxt, playertxt) = scls
-            #elif len(scls) == 5:
-            #    (_, __, location, periodtxt, playertxt) = scls
-            elif 'shot-tooltip' in scls:
-                #print location, player
-                shootername = s.text.strip().split(':')[-1].strip()
-                (team, timetxt, resultxt) = [e.tail.strip().split(':', 1)[-1].strip() for e in s.xpath('br')]
-                #print shootername, team, timetxt, resultxt
-                blocker = None
-
-                if not location:
-                    print(html.tostring(s))
-                    print(gamedata)
-                    raise Exception("No location")
-
-                if location == 'home':
-                    team = hometeam
-                    vsteam = awayteam
-                elif location == 'away':
-                    team = awayteam
-                    vsteam = hometeam
-                else:
-                    raise Exception("Unknown shot location '%s' (should be home or away)" % location)
+        with liigatrace.span('shotmap', 'parse', url=url, shots=len(shotdivs)):
+            for s in shotdivs:
+                scls = s.attrib.get('class').split()
+                if len(scls) == 5:
+                    (_, location, periodtxt, eventtxt, playertxt) = scls
+                #if len(scls) == 4:
+                #    (_, location, periodtxt, playertxt) = scls
+                #elif len(scls) == 5:
+                #    (_, __, location, periodtxt, playertxt) = scls
+                elif 'shot-tooltip' in scls:
+                    #print location, player
+                    shootername = s.text.strip().split(':')[-1].strip()
+                    (team, timetxt, resultxt) = [e.tail.strip().split(':', 1)[-1].strip() for e in children(s, 'br')]
+                    #print shootername, team, timetxt, resultxt
+                    blocker = None
+
+                    if not location:
+                        print(html.tostring(s))
+                        print(gamedata)
+                        raise Exception("No location")
+
+                    if location == 'home':
+                        team = hometeam
+                        vsteam = awayteam
+                    elif location == 'away':
+                        team = awayteam
+                        vsteam = hometeam
+                    else:
+                        raise Exception("Unknown shot location '%s' (should be home or away)" % location)
 
-                result = {
-                    'Laukaus ohi maalin': 'miss',
-                    'Maalivahti torjui': 'save',
-                    'Maali': 'goal',
-                    }.get(resultxt)
+                    result = {
+                        'Laukaus ohi maalin': 'miss',
+                        'Maalivahti torjui': 'save',
+                        'Maali': 'goal',
+                        }.get(resultxt)
 
-                shooter = playersbyname[(team, shootername)]
+                    shooter = playersbyname[(team, shootername)]
 
-                if not result and 'blokkasi' in resultxt:
-                    result = 'blocked'
-                    blocker = playersbyname[(vsteam, resultxt[resultxt.index('(')+1:resultxt.index(')')])]
+                    if not result and 'blokkasi' in resultxt:
+                        result = 'blocked'
+                        blocker = playersbyname[(vsteam, resultxt[resultxt.index('(')+1:resultxt.index(')')])]
 
-                if not result:
-                    raise Exception("Unknown shot result '%s'" % resultxt)
+                    if not result:
+                        raise Exception("Unknown shot result '%s'" % resultxt)
 
-                period = periodtxt.split('-')[-1]
-                if period == '4':
-                    period = 'JA'
+                    period = periodtxt.split('-')[-1]
+                    if period == '4':
+                        period = 'JA'
 
-                if result == 'goal':
-                    shotnum = 9
-                else:
-                    shotnum = shotnums.get(timetxt, 0)
-                    shotnums[timetxt] = shotnum + 1
-                id = gamedata.id * 100000 + int(timetxt.replace(':','')) * 10 + shotnum
-                shot = GameEventData(
-                    id = id,
-                    season = gamedata.season,
-                    playoffs = gamedata.playoffs,
-                    gameid = gamedata.id,
-                    time = timetxt,
-                    eventtype = 'shot',
-                    team = team,
-                    vsteam = vsteam,
-                    period = period,
-                    location = location,
-                    shooter = shooter,
-                    blocker = blocker,
-                    result = result,
-                )
-                yield shot
+                    if result == 'goal':
+                        shotnum = 9
+                    else:
+                        shotnum = shotnums.get(timetxt, 0)
+                        shotnums[timetxt] = shotnum + 1
+                    id = gamedata.id * 100000 + int(timetxt.replace(':','')) * 10 + shotnum
+                    shot = GameEventData(
+                        id = id,
+                        season = gamedata.season,
+                        playoffs = gamedata.playoffs,
+                        gameid = gamedata.id,
+                        time = timetxt,
+                        eventtype = 'shot',
+                        team = team,
+                        vsteam = vsteam,
+                        period = period,
+                        location = location,
+                        shooter = shooter,
+                        blocker = blocker,
+                        result = result,
+                    )
+                    yield shot
+                s.clear()
 
         homegamescore = 0
         awaygamescore = 0
@@ -704,18 +1052,21 @@ class LGParser(object):
                     playoffs = gamedata.playoffs,
                     **pdict)
                 yield gamestats
+
+        if self.state is not None:
+            self.state.mark(gamedata.id, row=self.rows.get(gameno), summary=summary, final=final)
                             
     def parsegameevent(self, gamedata, eventnum, home, gtimetxt, away, playersbyname):
         #print "TIME", gtimetxt, home.text, away.text
         id = gamedata.id * 1000000 + int(gtimetxt.replace(':',''))*100 + eventnum
-        ret = []
+        gke = None
         if gtimetxt == '65:00' and home.text and away.text:
             hometext = home.text.strip()
-            if not hometext and home.xpath("strong"):
-                hometext = home.xpath("strong")[0].text.strip()
+            if not hometext and children(home, 'strong'):
+                hometext = children(home, 'strong')[0].text.strip()
             awaytext = away.text.strip()
-            if not awaytext and away.xpath("strong"):
-                awaytext = away.xpath("strong")[0].text.strip()
+            if not awaytext and children(away, 'strong'):
+                awaytext = children(away, 'strong')[0].text.strip()
 
             if awaytext.startswith("#"):
                 elem = away
@@ -761,188 +1112,15 @@ class LGParser(object):
 
         players = [(num, p[0], p[1], p[2]) for num, p in zip(playernums, playermeta)]
 
-        def playerdata(data):
-            return dict(
-                number=int(data[0]),
-                id=data[1].replace('/fi/pelaajat/',''),
-                #name=data[2],
-                team=team,
-            )
-            
-        eventattr = {}
-        if strong is not None and players:
-            eventtype = 'goal'
-            scorer = players[0]
-            eventattr['scorer'] = playerdata(scorer)
-            eventattr['score'] = scorer[3].split()[1]
-            eventattr['assist1'] = None
-            eventattr['assist2'] = None
-            if len(players) > 1:
-                eventattr['assist1'] = playerdata(players[1])
-            if len(players) > 2:
-                eventattr['assist2'] = playerdata(players[2])
-
-            if strong.tail:
-                attrtext = players[-1][3].replace(')','').strip() + "," + strong.tail.replace('(', '')
-            else:
-                attrtext = players[-1][3].strip()
-            goalattr = [s.strip(',') for s in scorer[3].split()[2:]]
-
-                    
-            if gtimetxt > '60:00':
-                goalattr.append('JA')
-
-            eventattr['goalattr'] = ' '.join(goalattr)
-                
-
-        elif strong is not None and not players:
-            eventtype = 'goal'
-            self.psorder += 1
-            if athome:
-                self.pshomeorder += 1
-                psteamorder = self.pshomeorder
-            else:
-                self.psawayorder += 1
-                psteamorder = self.psawayorder
-
-            eventattr['scorer'] = dict(
-                number=int(strong.text.strip()[1:]),
-                id=playermeta[0][0].replace('/fi/pelaajat/',''),
-                team=team,
-            )
-            eventattr['psorder']=self.psorder
-            eventattr['psteamorder']=psteamorder
-            gkedivs = gke.xpath("div/div")
-            eventattr['pskeeper']=dict(
-                number=int(gkedivs[-1].text.strip()[5:]),
-                id=gkedivs[-1].xpath("a")[0].attrib.get('href').replace('/fi/pelaajat/',''),
-                team=vsteam,
-            )
-            eventattr['assist1'] = None
-            eventattr['assist2'] = None
-            eventattr['score'] = playermeta[0][2]
-            eventattr['goalattr'] = 'VL'
-
-        elif players and (" min " in players[0][3] or " min " in elem.text):
-            eventtype = 'penalty'
-            eventattr['player'] = None
-            eventattr['boxed'] = None
-            if " min " in players[0][3]:
-                words = players[0][3].split()
-
-                eventattr['player'] = playerdata(players[0])
-                eventattr['minutes'] = int(words[0])
-                eventattr['reason'] = " ".join(words[2:])
-            else:
-                words = elem.text.split()
-                minindex = words.index('min')
-                eventattr['minutes'] = int(words[minindex-1])
-                eventattr['reason'] = " ".join(words[minindex+1:])
-                eventattr['boxed'] = playerdata(players[0])
-                eventattr['penaltyattr'] = 'teampenalty'
-                
-
-            if len(players) > 1:
-                eventattr['boxed'] = playerdata(players[1])
-
-        elif players and ( 
-            "koukkaaminen" in players[0][3] or
-            "huitominen" in players[0][3] or
-            "korkea maila" in players[0][3] or
-            "kampitus" in players[0][3] or
-            "kiekon sulkeminen" in players[0][3] or
-            "pelin viivytt" in players[0][3] or
-            "kiinnipit" in players[0][3] or
-            "heitto" in players[0][3] or
-            u"estäminen" in players[0][3]
-            ):
-            eventtype = 'penalty'
-            eventattr['minutes'] = 0
-            eventattr['player'] = playerdata(players[0])
-            eventattr['reason'] = players[0][3].strip()
-            eventattr['boxed'] = None
-            
-
-        elif players and "Joukkuerangaistus" in elem.text:
-            eventtype = 'penalty'
-            eventattr['minutes'] = 0
-            eventattr['player'] = None
-            eventattr['boxed'] = playerdata(players[0])
-            eventattr['reason'] = elem.text.strip()
-            eventattr['penaltyattr'] = 'teampenalty'
-
-        elif 'Joukkuerangaistus' in elem.text:
-            eventtype = 'penalty'
-            words = elem.text.split()
-            minindex = words.index('min')
-            eventattr['minutes'] = int(words[minindex-1])
-            eventattr['reason'] = " ".join(words[minindex+1:])
-            eventattr['penaltyattr'] = 'teampenalty'
-            eventattr['player'] = None
-            eventattr['boxed'] = None
-
-        elif 'aikalis' in elem.text:
-            eventtype = 'timeout'
-
-        elif 'Maalivahti ulos' in elem.text:
-            eventtype = 'goalkeeper'
-            eventattr['event'] ='out'
-            eventattr['playerout'] = playerdata(players[0])
-            eventattr['playerin'] = None
-
-        elif 'Maalivahti sis' in elem.text:
-            eventtype = 'goalkeeper'
-            eventattr['event'] = 'in'
-            eventattr['playerin'] = playerdata(players[0])
-            eventattr['playerout'] = None
-
-        elif 'Maalivahdin vaihto' in elem.text:
-            if "ulos" in players[0][3]:
-                eventtype = 'goalkeeper'
-                eventattr['event'] = 'change'
-                eventattr['playerout'] = playerdata(players[0])
-                eventattr['playerin'] = playerdata(players[1])
-
-        elif 'Videotarkistus - ei maalia' in elem.text:
-            eventtype = 'videocheck'
-
-        elif 'Rangaistuslaukaus - ei maalia' in elem.text:
-            eventtype = 'penaltyshot'
-            eventattr['scored'] = False
-            pp = playersbyname[(team, elem.text[elem.text.index('(')+1:elem.text.index(')')])]
-            eventattr['player'] = pp
-            eventattr['keeper'] = None
-
-        elif gtimetxt == '65:00' and playermeta and not players and not gamedata.playoffs:
-            eventtype = 'penaltyshot'
-            self.psorder += 1
-            if athome:
-                self.pshomeorder += 1
-                psteamorder = self.pshomeorder
-            else:
-                self.psawayorder += 1
-                psteamorder = self.psawayorder
-
-            eventattr['player'] = dict(
-                number=int(elem.text.strip()[1:]),
-                id=playermeta[0][0].replace('/fi/pelaajat/',''),
-                team=team,
-            )
-            gkedivs = gke.xpath("div/div")
-            eventattr['keeper'] = dict(
-                number=int(gkedivs[-1].text.strip()[5:]),
-                id=gkedivs[-1].xpath("a")[0].attrib.get('href').replace('/fi/pelaajat/',''),
-                team=vsteam,
-            )
-            eventattr['psorder']=self.psorder
-            eventattr['psteamorder']=psteamorder
-            if "ei maalia" in playermeta[0][2]:
-                eventattr['scored'] = False
-            elif "maali" in playermeta[0][2]:
-                eventattr['scored'] = True
-
-        else:
+        row = TimelineRow(gamedata, gtimetxt, elem, strong, players, playermeta,
+                          team, vsteam, athome, gke, playersbyname)
+        rule = eventclassifier.classify(row)
+        event = None
+        if rule is not None:
+            event = getattr(self, rule)(row)
+        if event is None:
             raise Exception("Unknown gameevent, players: %s, elem.text: '%s'" % (players, elem.text))
+        (eventtype, eventattr) = event
 
         if 'reason' in eventattr and eventattr['reason'].endswith('('):
             eventattr['reason'] = eventattr['reason'][:-2].strip()
@@ -987,25 +1165,240 @@ class LGParser(object):
             location=elem.attrib['class'],
             **eventattr
         )
-            
+
+    def goalevent(self, row):
+        players = row.players
+        scorer = players[0]
+        eventattr = {}
+        eventattr['scorer'] = row.playerdata(scorer)
+        eventattr['score'] = scorer[3].split()[1]
+        eventattr['assist1'] = None
+        eventattr['assist2'] = None
+        if len(players) > 1:
+            eventattr['assist1'] = row.playerdata(players[1])
+        if len(players) > 2:
+            eventattr['assist2'] = row.playerdata(players[2])
+
+        goalattr = [s.strip(',') for s in scorer[3].split()[2:]]
+        if row.gtimetxt > '60:00':
+            goalattr.append('JA')
+
+        eventattr['goalattr'] = ' '.join(goalattr)
+        return ('goal', eventattr)
+
+    def shootoutorder(self, row):
+        self.psorder += 1
+        if row.athome:
+            self.pshomeorder += 1
+            return self.pshomeorder
+        self.psawayorder += 1
+        return self.psawayorder
+
+    def shootoutkeeper(self, row):
+        gkedivs = gkedivxpath(row.gke)
+        return dict(
+            number=int(gkedivs[-1].text.strip()[5:]),
+            id=children(gkedivs[-1], 'a')[0].attrib.get('href').replace('/fi/pelaajat/',''),
+            team=row.vsteam,
+        )
+
+    def shootoutgoalevent(self, row):
+        eventattr = {}
+        psteamorder = self.shootoutorder(row)
+        eventattr['scorer'] = dict(
+            number=int(row.strong.text.strip()[1:]),
+            id=row.playermeta[0][0].replace('/fi/pelaajat/',''),
+            team=row.team,
+        )
+        eventattr['psorder']=self.psorder
+        eventattr['psteamorder']=psteamorder
+        eventattr['pskeeper'] = self.shootoutkeeper(row)
+        eventattr['assist1'] = None
+        eventattr['assist2'] = None
+        eventattr['score'] = row.playermeta[0][2]
+        eventattr['goalattr'] = 'VL'
+        return ('goal', eventattr)
+
+    def penaltyevent(self, row):
+        players = row.players
+        eventattr = {}
+        eventattr['player'] = None
+        eventattr['boxed'] = None
+        if " min " in row.playerfound:
+            words = players[0][3].split()
+            eventattr['player'] = row.playerdata(players[0])
+            eventattr['minutes'] = int(words[0])
+            eventattr['reason'] = " ".join(words[2:])
+        else:
+            words = row.text.split()
+            minindex = words.index('min')
+            eventattr['minutes'] = int(words[minindex-1])
+            eventattr['reason'] = " ".join(words[minindex+1:])
+            eventattr['boxed'] = row.playerdata(players[0])
+            eventattr['penaltyattr'] = 'teampenalty'
+
+        if len(players) > 1:
+            eventattr['boxed'] = row.playerdata(players[1])
+        return ('penalty', eventattr)
+
+    def zeropenaltyevent(self, row):
+        eventattr = {}
+        eventattr['minutes'] = 0
+        eventattr['player'] = row.playerdata(row.players[0])
+        eventattr['reason'] = row.players[0][3].strip()
+        eventattr['boxed'] = None
+        return ('penalty', eventattr)
+
+    def playerteampenaltyevent(self, row):
+        eventattr = {}
+        eventattr['minutes'] = 0
+        eventattr['player'] = None
+        eventattr['boxed'] = row.playerdata(row.players[0])
+        eventattr['reason'] = row.text.strip()
+        eventattr['penaltyattr'] = 'teampenalty'
+        return ('penalty', eventattr)
+
+    def teampenaltyevent(self, row):
+        eventattr = {}
+        words = row.text.split()
+        minindex = words.index('min')
+        eventattr['minutes'] = int(words[minindex-1])
+        eventattr['reason'] = " ".join(words[minindex+1:])
+        eventattr['penaltyattr'] = 'teampenalty'
+        eventattr['player'] = None
+        eventattr['boxed'] = None
+        return ('penalty', eventattr)
+
+    def timeoutevent(self, row):
+        return ('timeout', {})
+
+    def goalkeeperoutevent(self, row):
+        eventattr = {}
+        eventattr['event'] ='out'
+        eventattr['playerout'] = row.playerdata(row.players[0])
+        eventattr['playerin'] = None
+        return ('goalkeeper', eventattr)
+
+    def goalkeeperinevent(self, row):
+        eventattr = {}
+        eventattr['event'] = 'in'
+        eventattr['playerin'] = row.playerdata(row.players[0])
+        eventattr['playerout'] = None
+        return ('goalkeeper', eventattr)
+
+    def goalkeeperchangeevent(self, row):
+        if "ulos" in row.playertext:
+            eventattr = {}
+            eventattr['event'] = 'change'
+            eventattr['playerout'] = row.playerdata(row.players[0])
+            eventattr['playerin'] = row.playerdata(row.players[1])
+            return ('goalkeeper', eventattr)
+
+    def videocheckevent(self, row):
+        return ('videocheck', {})
+
+    def penaltyshotevent(self, row):
+        text = row.text
+        eventattr = {}
+        eventattr['scored'] = False
+        eventattr['player'] = row.playersbyname[(row.team, text[text.index('(')+1:text.index(')')])]
+        eventattr['keeper'] = None
+        return ('penaltyshot', eventattr)
+
+    def shootoutevent(self, row):
+        if row.gtimetxt != '65:00' or not row.playermeta or row.gamedata.playoffs:
+            return None
+        eventattr = {}
+        psteamorder = self.shootoutorder(row)
+        eventattr['player'] = dict(
+            number=int(row.text.strip()[1:]),
+            id=row.playermeta[0][0].replace('/fi/pelaajat/',''),
+            team=row.team,
+        )
+        eventattr['keeper'] = self.shootoutkeeper(row)
+        eventattr['psorder']=self.psorder
+        eventattr['psteamorder']=psteamorder
+        if "ei maalia" in row.playermeta[0][2]:
+            eventattr['scored'] = False
+        elif "maali" in row.playermeta[0][2]:
+            eventattr['scored'] = True
+        return ('penaltyshot', eventattr)
+
+
+def parsegamepages(url, season, teams, latest, row, gamestate, args, pages, trace=False, isolate=False):
+    # runs in a ParsePool worker: parses one game from its downloaded pages
+    # and returns its records, the spans of the game when tracing and with
+    # isolate the error instead of raising it
+    # inline (procs < 2) the spans go to the tracer of the process itself
+    tracer = liigatrace.tracer
+    if trace and (tracer is None or tracer.pid != os.getpid()):
+        liigatrace.tracer = liigatrace.Tracer()
+    parser = LGParser(url, engine=liigacrawl.StaticPages(pages))
+    parser.season = season
+    parser.teams = teams
+    parser.latest = latest
+    parser.rows = {args[0]: row}
+    gameid = season.id*1000+args[0]
+    if gamestate is not None:
+        parser.state = SyncState(None)
+        parser.state.games = {str(gameid): dict(gamestate)}
+
+    error = None
+    try:
+        records = list(parser.parsegame(*args))
+    except Exception as e:
+        if not isolate:
+            raise
+        (records, error) = ([], liigaquarantine.failure(e))
+
+    if error is not None:
+        gamestate = None
+    elif gamestate is not None:
+        newstate = dict(gamestate, **parser.state.marks.get(str(gameid), {}))
+        gamestate = newstate if newstate != gamestate else None
+    events = None
+    if liigatrace.tracer is not tracer:
+        events = liigatrace.tracer.collect()
+        liigatrace.tracer = tracer
+    return (gameid, records, gamestate, events, error)
 
 
 if __name__ == "__main__":
-    urltype = sys.argv[1]
-    url = sys.argv[2]
-
-    parser = LGParser(url)
-    if urltype == 'season':
-        for event in parser.parseseason():
-            print(event.tojson())
-    if urltype == 'seasonlatest':
-        for event in parser.parseseason(latest=True):
-            print(event.tojson())
-    elif urltype == 'playoffs':
-        for event in parser.parseplayoffs():
-            print(event.tojson())
-    elif urltype == 'game':
-        for event in parser.parsegameurl():
-            print(event.tojson())
-        
-        
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        urltype = sys.argv[1]
+        url = sys.argv[2] if len(sys.argv) > 2 else None
+
+        state = None
+        if urltype in ['seasonsync', 'playoffssync']:
+            state = SyncState(options.get('state', 'liigasync.json'))
+            sink.flushed.append(state.save)
+
+        parser = LGParser(url,
+                          workers=int(options.get('workers', 6)),
+                          prefetch=int(options.get('prefetch', 4)),
+                          state=state,
+                          pool=liigacrawl.ParsePool(int(options.get('procs', 0))))
+        parser.quarantine = liigaquarantine.configure(options, 'liigaparser', parser.engine)
+        if urltype in ['season', 'seasonsync']:
+            for event in parser.parseseason():
+                sink.write(event)
+        if urltype == 'seasonlatest':
+            for event in parser.parseseason(latest=True):
+                sink.write(event)
+        elif urltype in ['playoffs', 'playoffssync']:
+            for event in parser.parseplayoffs():
+                sink.write(event)
+        elif urltype == 'game':
+            for event in parser.parsegameurl():
+                sink.write(event)
+        elif urltype == 'retry-quarantine':
+            if parser.quarantine is None:
+                raise Exception("retry-quarantine needs --quarantine=FILE")
+            retrygame = lambda url, game: LGParser(url, engine=parser.engine).retrygame(game)
+            for event in parser.quarantine.retry({'game': retrygame}):
+                sink.write(event)
+    finally:
+        sink.close()
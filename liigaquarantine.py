@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import json
+import os
+import sys
+import threading
+import traceback
+
+
+def failure(e):
+    # the exception being handled, as stored in the quarantine
+    return dict(type=type(e).__name__, message=str(e), traceback=traceback.format_exc())
+
+
+def pagetext(content):
+    if content is None:
+        return None
+    return content.decode('utf-8', 'replace')
+
+
+class Quarantine(object):
+    # Units of a crawl (a game, a player profile, a statistics page) that
+    # failed, as lines of JSON in path: the command and unit, the arguments
+    # to run the unit again, the error and the raw pages of the unit. The
+    # records of a unit are written only when all of them could be parsed,
+    # so a failed unit writes nothing and the crawl goes on with the next.
+    # The raw pages are the ones the unit got from the crawl engine, see
+    # record(); pages are not requested again for the quarantine.
+
+    def __init__(self, path, command):
+        self.path = path
+        self.command = command
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def record(self, url, page, error):
+        # the engine got a page or an error for url, kept for the units
+        # running in this thread (a series and its team tables)
+        for pages in getattr(self.local, 'units', []):
+            pages[url] = page.content if page is not None else None
+
+    def run(self, unit, records, urls=(), **args):
+        # the records of the unit, None when it failed
+        units = getattr(self.local, 'units', [])
+        pages = {}
+        self.local.units = units + [pages]
+        try:
+            return list(records)
+        except Exception as e:
+            self.put(unit, failure(e), urls, args, pages)
+            return None
+        finally:
+            self.local.units = units
+
+    def put(self, unit, error, urls=(), args=None, pages=None):
+        # pages has the raw pages of urls, None for the ones that failed or
+        # were not got
+        pages = pages or {}
+        entry = dict(
+            command=self.command,
+            unit=unit,
+            args=args or {},
+            urls=list(urls),
+            error=error,
+            pages=dict((url, pagetext(pages.get(url))) for url in urls),
+            time=datetime.datetime.now().isoformat(timespec='seconds'),
+        )
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as fp:
+                fp.write(line)
+            self.failed += 1
+        sys.stderr.write("Quarantined %s %s: %s: %s\n" % (
+            unit, ' '.join('%s=%s' % (k, v) for (k, v) in sorted(entry['args'].items())),
+            error['type'], error['message']))
+
+
+    def lines(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as fp:
+            return [l for l in fp if l.strip()]
+
+    @classmethod
+    def records(self, handler, args):
+        # errors of the handler itself count as errors of the unit
+        for r in handler(**args):
+            yield r
+
+    def retry(self, handlers):
+        # runs the units of this command again with handlers[unit](**args)
+        # and takes them out of the quarantine; units failing again are
+        # put back with their new error
+        lines = self.lines()
+        retried = set()
+        for (i, line) in enumerate(lines):
+            entry = json.loads(line)
+            if entry['command'] != self.command or entry['unit'] not in handlers:
+                continue
+            retried.add(i)
+            records = self.run(entry['unit'], self.records(handlers[entry['unit']], entry['args']),
+                               entry['urls'], **entry['args'])
+            for r in records or []:
+                yield r
+
+        with self.lock:
+            lines = [l for (i, l) in enumerate(self.lines()) if i not in retried]
+            tmpname = self.path + '.tmp'
+            with open(tmpname, 'w') as fp:
+                fp.writelines(lines)
+            os.replace(tmpname, self.path)
+
+
+def isolate(quarantine, unit, records, urls=(), **args):
+    # records of a unit run in the quarantine, or as they are without one
+    if quarantine is None:
+        return records
+    return quarantine.run(unit, records, urls, **args)
+
+
+def configure(options, command, engine):
+    # without --quarantine=FILE the first failing unit ends the crawl
+    path = options.get('quarantine')
+    if not path:
+        return None
+    if path is True:
+        raise Exception("--quarantine needs a file: --quarantine=FILE")
+    quarantine = Quarantine(path, command)
+    engine.fetched.append(quarantine.record)
+    return quarantine
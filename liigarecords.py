@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import json
+
+
+class ParserData(object):
+    # Base of all output records. Subclasses declare their fields in
+    # __slots__, so a record takes no per instance dict. Fields that were
+    # never set are left out of the output, like fields not given at all.
+
+    __slots__ = ()
+    type = None
+
+    def __init__(self, **values):
+        for attr in values:
+            setattr(self, attr, values[attr])
+
+    @classmethod
+    def fields(self):
+        fields = self.__dict__.get('_fields')
+        if fields is None:
+            fields = []
+            for cls in reversed(self.__mro__):
+                for attr in cls.__dict__.get('__slots__', ()):
+                    if attr not in fields:
+                        fields.append(attr)
+            fields = tuple(fields)
+            self._fields = fields
+        return fields
+
+    def values(self):
+        values = {'type': self.type}
+        for attr in self.fields():
+            try:
+                values[attr] = getattr(self, attr)
+            except AttributeError:
+                pass
+        return values
+
+    def tojson(self):
+        return json.dumps(self.values(), sort_keys=True)
+
+    def __str__(self):
+        return str(self.values())
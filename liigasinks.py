@@ -0,0 +1,685 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import io
+import json
+import mmap
+import os
+import re
+import sqlite3
+import stat
+import struct
+import sys
+import liigafetch
+import liigatrace
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def flatten(values, prefix='', row=None):
+    # nested dicts to columns named like home_team, lists to JSON
+    if row is None:
+        row = {}
+    for (name, value) in values.items():
+        if isinstance(value, dict):
+            flatten(value, prefix + name + '_', row)
+        elif isinstance(value, (list, tuple)):
+            row[prefix + name] = json.dumps(value, sort_keys=True)
+        else:
+            row[prefix + name] = value
+    return row
+
+
+# stands in for the fields a record does not have
+missing = object()
+
+
+class JsonEncoder(object):
+    # Encodes records to the same text as ParserData.tojson. The sorted keys
+    # of each record type are encoded once, values of the common scalar types
+    # are encoded directly and only nested values go through json.
+
+    def __init__(self):
+        self.layouts = {}
+        self.encoder = json.JSONEncoder(sort_keys=True)
+        self.scalars = {
+            str: json.encoder.encode_basestring_ascii,
+            int: int.__repr__,
+            bool: lambda v: 'true' if v else 'false',
+            type(None): lambda v: 'null',
+        }
+
+    def layout(self, cls):
+        layout = self.layouts.get(cls)
+        if layout is None:
+            names = sorted(set(cls.fields()) | set(['type']))
+            layout = [(name, json.encoder.encode_basestring_ascii(name) + ': ') for name in names]
+            self.layouts[cls] = layout
+        return layout
+
+    def encode(self, record):
+        scalars = self.scalars
+        parts = []
+        for (name, key) in self.layout(type(record)):
+            # most records set few of their fields, a default is cheaper
+            # than catching AttributeError for each unset one
+            value = getattr(record, name, missing)
+            if value is missing:
+                continue
+            encode = scalars.get(type(value))
+            if encode is None:
+                encode = self.encoder.encode
+            parts.append(key + encode(value))
+        return '{' + ', '.join(parts) + '}'
+
+
+class OrjsonEncoder(object):
+    # Same keys and values with orjson, but compact and not ascii escaped,
+    # so the output is not byte identical to tojson
+
+    def __init__(self):
+        if orjson is None:
+            raise Exception("orjson is not installed")
+
+    def encode(self, record):
+        return orjson.dumps(record.values(), option=orjson.OPT_SORT_KEYS).decode('utf-8')
+
+
+class JsonSink(object):
+    # Writes records as lines of JSON, batch records at a time
+
+    def __init__(self, out=None, batch=1000, encoder=None):
+        self.out = out or sys.stdout
+        self.batch = batch
+        self.encoder = encoder or JsonEncoder()
+        self.records = []
+        # functions called when the records given so far are written, for
+        # state that must not get ahead of the output (SyncState.save)
+        self.flushed = []
+
+    def write(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            with liigatrace.span('serialize', 'serialize', sink='json', records=len(self.records)) as span:
+                encode = self.encoder.encode
+                lines = [encode(r) for r in self.records]
+                lines.append('')
+                text = '\n'.join(lines)
+                self.out.write(text)
+                span.set(bytes=len(text))
+            del self.records[:]
+        self.out.flush()
+        for flushed in self.flushed:
+            flushed()
+
+    # Sinks give a position with everything written so far from checkpoint()
+    # and go back to it with resume(position), see liigacheckpoint
+
+    def checkpoint(self):
+        # the offset in out when it is a file
+        self.flush()
+        try:
+            if not stat.S_ISREG(os.fstat(self.out.fileno()).st_mode):
+                return None
+            return self.out.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+    def resume(self, position):
+        if position is None:
+            return
+        self.out.seek(0, os.SEEK_END)
+        if self.out.tell() < position:
+            raise Exception("Output is shorter than at the checkpoint (%d < %d bytes), append to it when resuming"
+                            % (self.out.tell(), position))
+        self.out.truncate(position)
+        self.out.seek(position)
+
+    def close(self):
+        self.flush()
+
+
+class ParquetSink(object):
+    # Writes records to one parquet file per record type and season,
+    # <path>/<type>/<season>.parquet, in row groups of rowgroup rows, with
+    # flattened columns. Records without a season go with the latest season
+    # record.
+    # Row groups are kept as arrow tables until the season is complete, so
+    # every file gets one schema covering all of its records.
+
+    def __init__(self, path, rowgroup=10000):
+        if pyarrow is None:
+            raise Exception("pyarrow is not installed")
+        self.path = path
+        self.rowgroup = rowgroup
+        self.season = None
+        self.rows = {}
+        self.tables = {}
+        self.parts = {}
+        self.flushed = []
+
+    def write(self, record):
+        values = record.values()
+        if values['type'] == 'season' and values.get('years') != self.season:
+            # earlier seasons are complete
+            self.finish([key for key in self.keys() if key[1] != 'all'])
+            self.season = values.get('years')
+
+        season = values.get('season') or self.season
+        key = (values['type'], 'all' if season is None else str(season))
+        rows = self.rows.setdefault(key, [])
+        rows.append(flatten(values))
+        if len(rows) >= self.rowgroup:
+            self.tables.setdefault(key, []).append(self.table(rows))
+            self.rows[key] = []
+
+    def keys(self):
+        return set(self.rows) | set(self.tables)
+
+    @classmethod
+    def table(self, rows):
+        names = []
+        for row in rows:
+            for name in row:
+                if name not in names:
+                    names.append(name)
+        arrays = []
+        for name in names:
+            column = [row.get(name) for row in rows]
+            try:
+                arrays.append(pyarrow.array(column))
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                # values of different types are stored as text
+                column = [v if v is None or isinstance(v, str) else json.dumps(v) for v in column]
+                arrays.append(pyarrow.array(column))
+        return pyarrow.Table.from_arrays(arrays, names=names)
+
+    @classmethod
+    def unify(self, tables):
+        names = []
+        types = {}
+        for table in tables:
+            for field in table.schema:
+                if field.name not in types:
+                    names.append(field.name)
+                    types[field.name] = set()
+                if not pyarrow.types.is_null(field.type):
+                    types[field.name].add(field.type)
+
+        fields = []
+        for name in names:
+            kinds = types[name]
+            if not kinds:
+                kind = pyarrow.null()
+            elif len(kinds) == 1:
+                kind = kinds.pop()
+            elif all(pyarrow.types.is_integer(k) or pyarrow.types.is_floating(k) for k in kinds):
+                kind = pyarrow.float64()
+            else:
+                kind = pyarrow.string()
+            fields.append(pyarrow.field(name, kind))
+        return pyarrow.schema(fields)
+
+    @classmethod
+    def conform(self, table, schema):
+        columns = []
+        for field in schema:
+            if field.name in table.column_names:
+                columns.append(table.column(field.name).cast(field.type))
+            else:
+                columns.append(pyarrow.nulls(len(table), field.type))
+        return pyarrow.Table.from_arrays(columns, schema=schema)
+
+    def filename(self, key):
+        (rtype, season) = key
+        dirname = os.path.join(self.path, rtype)
+        part = self.parts.get(key, 0)
+        self.parts[key] = part + 1
+        if part:
+            # more records of a season that was already written
+            return os.path.join(dirname, '%s.%d.parquet' % (season, part))
+
+        os.makedirs(dirname, exist_ok=True)
+        old = re.compile(r'^%s(\.\d+)?\.parquet$' % re.escape(season))
+        for f in os.listdir(dirname):
+            if old.match(f):
+                os.remove(os.path.join(dirname, f))
+        return os.path.join(dirname, '%s.parquet' % season)
+
+    def finish(self, keys):
+        for key in sorted(keys):
+            tables = self.tables.pop(key, [])
+            rows = self.rows.pop(key, [])
+            if rows:
+                tables.append(self.table(rows))
+            if not tables:
+                continue
+            filename = self.filename(key)
+            with liigatrace.span('serialize', 'serialize', sink='parquet', file=filename,
+                                 records=sum(len(t) for t in tables)):
+                schema = self.unify(tables)
+                writer = pyarrow.parquet.ParquetWriter(filename, schema)
+                for table in tables:
+                    writer.write_table(self.conform(table, schema), row_group_size=self.rowgroup)
+                writer.close()
+
+    def flush(self):
+        pass
+
+    def checkpoint(self):
+        # writes out every key, later records of them go to further parts
+        self.finish(self.keys())
+        for flushed in self.flushed:
+            flushed()
+        parts = dict(('%s/%s' % key, part) for (key, part) in self.parts.items())
+        return dict(season=self.season, parts=parts)
+
+    def resume(self, position):
+        # removes the parts written after the checkpoint
+        self.season = position['season']
+        self.parts = dict((tuple(key.split('/', 1)), part) for (key, part) in position['parts'].items())
+        for ((rtype, season), part) in self.parts.items():
+            dirname = os.path.join(self.path, rtype)
+            later = re.compile(r'^%s\.(\d+)\.parquet$' % re.escape(season))
+            for f in os.listdir(dirname):
+                m = later.match(f)
+                if m and int(m.group(1)) >= part:
+                    os.remove(os.path.join(dirname, f))
+
+    def close(self):
+        self.finish(self.keys())
+        for flushed in self.flushed:
+            flushed()
+
+
+class SqliteSink(object):
+    # Writes records to a SQLite database, a table per record type with
+    # flattened columns. Records are upserted on their key, rows that did
+    # not change are not written again. Columns are added as they appear.
+
+    keys = {
+        'player': ('gameid', 'id'),
+        'goalkeeper': ('gameid', 'id'),
+        'teamstat': ('team', 'season'),
+        'playerstats': ('playerid', 'season', 'playoffs', 'team'),
+        'playermeta': ('playerid',),
+        'otherseries': ('playerid', 'season', 'series', 'team'),
+        # the ice time records have no season, their rows are appended
+        'playertimestats': (),
+        'teamppstats': (),
+        'teamshstats': (),
+        'timestamp': (),
+    }
+
+    # nested player references (scorer_id, shooter_id, boxed_id, ...) are
+    # indexed too, as their columns are added
+    indexes = ('gameid', 'season', 'team', 'playerid')
+    typeindexes = {
+        'player': ('id',),
+        'goalkeeper': ('id',),
+    }
+
+    def __init__(self, path, batch=5000):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.batch = batch
+        self.count = 0
+        self.rows = {}
+        self.tablekeys = {}
+        self.columns = {}
+        self.indexed = set()
+        self.statements = {}
+        self.flushed = []
+
+    @classmethod
+    def quote(self, name):
+        return '"%s"' % name.replace('"', '""')
+
+    @classmethod
+    def key(self, cls):
+        if cls.type in self.keys:
+            return self.keys[cls.type]
+        if 'id' in cls.fields():
+            return ('id',)
+        return ()
+
+    def write(self, record):
+        rtype = record.type
+        if rtype not in self.rows:
+            self.rows[rtype] = []
+            self.tablekeys[rtype] = self.key(type(record))
+        row = flatten(record.values())
+        del row['type']
+        self.rows[rtype].append(row)
+        self.count += 1
+        if self.count >= self.batch:
+            self.flush()
+
+    def table(self, rtype, names):
+        columns = self.columns.get(rtype)
+        if columns is None:
+            columns = set(r[1] for r in self.db.execute('PRAGMA table_info(%s)' % self.quote(rtype)))
+        if not columns:
+            key = self.tablekeys[rtype]
+            defs = [self.quote(name) for name in key]
+            if key:
+                defs.append('PRIMARY KEY (%s)' % ', '.join(self.quote(name) for name in key))
+            else:
+                defs.append('"rowid_" INTEGER PRIMARY KEY')
+            self.db.execute('CREATE TABLE %s (%s)' % (self.quote(rtype), ', '.join(defs)))
+            columns = set(key) | set(['rowid_'] if not key else [])
+
+        for name in names:
+            if name not in columns:
+                self.db.execute('ALTER TABLE %s ADD COLUMN %s' % (self.quote(rtype), self.quote(name)))
+                columns.add(name)
+            # the first key column is covered by the primary key
+            if name in self.indexes or name in self.typeindexes.get(rtype, ()) or name.endswith('_id'):
+                if (rtype, name) not in self.indexed and self.tablekeys[rtype][:1] != (name,):
+                    self.db.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+                        self.quote('%s_%s' % (rtype, name)), self.quote(rtype), self.quote(name)))
+                    self.indexed.add((rtype, name))
+        self.columns[rtype] = columns
+
+    def statement(self, rtype, names):
+        sql = self.statements.get((rtype, names))
+        if sql is None:
+            key = self.tablekeys[rtype]
+            sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+                self.quote(rtype), ', '.join(self.quote(n) for n in names), ', '.join('?' for n in names))
+            update = [n for n in names if n not in key]
+            if key and update:
+                sql += ' ON CONFLICT (%s) DO UPDATE SET %s WHERE %s' % (
+                    ', '.join(self.quote(n) for n in key),
+                    ', '.join('%s = excluded.%s' % (self.quote(n), self.quote(n)) for n in update),
+                    ' OR '.join('%s.%s IS NOT excluded.%s' % (self.quote(rtype), self.quote(n), self.quote(n)) for n in update))
+            elif key:
+                sql += ' ON CONFLICT (%s) DO NOTHING' % ', '.join(self.quote(n) for n in key)
+            self.statements[(rtype, names)] = sql
+        return sql
+
+    def flush(self):
+        with liigatrace.span('serialize', 'serialize', sink='sqlite', records=self.count), self.db:
+            for (rtype, rows) in self.rows.items():
+                if not rows:
+                    continue
+                groups = {}
+                for row in rows:
+                    groups.setdefault(tuple(row), []).append(tuple(row.values()))
+                for (names, values) in groups.items():
+                    self.table(rtype, names)
+                    self.db.executemany(self.statement(rtype, names), values)
+                del rows[:]
+        self.count = 0
+        for flushed in self.flushed:
+            flushed()
+
+    def checkpoint(self):
+        # records written again after a resume are upserted to the same rows
+        self.flush()
+        return None
+
+    def resume(self, position):
+        pass
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+# Record log: a header, then records as a 4 byte length and the msgpack (or
+# JSON when msgpack is not installed) encoded values. The index next to it
+# has an entry per record: log offset, id, gameid and type.
+LOGMAGIC = b'LGLOG1'
+LOGHEADER = struct.Struct('<6sc')
+LOGLENGTH = struct.Struct('<I')
+LOGINDEX = struct.Struct('<Qqq16s')
+NOID = -2**63
+
+
+def logcodec(codec):
+    if codec == b'm':
+        if msgpack is None:
+            raise Exception("msgpack is not installed")
+        return (lambda v: msgpack.packb(v, use_bin_type=True),
+                lambda b: msgpack.unpackb(b, raw=False))
+    if codec == b'j':
+        return (lambda v: json.dumps(v, sort_keys=True).encode('utf-8'),
+                lambda b: json.loads(b.decode('utf-8')))
+    raise Exception("Unknown record log codec: %r" % codec)
+
+
+class LogSink(object):
+    # Appends records to the log at path and their index entries to
+    # path.idx. Log data is flushed before the index entries pointing to
+    # it are written, so readers may read while records are appended.
+
+    def __init__(self, path, batch=1000):
+        self.path = path
+        self.batch = batch
+        self.records = []
+        self.entries = []
+        self.flushed = []
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as fp:
+                fp.write(LOGHEADER.pack(LOGMAGIC, b'm' if msgpack is not None else b'j'))
+            with open(path + '.idx', 'wb'):
+                pass
+
+        self.log = open(path, 'r+b')
+        (magic, codec) = LOGHEADER.unpack(self.log.read(LOGHEADER.size))
+        if magic != LOGMAGIC:
+            raise Exception("Not a record log: %s" % path)
+        (self.encode, self.decode) = logcodec(codec)
+        if os.path.exists(path + '.idx'):
+            self.index = open(path + '.idx', 'r+b')
+        else:
+            self.index = open(path + '.idx', 'w+b')
+            self.reindex()
+        self.recover()
+
+    def reindex(self):
+        # index of a log whose index file is lost
+        self.log.seek(0, os.SEEK_END)
+        size = self.log.tell()
+        offset = LOGHEADER.size
+        while offset + LOGLENGTH.size <= size:
+            self.log.seek(offset)
+            (length,) = LOGLENGTH.unpack(self.log.read(LOGLENGTH.size))
+            data = self.log.read(length)
+            if len(data) < length:
+                break
+            self.index.write(self.entry(offset, self.decode(data)))
+            offset += LOGLENGTH.size + length
+        self.index.flush()
+
+    def recover(self):
+        # drop whatever an interrupted run wrote after the last complete
+        # indexed record
+        count = os.fstat(self.index.fileno()).st_size // LOGINDEX.size
+        end = LOGHEADER.size
+        if count:
+            self.index.seek((count-1) * LOGINDEX.size)
+            offset = LOGINDEX.unpack(self.index.read(LOGINDEX.size))[0]
+            self.log.seek(offset)
+            end = offset + LOGLENGTH.size + LOGLENGTH.unpack(self.log.read(LOGLENGTH.size))[0]
+        self.index.truncate(count * LOGINDEX.size)
+        self.log.truncate(end)
+        self.index.seek(0, os.SEEK_END)
+        self.log.seek(0, os.SEEK_END)
+        self.offset = end
+
+    @classmethod
+    def intid(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return NOID
+
+    def entry(self, offset, values):
+        gameid = values.get('gameid')
+        if gameid is None and values['type'] == 'game':
+            gameid = values.get('id')
+        return LOGINDEX.pack(offset, self.intid(values.get('id')), self.intid(gameid),
+                             values['type'].encode('ascii'))
+
+    def write(self, record):
+        values = record.values()
+        data = self.encode(values)
+        self.records.append(LOGLENGTH.pack(len(data)) + data)
+        self.entries.append(self.entry(self.offset, values))
+        self.offset += LOGLENGTH.size + len(data)
+        if len(self.records) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            with liigatrace.span('serialize', 'serialize', sink='log', records=len(self.records)) as span:
+                data = b''.join(self.records)
+                self.log.write(data)
+                self.log.flush()
+                self.index.write(b''.join(self.entries))
+                self.index.flush()
+                span.set(bytes=len(data))
+            self.records = []
+            self.entries = []
+        for flushed in self.flushed:
+            flushed()
+
+    def checkpoint(self):
+        self.flush()
+        return dict(offset=self.offset, entries=self.index.tell() // LOGINDEX.size)
+
+    def resume(self, position):
+        if self.offset < position['offset']:
+            raise Exception("Record log %s is shorter than at the checkpoint" % self.path)
+        self.log.truncate(position['offset'])
+        self.index.truncate(position['entries'] * LOGINDEX.size)
+        self.log.seek(0, os.SEEK_END)
+        self.index.seek(0, os.SEEK_END)
+        self.offset = position['offset']
+
+    def close(self):
+        self.flush()
+        self.log.close()
+        self.index.close()
+
+
+class LogReader(object):
+    # Finds records of a record log by id, gameid and type from its index
+    # and decodes only those from the memory mapped log. refresh() picks up
+    # records appended since.
+
+    def __init__(self, path):
+        self.path = path
+        self.log = open(path, 'rb')
+        (magic, codec) = LOGHEADER.unpack(self.log.read(LOGHEADER.size))
+        if magic != LOGMAGIC:
+            raise Exception("Not a record log: %s" % path)
+        (_, self.decode) = logcodec(codec)
+        self.index = open(path + '.idx', 'rb')
+        self.map = None
+        self.entries = []
+        self.byid = {}
+        self.bygameid = {}
+        self.refresh()
+
+    def refresh(self):
+        self.index.seek(len(self.entries) * LOGINDEX.size)
+        data = self.index.read()
+        data = data[:len(data) - len(data) % LOGINDEX.size]
+        for entry in LOGINDEX.iter_unpack(data):
+            (offset, id, gameid, rtype) = entry
+            n = len(self.entries)
+            self.entries.append((offset, rtype.rstrip(b'\0').decode('ascii')))
+            if id != NOID:
+                self.byid.setdefault(id, []).append(n)
+            if gameid != NOID:
+                self.bygameid.setdefault(gameid, []).append(n)
+
+        size = os.fstat(self.log.fileno()).st_size
+        if self.map is None or len(self.map) < size:
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.log.fileno(), size, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, offset):
+        (length,) = LOGLENGTH.unpack_from(self.map, offset)
+        start = offset + LOGLENGTH.size
+        return self.decode(self.map[start:start+length])
+
+    def get(self, id=None, gameid=None, type=None):
+        if id is not None:
+            found = self.byid.get(id, [])
+            if gameid is not None:
+                ingame = set(self.bygameid.get(gameid, []))
+                found = [n for n in found if n in ingame]
+        elif gameid is not None:
+            found = self.bygameid.get(gameid, [])
+        else:
+            found = range(len(self.entries))
+        for n in found:
+            (offset, rtype) = self.entries[n]
+            if type is None or rtype == type:
+                yield self.read(offset)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.log.close()
+        self.index.close()
+
+
+encoders = {
+    'json': JsonEncoder,
+    'orjson': OrjsonEncoder,
+}
+
+
+def opensink(options):
+    if options.get('parquet'):
+        return ParquetSink(options['parquet'], rowgroup=int(options.get('rowgroup', 10000)))
+    if options.get('sqlite'):
+        return SqliteSink(options['sqlite'])
+    if options.get('log'):
+        return LogSink(options['log'])
+    encoder = options.get('json', 'json')
+    if encoder not in encoders:
+        raise Exception("Unknown JSON encoder: %s" % encoder)
+    return JsonSink(encoder=encoders[encoder]())
+
+
+if __name__ == "__main__":
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    urltype = sys.argv[1]
+
+    if urltype == 'log':
+        reader = LogReader(sys.argv[2])
+        id = int(options['id']) if 'id' in options else None
+        gameid = int(options['gameid']) if 'gameid' in options else None
+        for values in reader.get(id, gameid, options.get('type')):
+            print(json.dumps(values, sort_keys=True))
+        reader.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import atexit
+import json
+import os
+import threading
+import time
+
+
+class Span(object):
+    # One timed phase, written as a Chrome trace complete event
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exctype, exc, tb):
+        if exctype is not None:
+            self.args['error'] = exctype.__name__
+        self.tracer.add(self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class NoSpan(object):
+    # Stands in for spans while tracing is off. It is false, so arguments
+    # that take work to compute can be left out with "if span:".
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, exc, tb):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+nospan = NoSpan()
+
+
+class Tracer(object):
+    # Collects spans of all threads and writes them as a Chrome trace
+    # (chrome://tracing, ui.perfetto.dev) when closed. Without a path the
+    # events are only kept, a ParsePool worker returns them to the parent.
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self.threads = {}
+
+    def add(self, name, cat, start, end, args):
+        thread = threading.current_thread()
+        if thread.ident not in self.threads:
+            self.threads[thread.ident] = thread.name
+        self.events.append({
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': round(start * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': self.pid,
+            'tid': thread.ident,
+            'args': args,
+        })
+
+    def records(self, name, cat, records, args):
+        with Span(self, name, cat, args) as span:
+            count = 0
+            try:
+                for r in records:
+                    count += 1
+                    yield r
+            finally:
+                span.set(records=count)
+
+    def counter(self, name, values):
+        self.events.append({
+            'name': name,
+            'ph': 'C',
+            'ts': round(time.perf_counter() * 1e6, 1),
+            'pid': self.pid,
+            'args': values,
+        })
+
+    def extend(self, events):
+        self.events.extend(events)
+
+    def collect(self):
+        events = list(self.events)
+        for (tid, name) in self.threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                           'args': {'name': name}})
+        return events
+
+    def close(self):
+        if self.path is None:
+            return
+        with open(self.path, 'w') as fp:
+            json.dump({'traceEvents': self.collect(), 'displayTimeUnit': 'ms'}, fp)
+        self.path = None
+
+
+tracer = None
+
+
+def span(name, cat, **args):
+    if tracer is None:
+        return nospan
+    return Span(tracer, name, cat, args)
+
+
+def records(name, cat, records, **args):
+    # a span from the first to the last record of an iterator, with the
+    # number of records; the iterator itself while tracing is off
+    if tracer is None:
+        return records
+    return tracer.records(name, cat, records, args)
+
+
+def counter(name, **values):
+    if tracer is not None:
+        tracer.counter(name, values)
+
+
+def configure(options):
+    global tracer
+    if options.get('trace'):
+        tracer = Tracer(options['trace'])
+        atexit.register(tracer.close)
@@ -1,43 +1,34 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import datetime
-import urlparse
-import requests
 import json
+import os
 import sys
+import liigacheckpoint
+import liigacrawl
+import liigafetch
+import liigaquarantine
+import liigarecords
+import liigasinks
+import liigatrace
 
-from lxml import html
 
-
-class ParserData(object):
-    
-    def __init__(self, **values):
-        self.__values = values
-        self.__values['type'] = self.type
-        for attr in values:
-            setattr(self, attr, values[attr])
-
-    def __setattr__(self, attr, value):
-        if not attr.startswith('_'):
-            self.__values[attr] = value
-        super(ParserData, self).__setattr__(attr, value)
-    
-    def tojson(self):
-        return json.dumps(self.__values, sort_keys=True)
-
-    def __str__(self):
-        return str(self.__values)
-
-
-class PlayerStatsData(ParserData):
+class PlayerStatsData(liigarecords.ParserData):
     type = 'playerstats'
+    __slots__ = ('playerid', 'playername', 'season', 'playoffs', 'team',
+                 'position', 'games', 'goals', 'assists', 'points',
+                 'penalties', 'plus', 'minus', 'plusminus', 'ppgoals',
+                 'shgoals', 'wingoals', 'shots', 'shotpct', 'faceoffs',
+                 'faceoffpct', 'playtime')
 
-class PlayerMetaData(ParserData):
+class PlayerMetaData(liigarecords.ParserData):
     type = 'playermeta'
+    __slots__ = ('playerid', 'name', 'number', 'position', 'nationality',
+                 'homecity', 'height', 'weight', 'stick', 'born')
 
-class OtherSeriesData(ParserData):
+class OtherSeriesData(liigarecords.ParserData):
     type = 'otherseries'
+    __slots__ = ('playerid', 'season', 'series', 'team')
 
 
 class PlayerStatsParser(object):
@@ -54,29 +45,56 @@ class PlayerStatsParser(object):
         'Jokipojat': ('JoKP', 'jokp'),
     }
 
-    def __init__(self):
+    def __init__(self, transport=None, engine=None, split=True, quarantine=None):
+        self.transport = transport or liigafetch.transport
+        self.engine = engine or liigacrawl.CrawlEngine(self.transport)
+        # split the unfiltered table of a series by team instead of
+        # fetching one table per team
+        self.split = split
+        # series and team tables that fail go to the quarantine
+        self.quarantine = quarantine
+
+    def parse(self):
         for season in self.parseseasons():
-            url = self.baseurl.format(season=season, serie='runkosarja', team='')
+            for (serie, playoffs) in [('runkosarja', False), ('playoffs', True)]:
+                records = self.serierecords(season, serie, playoffs)
+                records = liigatrace.records('serie', 'season', records, season=season, serie=serie)
+                url = self.baseurl.format(season=season, serie=serie, team='')
+                records = liigaquarantine.isolate(self.quarantine, 'serie', records, [url],
+                                                  season=season, serie=serie, playoffs=playoffs)
+                for p in records or []:
+                    yield p
+
+    def serierecords(self, season, serie, playoffs):
+        url = self.baseurl.format(season=season, serie=serie, team='')
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
+        teams = list(self.getteams(page))
+
+        records = None
+        if self.split:
+            records = self.splitplayers(page, teams, season, playoffs)
+        if records is not None:
+            for p in records:
+                yield p
+            return
 
-            for (team, teamname) in self.parseteams(url):
-                url = self.baseurl.format(season=season, serie='runkosarja', team=team)
-                #print "URL", season, team, teamname, url
-                for p in self.parseplayers(team, teamname, season, False, url):
-                    print p.tojson()
-                     
-            url = self.baseurl.format(season=season, serie='playoffs', team='')
+        for (team, teamname) in self.prefetchteams(season, serie, teams):
+            url = self.baseurl.format(season=season, serie=serie, team=team)
+            #print "URL", season, team, teamname, url
+            records = liigaquarantine.isolate(self.quarantine, 'team',
+                                              self.parseplayers(team, teamname, season, playoffs, url), [url],
+                                              teamid=team, teamname=teamname, season=season, playoffs=playoffs, url=url)
+            for p in records or []:
+                yield p
 
-            for (team, teamname) in self.parseteams(url):
-                url = self.baseurl.format(season=season, serie='playoffs', team=team)
-                #print "URL", season, team, teamname, url
-                for p in self.parseplayers(team, teamname, season, True, url):
-                    print p.tojson()
+    def prefetchteams(self, season, serie, teams):
+        teams = list(teams)
+        teamurl = lambda t: [self.baseurl.format(season=season, serie=serie, team=t[0])]
+        return self.engine.window(teams, teamurl, len(teams))
 
 
     def parseseasons(self):
-        r = requests.get(self.seasonsurl)
-        
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(self.seasonsurl), url=self.seasonsurl)
         seasonlist = page.xpath("//select[@name='season']/option")
         for o in seasonlist:
             value = o.attrib.get('value')
@@ -85,9 +103,10 @@ class PlayerStatsParser(object):
                 
 
     def parseteams(self, url):
-        r = requests.get(url)
-        
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
+        return self.getteams(page)
+
+    def getteams(self, page):
         teamlist = page.xpath("//select[@name='team']/option")
         for o in teamlist:
             team = o.attrib.get('value')
@@ -116,12 +135,39 @@ class PlayerStatsParser(object):
         if not value:
             return None
         return int(value)
-    
-        
-    def parseplayers(self, teamid, teamname, season, playoffs, url):
-        r = requests.get(url)
-        page = html.fromstring(r.content)
 
+    def splitplayers(self, page, teams, season, playoffs):
+        # Rows of the unfiltered table grouped the way the per team tables
+        # would give them. A row belongs to the team it names or to the team
+        # whose old name it has in teamsmapping. Returns None when some row
+        # can't be given to exactly one team.
+        owners = {}
+        for (i, (teamid, teamname)) in enumerate(teams):
+            owners.setdefault(teamname, []).append((i, teamid))
+            (fixedname, fixedid) = self.teamsmapping.get(teamname, (None, None))
+            if fixedname:
+                owners.setdefault(fixedname, []).append((i, fixedid))
+
+        groups = [[] for t in teams]
+        totals = set()
+        players = set()
+        for (team, playerid, playername, tds) in self.getrows(page):
+            if team == 'Yht.':
+                totals.add(playerid)
+                continue
+            if len(owners.get(team, [])) != 1:
+                return None
+            (i, teamid) = owners[team][0]
+            groups[i].append(self.getplayer(tds, playerid, playername, teamid, season, playoffs))
+            players.add(playerid)
+
+        # a total row without the rows per team can't be split
+        if totals - players:
+            return None
+
+        return [p for group in groups for p in group]
+
+    def getrows(self, page):
         stats = page.xpath("//table[@id='stats']/tbody/tr")
         for tr in stats:
             tds = tr.xpath("td")
@@ -130,9 +176,14 @@ class PlayerStatsParser(object):
                 player = playerelem[0]
                 playerid = player.attrib.get('href')
                 playername = player.text
-                position = None
 
             team = tds[2].text.strip()
+            yield (team, playerid, playername, tds)
+
+    def parseplayers(self, teamid, teamname, season, playoffs, url):
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
+
+        for (team, playerid, playername, tds) in self.getrows(page):
             if team == 'Yht.' or team != teamname:
                 (fixedname, fixedid) = self.teamsmapping.get(teamname, (None, None))
                 if fixedname != team:
@@ -140,77 +191,108 @@ class PlayerStatsParser(object):
                     continue
                 else:
                     teamid = fixedid
-                    
-            poselem = tds[3].text
-            if poselem:
-                position = self.strvalue(poselem.strip())
 
-            games = tds[4].text.strip()
-            goals = tds[5].text.strip()
-            assists = tds[6].text.strip()
-            points = tds[7].xpath("strong")[0].text.strip()
-            penalties = tds[8].text.strip()
+            yield self.getplayer(tds, playerid, playername, teamid, season, playoffs)
 
-            plus = self.intvalue(tds[9].text.strip())
-            minus = self.intvalue(tds[10].text.strip())
-            plusminus = self.intvalue(tds[11].text.strip())
-
-            ppgoals = self.intvalue(tds[12].text.strip())
-            shgoals = self.intvalue(tds[13].text.strip())
-            wingoals = self.intvalue(tds[14].text.strip())
-            
-            shots = self.intvalue(tds[15].text.strip())
-            shotpct = self.pctvalue(tds[16].text.strip())
+    def getplayer(self, tds, playerid, playername, teamid, season, playoffs):
+        position = None
+        poselem = tds[3].text
+        if poselem:
+            position = self.strvalue(poselem.strip())
 
-            faceoffs = self.intvalue(tds[17].text.strip())
-            faceoffpct = self.pctvalue(tds[18].text.strip())
+        games = tds[4].text.strip()
+        goals = tds[5].text.strip()
+        assists = tds[6].text.strip()
+        points = tds[7].xpath("strong")[0].text.strip()
+        penalties = tds[8].text.strip()
 
-            playtime = self.strvalue(tds[19].text.strip())
-            
-            #print playerid, playername, team, position, games
+        plus = self.intvalue(tds[9].text.strip())
+        minus = self.intvalue(tds[10].text.strip())
+        plusminus = self.intvalue(tds[11].text.strip())
 
-            data = PlayerStatsData(
-                playerid = playerid.replace('/fi/pelaajat/',''),
-                playername = playername,
-                season = season,
-                playoffs = playoffs,
-                team = teamid,
-                position = position,
-                games = int(games),
+        ppgoals = self.intvalue(tds[12].text.strip())
+        shgoals = self.intvalue(tds[13].text.strip())
+        wingoals = self.intvalue(tds[14].text.strip())
+        
+        shots = self.intvalue(tds[15].text.strip())
+        shotpct = self.pctvalue(tds[16].text.strip())
 
-                goals = int(goals),
-                assists = int(assists),
-                points = int(points),
-                penalties = int(penalties),
-                
-                plus = plus,
-                minus = minus,
-                plusminus = plusminus,
-                
-                ppgoals = ppgoals,
-                shgoals = shgoals,
-                wingoals = wingoals,
-                
-                shots = shots,
-                shotpct = shotpct,
-                
-                faceoffs = faceoffs,
-                faceoffpct = faceoffpct,
-                
-                playtime = playtime,
-            )
-            yield data
+        faceoffs = self.intvalue(tds[17].text.strip())
+        faceoffpct = self.pctvalue(tds[18].text.strip())
 
+        playtime = self.strvalue(tds[19].text.strip())
+        
+        #print playerid, playername, team, position, games
+
+        data = PlayerStatsData(
+            playerid = playerid.replace('/fi/pelaajat/',''),
+            playername = playername,
+            season = season,
+            playoffs = playoffs,
+            team = teamid,
+            position = position,
+            games = int(games),
 
-    def parse(self, url):
-        timestamp = FileTimestamp(
-            timestamp = str(datetime.datetime.now()),
-            season = self.season
+            goals = int(goals),
+            assists = int(assists),
+            points = int(points),
+            penalties = int(penalties),
+            
+            plus = plus,
+            minus = minus,
+            plusminus = plusminus,
+            
+            ppgoals = ppgoals,
+            shgoals = shgoals,
+            wingoals = wingoals,
+            
+            shots = shots,
+            shotpct = shotpct,
+            
+            faceoffs = faceoffs,
+            faceoffpct = faceoffpct,
+            
+            playtime = playtime,
         )
-        yield timestamp
-        
-        for p in self.getplayers(page):
-            yield p
+        return data
+
+
+class PlayerRegistry(object):
+    # Players whose profile has been fetched, with the season that was
+    # current at the time. Seasons finished before that are already in the
+    # fetched profile, so it does not have to be fetched again for them.
+
+    def __init__(self, path=None, saveevery=100):
+        self.path = path
+        self.players = {}
+        self.unsaved = 0
+        # saved after this many new players, with None only by save()
+        self.saveevery = saveevery
+        if path and os.path.exists(path):
+            with open(path) as fp:
+                self.players = json.load(fp)
+
+    def __contains__(self, playerid):
+        return playerid in self.players
+
+    def fetched(self, playerid, season):
+        seasonid = int(season.split('-')[-1])
+        return seasonid < self.players.get(playerid, 0)
+
+    def add(self, playerid):
+        self.players[playerid] = liigafetch.currentseason()
+        self.unsaved += 1
+        if self.saveevery and self.unsaved >= self.saveevery:
+            self.save()
+
+    def save(self):
+        self.unsaved = 0
+        if not self.path:
+            return
+        tmpname = self.path + '.tmp'
+        with open(tmpname, 'w') as fp:
+            json.dump(self.players, fp, sort_keys=True)
+        os.replace(tmpname, self.path)
 
 
 class PlayerDataParser(object):
@@ -260,39 +342,95 @@ class PlayerDataParser(object):
     }
 
 
-    def __init__(self, seasonparam=None):
-        self.parsedplayers = []
-        for season in self.parseseasons(seasonparam):
-            seriesurl = self.baseurl.format(season=season, serie='runkosarja', team='')
-            playoffsurl = self.baseurl.format(season=season, serie='playoffs', team='')
-            #print season, seriesurl, playoffsurl
+    def __init__(self, seasonparam=None, transport=None, engine=None, prefetch=16, registry=None, quarantine=None,
+                 checkpoint=None):
+        self.seasonparam = seasonparam
+        self.registry = registry if registry is not None else PlayerRegistry()
+        self.transport = transport or liigafetch.transport
+        self.engine = engine or liigacrawl.CrawlEngine(self.transport)
+        # number of player profiles downloaded ahead of parsing
+        self.prefetch = prefetch
+        # player profiles and goalkeeper tables that fail go to the
+        # quarantine, failed players are not added to the registry
+        self.quarantine = quarantine
+        # seasons, players and goalkeeper tables done are recorded in the
+        # checkpoint and skipped when resuming from it
+        self.checkpoint = checkpoint
+
+    def parse(self):
+        self.parsedplayers = set()
+        if self.checkpoint is not None:
+            self.parsedplayers.update(u.split(':', 1)[1] for u in self.checkpoint.units if u.startswith('player:'))
+        for season in self.parseseasons(self.seasonparam):
+            if liigacheckpoint.skip(self.checkpoint, 'season:%s' % season):
+                continue
+            for data in liigatrace.records('season', 'season', self.seasonrecords(season), season=season):
+                yield data
+            liigacheckpoint.done(self.checkpoint, 'season:%s' % season)
 
-            for p in self.parseplayers(seriesurl):
-                if p not in self.parsedplayers:
-                    url = self.playerurl.format(playerid=p)
-                    for data in self.parseplayer(url, p):
-                        print data.tojson()
-                    
-                    self.parsedplayers.append(p)
-                     
+        self.registry.save()
+
+    def seasonrecords(self, season):
+        seriesurl = self.baseurl.format(season=season, serie='runkosarja', team='')
+        playoffsurl = self.baseurl.format(season=season, serie='playoffs', team='')
+        #print season, seriesurl, playoffsurl
 
-            for p in self.parseplayers(playoffsurl):
-                if p not in self.parsedplayers:
+        for statsurl in [seriesurl, playoffsurl]:
+            for p in self.prefetchplayers(season, self.parseplayers(statsurl)):
+                if not self.known(season, p):
                     url = self.playerurl.format(playerid=p)
-                    self.parseplayer(url, p)
-                    for data in self.parseplayer(url, p):
-                        print data.tojson()
-                    self.parsedplayers.append(p)
+                    records = liigaquarantine.isolate(self.quarantine, 'player', self.parseplayer(url, p), [url],
+                                                      url=url, playerid=p)
+                    if records is None:
+                        # in the quarantine once, not in the registry
+                        self.parsedplayers.add(p)
+                        liigacheckpoint.done(self.checkpoint, 'player:%s' % p)
+                        continue
+                    for data in records:
+                        yield data
+                    self.parsedplayers.add(p)
+                    self.registry.add(p)
+                    liigacheckpoint.done(self.checkpoint, 'player:%s' % p)
+
+        for (team, teamname) in self.prefetchteams(season, 'runkosarja', self.parseteams(seriesurl)):
+            teamurl = self.baseurl.format(season=season, serie='runkosarja', team=team)
+            for p in self.keepers(team, teamname, season, False, teamurl):
+                yield p
+
+        for (team, teamname) in self.prefetchteams(season, 'playoffs', self.parseteams(playoffsurl)):
+            teamurl = self.baseurl.format(season=season, serie='playoffs', team=team)
+            for p in self.keepers(team, teamname, season, True, teamurl):
+                yield p
+
+    def keepers(self, teamid, teamname, season, playoffs, url):
+        unit = 'keepers:%s:%s:%s' % (season, 'playoffs' if playoffs else 'runkosarja', teamid)
+        if liigacheckpoint.skip(self.checkpoint, unit):
+            return
+        records = liigaquarantine.isolate(self.quarantine, 'keepers',
+                                          self.parsekeepers(teamid, teamname, season, playoffs, url), [url],
+                                          teamid=teamid, teamname=teamname, season=season, playoffs=playoffs, url=url)
+        for p in records or []:
+            yield p
+        liigacheckpoint.done(self.checkpoint, unit)
 
-            for (team, teamname) in self.parseteams(seriesurl):
-                teamurl = self.baseurl.format(season=season, serie='runkosarja', team=team)
-                for p in self.parsekeepers(team, teamname, season, False, teamurl):
-                    print p.tojson()
+    def retryplayer(self, url, playerid):
+        # a quarantined player profile, added to the registry once parsed
+        for data in self.parseplayer(url, playerid):
+            yield data
+        self.registry.add(playerid)
 
-            for (team, teamname) in self.parseteams(playoffsurl):
-                teamurl = self.baseurl.format(season=season, serie='playoffs', team=team)
-                for p in self.parsekeepers(team, teamname, season, True, teamurl):
-                    print p.tojson()
+    def known(self, season, playerid):
+        return playerid in self.parsedplayers or self.registry.fetched(playerid, season)
+
+    def prefetchplayers(self, season, players):
+        players = list(players)
+        playerurl = lambda p: [] if self.known(season, p) else [self.playerurl.format(playerid=p)]
+        return self.engine.window(players, playerurl, self.prefetch)
+
+    def prefetchteams(self, season, serie, teams):
+        teams = list(teams)
+        teamurl = lambda t: [self.baseurl.format(season=season, serie=serie, team=t[0])]
+        return self.engine.window(teams, teamurl, len(teams))
 
 
     def parseseasons(self, season=None):
@@ -300,9 +438,7 @@ class PlayerDataParser(object):
             yield "%d-%d" % (season-1, season)
             return
 
-        r = requests.get(self.seasonsurl)
-        
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(self.seasonsurl), url=self.seasonsurl)
         seasonlist = page.xpath("//select[@name='season']/option")
         for o in seasonlist:
             value = o.attrib.get('value')
@@ -310,9 +446,7 @@ class PlayerDataParser(object):
                 yield value # int(value.split('-')[1])
                 
     def parseteams(self, url):
-        r = requests.get(url)
-        
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
         teamlist = page.xpath("//select[@name='team']/option")
         for o in teamlist:
             team = o.attrib.get('value')
@@ -344,8 +478,7 @@ class PlayerDataParser(object):
     
         
     def parseplayers(self, url):
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
 
         stats = page.xpath("//table[@id='stats']/tbody/tr")
         for tr in stats:
@@ -369,8 +502,10 @@ class PlayerDataParser(object):
     }
                 
     def parseplayer(self, url, playerid):
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        return liigatrace.records('player', 'player', self.playerrecords(url, playerid), url=url)
+
+    def playerrecords(self, url, playerid):
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
         h1 = page.xpath("//div[@id='page']/h1")[0]
         title = h1.text.strip()
         if title[0] == '#':
@@ -516,8 +651,7 @@ class PlayerDataParser(object):
 
     def parsekeepers(self, teamid, teamname, season, playoffs, url):
         #print "KEEPERS", teamid, teamname, season, playoffs, url
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = liigafetch.parsepage(self.engine.fetch(url), url=url)
 
         stats = page.xpath("//table[@id='stats']/tbody/tr")
         for tr in stats:
@@ -598,28 +732,55 @@ class PlayerDataParser(object):
 
 
 
-    def parse(self, url):
-        timestamp = FileTimestamp(
-            timestamp = str(datetime.datetime.now()),
-            season = self.season
-        )
-        yield timestamp
-        
-        for p in self.getplayers(page):
-            yield p
-
-
 
 if __name__ == "__main__":
-    urltype = sys.argv[1]
-    season = None
-    if len(sys.argv) > 2:
-        season = int(sys.argv[2])
-    if urltype == 'players':
-        parser = PlayerStatsParser()
-    elif urltype == 'playerdata':
-        if season:
-            parser = PlayerDataParser(season)
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        urltype = sys.argv[1]
+        season = None
+        if len(sys.argv) > 2:
+            season = int(sys.argv[2])
+        engine = liigacrawl.CrawlEngine(liigafetch.transport, perhost=int(options.get('workers', 6)))
+        quarantine = liigaquarantine.configure(options, 'playerstats', engine)
+        if urltype == 'players':
+            parser = PlayerStatsParser(engine=engine, split=not options.get('per-team'), quarantine=quarantine)
+        elif urltype == 'playerdata':
+            checkpoint = liigacheckpoint.configure(options, 'playerstats %s' % ' '.join(sys.argv[1:]), sink)
+            if checkpoint is None:
+                registry = PlayerRegistry(options.get('registry'))
+            else:
+                # the registry is saved with the checkpoints, so it never has
+                # players whose records a resume drops
+                registry = PlayerRegistry(options.get('registry'), saveevery=None)
+                checkpoint.saves.append(registry.save)
+            if season:
+                parser = PlayerDataParser(season, engine=engine, registry=registry, quarantine=quarantine,
+                                          checkpoint=checkpoint)
+            else:
+                parser = PlayerDataParser(engine=engine, registry=registry, quarantine=quarantine,
+                                          checkpoint=checkpoint)
+
+        if urltype == 'retry-quarantine':
+            if quarantine is None:
+                raise Exception("retry-quarantine needs --quarantine=FILE")
+            registry = PlayerRegistry(options.get('registry'))
+            statsparser = PlayerStatsParser(engine=engine, split=not options.get('per-team'))
+            dataparser = PlayerDataParser(engine=engine, registry=registry)
+            handlers = {
+                'serie': statsparser.serierecords,
+                'team': statsparser.parseplayers,
+                'player': dataparser.retryplayer,
+                'keepers': dataparser.parsekeepers,
+            }
+            for event in quarantine.retry(handlers):
+                sink.write(event)
+            registry.save()
         else:
-            parser = PlayerDataParser()
-
+            for event in parser.parse():
+                sink.write(event)
+            if urltype == 'playerdata':
+                liigacheckpoint.finish(checkpoint)
+    finally:
+        sink.close()
@@ -2,7 +2,9 @@
 
 import json, sys, datetime
 
-from liigagames import ParserData, GameData
+import liigasinks
+
+from liigagames import GameData
 
 
 
@@ -21,7 +23,7 @@ class Data(object):
 
 
 def loader(path):
-    with file(path) as fp:
+    with open(path) as fp:
         gameno = 900
         for l in fp:
             data = Data(json.loads(l))
@@ -58,6 +60,10 @@ def loader(path):
 
 
 if __name__ == "__main__":
-    for a in sys.argv[1:]:
-        for d in loader(a):
-            print d.tojson()
+    sink = liigasinks.JsonSink()
+    try:
+        for a in sys.argv[1:]:
+            for d in loader(a):
+                sink.write(d)
+    finally:
+        sink.close()
@@ -3,59 +3,47 @@
 
 
 import datetime
-import urlparse
-import requests
-import json
 import sys
+import liigafetch
+import liigarecords
+import liigasinks
 
-from lxml import html
 
-
-class ParserData(object):
-    
-    def __init__(self, **values):
-        self.__values = values
-        self.__values['type'] = self.type
-        for attr in values:
-            setattr(self, attr, values[attr])
-
-    def __setattr__(self, attr, value):
-        if not attr.startswith('_'):
-            self.__values[attr] = value
-        super(ParserData, self).__setattr__(attr, value)
-    
-    def tojson(self):
-        return json.dumps(self.__values, sort_keys=True)
-
-    def __str__(self):
-        return str(self.__values)
-
-class FileTimestamp(ParserData):
+class FileTimestamp(liigarecords.ParserData):
     type = 'timestamp'
+    __slots__ = ('timestamp', 'season', 'serie')
 
-class PlayerTimeData(ParserData):
+class PlayerTimeData(liigarecords.ParserData):
     type = 'playertimestats'
+    __slots__ = ('id', 'name', 'team', 'position', 'games', 'avgtime',
+                 'shifts', 'pptime', 'pp2time', 'shtime', 'sh2time', 'p1time',
+                 'p2time', 'p3time', 'serie')
 
-class TeamPPData(ParserData):
+class TeamPPData(liigarecords.ParserData):
     type = 'teamppstats'
+    __slots__ = ('team', 'ppnum', 'pptime', 'ppgoals', 'shgoals', 'pp2num',
+                 'pp2time', 'pp2goals', 'sh2goals', 'serie')
 
-class TeamSHData(ParserData):
+class TeamSHData(liigarecords.ParserData):
     type = 'teamshstats'
+    __slots__ = ('team', 'ppnum', 'pptime', 'ppgoals', 'shgoals', 'pp2num',
+                 'pp2time', 'pp2goals', 'sh2goals', 'shtime', 'sh2time',
+                 'serie')
 
 
 
 class PlayerTimesParser(object):
 
-    def __init__(self, season, serie='runkosarja'):
+    def __init__(self, season, serie='runkosarja', transport=None):
         self.season = season
         self.seasonstr = "%d-%d" % (season-1, season)
         self.serie = serie
+        self.transport = transport or liigafetch.transport
         self.url = "http://liiga.fi/tilastot/{season}/{serie}/pelaajat/?team=&position=all&home_away=&player_stats=time_on_ice&sort=O#stats-wrapper".format(season=self.seasonstr, serie=self.serie)
         
 
     def parse(self):
-        r = requests.get(self.url)
-        page = html.fromstring(r.content)
+        page = self.transport.get(self.url)
 
         timestamp = FileTimestamp(
             timestamp = str(datetime.datetime.now()),
@@ -64,7 +52,7 @@ class PlayerTimesParser(object):
         )
         yield timestamp
         
-        for p in self.getplayers(page):
+        for p in self.transport.extract(page, 'playertimes', self.getplayers):
             yield p
 
 
@@ -112,10 +100,11 @@ class PlayerTimesParser(object):
 
 class TeamTimesParser(object):
 
-    def __init__(self, season, serie='runkosarja'):
+    def __init__(self, season, serie='runkosarja', transport=None):
         self.season = season
         self.serie = serie
         self.seasonstr = "%d-%d" % (season-1, season)
+        self.transport = transport or liigafetch.transport
 
     def parse(self):
 
@@ -136,9 +125,12 @@ class TeamTimesParser(object):
             yield p
 
     def getteams(self, url, dataclass):
-        r = requests.get(url)
-        page = html.fromstring(r.content)
+        page = self.transport.get(url)
 
+        for p in self.transport.extract(page, dataclass.type, lambda tree: self.getteamstats(tree, dataclass)):
+            yield p
+
+    def getteamstats(self, page, dataclass):
         stats = page.xpath("//table[@id='stats']/tbody/tr")
         for tr in stats:
             tds = tr.xpath("td")
@@ -174,9 +166,10 @@ class TeamTimesParser(object):
 
 class TeamSHTimesParser(TeamTimesParser):
 
-    def __init__(self, season, serie='runkosarja'):
+    def __init__(self, season, serie='runkosarja', transport=None):
         self.seasonstr = "%d-%d" % (season-1, season)
         self.serie = serie
+        self.transport = transport or liigafetch.transport
         self.url = "http://liiga.fi/tilastot/{season}/{serie}/joukkueet/?stats_type=alivoima&home_away=&sort=#stats-wrapper".format(season=self.seasonstr, serie=self.serie)
         
 
@@ -213,18 +206,22 @@ class TeamSHTimesParser(TeamTimesParser):
 
 
 if __name__ == "__main__":
-    urltype = sys.argv[1]
-    serie = sys.argv[2]
-    season = int(sys.argv[3])
-
-    if urltype == 'players':
-        parser = PlayerTimesParser(season, serie)
-        for event in parser.parse():
-            print event.tojson()
-
-    elif urltype == 'teams':
-        parser = TeamTimesParser(season, serie)
-        for event in parser.parse():
-            print event.tojson()
-            
-            
+    (sys.argv[:], options) = liigafetch.getoptions(sys.argv)
+    liigafetch.configure(options)
+    sink = liigasinks.opensink(options)
+    try:
+        urltype = sys.argv[1]
+        serie = sys.argv[2]
+        season = int(sys.argv[3])
+
+        if urltype == 'players':
+            parser = PlayerTimesParser(season, serie)
+            for event in parser.parse():
+                sink.write(event)
+
+        elif urltype == 'teams':
+            parser = TeamTimesParser(season, serie)
+            for event in parser.parse():
+                sink.write(event)
+    finally:
+        sink.close()